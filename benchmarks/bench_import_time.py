@@ -0,0 +1,97 @@
+"""
+Measure the import time of the endpoint with `python -X importtime` against a budget.
+
+The plugin runtime (dify_plugin, gevent, werkzeug) is imported first, so the measurement
+covers the modules of the plugin and the libraries they pull in. Every run starts a fresh
+interpreter and the fastest run is reported, which filters out noise from other processes.
+Bytecode is written by a first, unmeasured run, so compiling changed sources isn't counted.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_import_time
+
+Exits with status 1 if the import time is above the budget.
+"""
+import argparse
+import os
+import subprocess
+import sys
+from typing import List, NamedTuple
+
+MODULE = "endpoints.invoke_endpoint"
+RUNTIME = "dify_plugin"
+
+# Budget of the import time of MODULE in milliseconds, enforced by a step of the unit test workflow
+IMPORT_BUDGET_MS = 50.0
+
+RUNS = 5
+
+
+class ImportTime(NamedTuple):
+    module: str
+    self_ms: float
+    cumulative_ms: float
+    depth: int
+
+
+class Measurement(NamedTuple):
+    total_ms: float
+    imports: List[ImportTime]
+
+
+def measure(module: str = MODULE, write_bytecode: bool = True) -> Measurement:
+    """
+    Imports the module in a fresh interpreter after the plugin runtime.
+
+    Args:
+        module: The module to import
+        write_bytecode: Whether the interpreter writes bytecode, disable it to only check
+            which modules are imported without writing to the source tree
+
+    Returns:
+        The import time of the module and every module it imported, in import order
+    """
+    # A deployed plugin imports cached bytecode, even where the environment disables writing it
+    environ = {key: value for key, value in os.environ.items() if key != "PYTHONDONTWRITEBYTECODE"}
+    if not write_bytecode:
+        environ["PYTHONDONTWRITEBYTECODE"] = "1"
+    output = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {RUNTIME}; import {module}"],
+                            capture_output=True, text=True, check=True, env=environ).stderr
+    imports: List[ImportTime] = []
+    after_runtime = False
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        if not after_runtime:
+            after_runtime = depth == 0 and name == RUNTIME
+            continue
+        imports.append(ImportTime(name, int(self_us) / 1000, int(cumulative_us) / 1000, depth))
+    total = next((entry.cumulative_ms for entry in imports if entry.depth == 0 and entry.module == module), 0.0)
+    return Measurement(total, imports)
+
+
+def fastest(runs: int = RUNS, module: str = MODULE) -> Measurement:
+    measure(module)
+    return min((measure(module) for _ in range(runs)), key=lambda measurement: measurement.total_ms)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", 1)[0].strip())
+    parser.add_argument("--budget", type=float, default=IMPORT_BUDGET_MS, help="budget in milliseconds")
+    parser.add_argument("--top", type=int, default=15, help="number of modules to list")
+    args = parser.parse_args()
+
+    measurement = fastest()
+    print(f"{'module':<44} {'self (ms)':>10} {'cumulative (ms)':>16}")
+    for entry in sorted(measurement.imports, key=lambda entry: entry.self_ms, reverse=True)[:args.top]:
+        print(f"{entry.module:<44} {entry.self_ms:>10.2f} {entry.cumulative_ms:>16.2f}")
+    print(f"\n{MODULE}: {measurement.total_ms:.1f} ms, budget {args.budget:.1f} ms")
+    if measurement.total_ms > args.budget:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmark enqueue throughput of the JobQueue with group commit against one commit per job.
+
+Each enqueue waits for its commit, like a request that is acknowledged only after its
+job is durable. With group commit, concurrent enqueues share one transaction and fsync.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_job_queue
+"""
+import os
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from endpoints.job_queue import JobQueue
+
+JOBS = 2_000
+CONCURRENCY = (1, 16, 64)
+PAYLOAD = {"handler": "workflow", "app_id": "app", "request_body": {"inputs": {"text": "x" * 512}},
+           "inputs": {"text": "x" * 512}}
+
+
+def bench_group_commit(path: str, concurrency: int) -> float:
+    queue = JobQueue(path)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(lambda _: queue.enqueue(PAYLOAD), range(JOBS)))
+    return JOBS / (time.perf_counter() - start)
+
+
+def bench_single_commit(path: str) -> float:
+    JobQueue(path)
+    connection = sqlite3.connect(path, isolation_level=None)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=FULL")
+    start = time.perf_counter()
+    for _ in range(JOBS):
+        connection.execute("INSERT INTO jobs (payload, created_at, visible_at) VALUES (?, ?, ?)",
+                           (str(PAYLOAD), 0, 0))
+    return JOBS / (time.perf_counter() - start)
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{'mode':<28} {'jobs/s':>10}")
+        rate = bench_single_commit(os.path.join(directory, "single.db"))
+        print(f"{'one commit per job':<28} {rate:>10.0f}")
+        for concurrency in CONCURRENCY:
+            rate = bench_group_commit(os.path.join(directory, f"group-{concurrency}.db"), concurrency)
+            print(f"{f'group commit, {concurrency} clients':<28} {rate:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark the json_string_input formats of the DefaultMiddleware on multi-MB payloads.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_json_string
+"""
+import json
+import time
+import tracemalloc
+from werkzeug.test import EnvironBuilder
+from werkzeug import Request
+from middlewares.default_middleware import DefaultMiddleware
+
+SIZES = (1_000, 10_000, 40_000)
+ROUNDS = 5
+
+
+def build_body(events: int) -> bytes:
+    payload = {
+        "events": [
+            {"id": i, "name": f"event {i}", "tags": ["a", "b", "c"],
+             "meta": {"x": i * 1.5, "ok": True, "text": "hello \"world\" ü"}}
+            for i in range(events)
+        ]
+    }
+    return json.dumps(payload, indent=2).encode("utf-8")
+
+
+def build_request(body: bytes) -> Request:
+    builder = EnvironBuilder(method="POST", data=body, content_type="application/json")
+    return Request(builder.get_environ())
+
+
+def measure(body: bytes, json_string_format: str):
+    middleware = DefaultMiddleware()
+    elapsed = 0.0
+    for _ in range(ROUNDS):
+        request = build_request(body)
+        request.get_data()
+        start = time.perf_counter()
+        middleware.transform_request_body(request, json_string_format)
+        elapsed += time.perf_counter() - start
+
+    request = build_request(body)
+    request.get_data()
+    tracemalloc.start()
+    middleware.transform_request_body(request, json_string_format)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed / ROUNDS * 1000, peak / 1_000_000
+
+
+def main() -> None:
+    print(f"{'size':>10} {'format':>11} {'time (ms)':>10} {'peak (MB)':>10}")
+    for events in SIZES:
+        body = build_body(events)
+        for json_string_format in ("normalized", "minified", "raw"):
+            ms, peak = measure(body, json_string_format)
+            print(f"{len(body) / 1_000_000:>8.1f}MB {json_string_format:>11} {ms:>10.1f} {peak:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
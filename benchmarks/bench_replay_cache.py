@@ -0,0 +1,60 @@
+"""
+Benchmark insert and lookup cost of the ReplayCache used for replay protection.
+
+Each rate is sustained for longer than the window, so buckets expire while the cache is
+filled, and at high rates the default max_entries bound evicts buckets early. Signatures
+are generated upfront, so the peak memory only covers the buckets of the cache.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_replay_cache
+"""
+import secrets
+import time
+import tracemalloc
+from middlewares.replay_cache import ReplayCache
+
+RATES = (100, 1_000, 10_000)
+WINDOW = 300
+SECONDS = 400
+
+
+def fill(cache: ReplayCache, signatures, rate: int) -> None:
+    for second in range(SECONDS):
+        now = 1_000_000 + second
+        for index in range(rate):
+            cache.check_and_add(signatures[second * rate + index], now, now)
+
+
+def run(rate: int):
+    signatures = [secrets.token_hex(32) for _ in range(rate * SECONDS)]
+
+    cache = ReplayCache(window=WINDOW, bucket_seconds=10)
+    start = time.perf_counter()
+    fill(cache, signatures, rate)
+    insert = (time.perf_counter() - start) / (rate * SECONDS)
+
+    now = 1_000_000 + SECONDS - 1
+    recent = signatures[-rate:]
+    start = time.perf_counter()
+    for signature in recent:
+        cache.check_and_add(signature, now, now)
+    lookup = (time.perf_counter() - start) / rate
+
+    tracemalloc.start()
+    fill(ReplayCache(window=WINDOW, bucket_seconds=10), signatures, rate)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return insert * 1e9, lookup * 1e9, len(cache), peak / 1_000_000
+
+
+def main() -> None:
+    print(f"{'req/s':>8} {'insert (ns)':>12} {'lookup (ns)':>12} {'entries':>10} {'peak (MB)':>10}")
+    for rate in RATES:
+        insert, lookup, entries, peak = run(rate)
+        print(f"{rate:>8} {insert:>12.0f} {lookup:>12.0f} {entries:>10} {peak:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
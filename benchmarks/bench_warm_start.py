@@ -0,0 +1,62 @@
+"""
+Benchmark the time to the first request of a fresh plugin process, with and without warm-up.
+
+Each run starts a new interpreter that imports the endpoint, optionally runs the warm-up,
+and then handles a signed Discord request and a workflow request. It reports the time
+until the process is ready, the latency of the first requests, and the time from the
+start of the process to the first completed request.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_warm_start
+"""
+import json
+import statistics
+import subprocess
+import sys
+
+RUNS = 5
+
+CHILD = r"""
+import json, sys, time
+started = time.perf_counter()
+from werkzeug import Request
+from werkzeug.test import EnvironBuilder
+from endpoints.invoke_endpoint import WebhookEndpoint
+from endpoints.warmup import _ProbeSession, warm_up
+if sys.argv[1] == "warm":
+    warm_up(probe=True)
+ready = time.perf_counter()
+
+def request(headers=None):
+    environ = EnvironBuilder(method="POST", path="/workflow/app", headers=headers or {},
+                             data=json.dumps({"inputs": {"text": "hello"}}),
+                             content_type="application/json").get_environ()
+    return Request(environ)
+
+endpoint = WebhookEndpoint(_ProbeSession())
+# An unsigned Discord request is rejected after the middleware is built and its key parsed
+endpoint._invoke(request(), {}, {"middleware": "discord", "signature_verification_key": "00" * 32})
+endpoint._invoke(request(), {}, {"api_key_location": "none", "explicit_inputs": True})
+done = time.perf_counter()
+print(json.dumps({"ready": ready - started, "first_requests": done - ready, "first_done": done - started}))
+"""
+
+
+def run(mode: str) -> dict:
+    output = subprocess.run([sys.executable, "-c", CHILD, mode], capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    # Medians of RUNS fresh processes per mode
+    print(f"{'mode':<6} {'ready (ms)':>11} {'first requests (ms)':>20} {'first done (ms)':>16}")
+    for mode in ("cold", "warm"):
+        results = [run(mode) for _ in range(RUNS)]
+        ready, first, done = (statistics.median(result[key] for result in results) * 1000
+                              for key in ("ready", "first_requests", "first_done"))
+        print(f"{mode:<6} {ready:>11.1f} {first:>20.2f} {done:>16.1f}")
+
+
+if __name__ == '__main__':
+    main()
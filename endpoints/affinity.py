@@ -0,0 +1,165 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional, Tuple, Union
+from endpoints.state import StateBackend, get_state_backend
+
+logger = logging.getLogger(__name__)
+
+# Number of conversations that are held in memory
+MAX_CONVERSATIONS = 10_000
+
+# Default time after the last message until a conversation is forgotten
+DEFAULT_CONVERSATION_TTL = 24 * 60 * 60
+
+
+class SqliteConversationStore:
+    """
+    Persistent backing store of the conversation cache, backed by SQLite in WAL mode.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        # Losing the last mappings on a power failure only starts new conversations
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS conversations"
+            " (key TEXT PRIMARY KEY, conversation_id TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT conversation_id, updated_at FROM conversations WHERE key = ?", (key,)).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def set(self, key: str, conversation_id: str, updated_at: float) -> None:
+        with self._lock:
+            self._connection.execute(
+                "INSERT INTO conversations (key, conversation_id, updated_at) VALUES (?, ?, ?)"
+                " ON CONFLICT (key) DO UPDATE SET conversation_id = excluded.conversation_id,"
+                " updated_at = excluded.updated_at",
+                (key, conversation_id, updated_at),
+            )
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM conversations WHERE key = ?", (key,))
+
+
+class StateConversationStore:
+    """
+    Backing store of the conversation cache in a state backend, shared by the worker processes.
+    """
+
+    def __init__(self, backend: StateBackend, ttl: float = DEFAULT_CONVERSATION_TTL):
+        self.backend = backend
+        self.ttl = ttl
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        value = self.backend.get(f"conversation:{key}")
+        if value is None:
+            return None
+        conversation_id, updated_at = json.loads(value)
+        return conversation_id, updated_at
+
+    def set(self, key: str, conversation_id: str, updated_at: float) -> None:
+        self.backend.set(f"conversation:{key}", json.dumps([conversation_id, updated_at]), self.ttl)
+
+    def delete(self, key: str) -> None:
+        self.backend.delete(f"conversation:{key}")
+
+
+ConversationStore = Union[SqliteConversationStore, StateConversationStore]
+
+
+class ConversationCache:
+    """
+    Maps affinity keys, such as a channel or user ID, to Dify conversation IDs.
+
+    Entries are evicted in LRU order once the cache holds `max_entries`, and expire `ttl`
+    seconds after the last message of the conversation. With a backing store, entries are
+    written through and read back after an eviction or a restart of the plugin.
+    """
+
+    def __init__(self, max_entries: int = MAX_CONVERSATIONS, ttl: float = DEFAULT_CONVERSATION_TTL,
+                 store: Optional[ConversationStore] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.store = store
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str, now: Optional[float] = None) -> Optional[str]:
+        """
+        Returns the conversation ID of the key, or None if the key has no live conversation.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None and self.store is not None:
+            entry = self.store.get(key)
+        if entry is None:
+            return None
+
+        conversation_id, updated_at = entry
+        if now - updated_at > self.ttl:
+            self.delete(key)
+            return None
+        self._put(key, entry)
+        return conversation_id
+
+    def set(self, key: str, conversation_id: str, now: Optional[float] = None) -> None:
+        """
+        Stores the conversation ID of the key and refreshes its TTL.
+        """
+        now = time.time() if now is None else now
+        self._put(key, (conversation_id, now))
+        if self.store is not None:
+            self.store.set(key, conversation_id, now)
+
+    def delete(self, key: str) -> None:
+        """
+        Forgets the conversation of the key.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.store is not None:
+            self.store.delete(key)
+
+    def _put(self, key: str, entry: Tuple[str, float]) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+@lru_cache(maxsize=8)
+def get_conversation_cache(store_path: str = "", ttl: float = DEFAULT_CONVERSATION_TTL,
+                           state_store: str = "") -> ConversationCache:
+    """
+    Returns the conversation cache for the `conversation_store`, `conversation_ttl` and
+    `state_store` settings. A `conversation_store` takes precedence over the shared state store.
+
+    The cache is shared by all endpoint instances with the same settings.
+    """
+    store_path, state_store = store_path.strip(), state_store.strip()
+    store: Optional[ConversationStore] = None
+    if store_path:
+        store = SqliteConversationStore(store_path)
+    elif state_store:
+        store = StateConversationStore(get_state_backend(state_store), ttl)
+    return ConversationCache(ttl=ttl, store=store)
@@ -0,0 +1,167 @@
+import argparse
+import hashlib
+import hmac
+import json
+import secrets
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, NamedTuple, Optional, Union
+
+
+class ApiKey(NamedTuple):
+    """
+    A configured API key and its metadata.
+
+    Attributes:
+        key_id: A name for the integration that owns the key
+        digest: The salted digest of the key, as produced by KeyIndex.hash_key
+        app_ids: The app IDs the key may invoke, empty when all apps are allowed
+        tier: The rate tier of the key, used to prioritize its requests
+        expires_at: Unix timestamp after which the key is rejected, None if it doesn't expire
+    """
+    key_id: str
+    digest: str
+    app_ids: FrozenSet[str] = frozenset()
+    tier: Optional[str] = None
+    expires_at: Optional[float] = None
+
+    def allows_app(self, app_id: Optional[str]) -> bool:
+        """
+        Checks whether the key may invoke the given app.
+        """
+        return not self.app_ids or app_id in self.app_ids
+
+    def is_expired(self, now: Optional[float] = None) -> bool:
+        """
+        Checks whether the key has expired.
+        """
+        if self.expires_at is None:
+            return False
+        return (time.time() if now is None else now) >= self.expires_at
+
+
+class KeyIndex:
+    """
+    A hash index of API keys stored as salted HMAC-SHA256 digests.
+
+    Incoming keys are hashed once with the index salt and looked up by digest, so
+    authentication stays O(1) regardless of how many keys are configured. Keys are
+    never stored in plain text. During a rotation the old and the new key are simply
+    both present in the index until the old key expires.
+    """
+
+    def __init__(self, salt: str, keys: Iterable[ApiKey] = ()):
+        self.salt = salt.encode("utf-8")
+        self._keys: Dict[str, ApiKey] = {}
+        for key in keys:
+            self._keys[key.digest] = key
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def hash_key(self, api_key: str) -> str:
+        """
+        Computes the salted digest of a plain text API key.
+        """
+        return hmac.new(self.salt, api_key.encode("utf-8"), hashlib.sha256).hexdigest()
+
+    def lookup(self, api_key: Optional[str]) -> Optional[ApiKey]:
+        """
+        Finds the configured key matching a plain text API key.
+
+        Args:
+            api_key: The API key sent with the request
+
+        Returns:
+            The matching ApiKey, or None if the key is unknown
+        """
+        if not api_key:
+            return None
+        digest = self.hash_key(api_key)
+        key = self._keys.get(digest)
+        if key is None or not hmac.compare_digest(key.digest, digest):
+            return None
+        return key
+
+
+def _parse_expiry(value: Union[None, int, float, str]) -> Optional[float]:
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(value).timestamp()
+
+
+@lru_cache(maxsize=32)
+def load_key_index(config: str) -> Optional[KeyIndex]:
+    """
+    Parses the `api_keys` setting into a KeyIndex.
+
+    The setting is a JSON object of the form:
+
+        {"salt": "...", "keys": [{"id": "github", "digest": "...", "app_ids": ["..."],
+                                  "tier": "bulk", "expires_at": "2026-01-01T00:00:00+00:00"}]}
+
+    The result is cached per configuration string, so the index is only built once.
+
+    Args:
+        config: The raw setting value
+
+    Returns:
+        The KeyIndex, or None if no keys are configured
+
+    Raises:
+        ValueError: If the setting is not valid
+    """
+    if not config or not config.strip():
+        return None
+
+    data = json.loads(config)
+    if not isinstance(data, dict) or not isinstance(data.get("keys"), list):
+        raise ValueError("api_keys must be an object with a keys list")
+    salt = data.get("salt")
+    if not isinstance(salt, str) or not salt:
+        raise ValueError("api_keys must define a salt")
+
+    keys = []
+    for entry in data["keys"]:
+        if not isinstance(entry, dict) or not entry.get("digest"):
+            raise ValueError("each api key must define a digest")
+        keys.append(ApiKey(
+            key_id=str(entry.get("id", "")),
+            digest=str(entry["digest"]).lower(),
+            app_ids=frozenset(entry.get("app_ids") or ()),
+            tier=entry.get("tier"),
+            expires_at=_parse_expiry(entry.get("expires_at")),
+        ))
+    return KeyIndex(salt, keys)
+
+
+def main() -> None:
+    """
+    Generates a new API key and prints the matching entry for the `api_keys` setting.
+    """
+    parser = argparse.ArgumentParser(description="Generate an API key entry for the api_keys setting.")
+    parser.add_argument("--salt", required=True, help="The salt of the api_keys setting")
+    parser.add_argument("--id", required=True, help="A name for the integration that owns the key")
+    parser.add_argument("--app-id", action="append", default=[], help="An app ID the key may invoke")
+    parser.add_argument("--tier", help="The rate tier of the key")
+    parser.add_argument("--expires-at", help="ISO 8601 expiry date of the key")
+    args = parser.parse_args()
+
+    api_key = secrets.token_urlsafe(32)
+    entry = {"id": args.id, "digest": KeyIndex(args.salt).hash_key(api_key)}
+    if args.app_id:
+        entry["app_ids"] = args.app_id
+    if args.tier:
+        entry["tier"] = args.tier
+    if args.expires_at:
+        entry["expires_at"] = args.expires_at
+
+    print(f"API key: {api_key}")
+    print(f"Entry:   {json.dumps(entry)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,307 @@
+import hashlib
+import hmac
+import json
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Mapping, Optional
+from urllib.parse import urlsplit
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Number of invocations that run in the background at the same time
+MAX_BACKGROUND_WORKERS = 16
+
+# Number of callbacks that are delivered to the same host at the same time
+MAX_CALLBACKS_PER_HOST = 4
+
+# Number of delivery attempts of a callback
+CALLBACK_ATTEMPTS = 5
+
+_executor: Optional[ThreadPoolExecutor] = None
+_http_client: Optional[httpx.Client] = None
+_callback_client: Optional[httpx.Client] = None
+_callback_dispatcher: Optional["CallbackDispatcher"] = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Returns the process wide executor for background invocations.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=MAX_BACKGROUND_WORKERS,
+                                       thread_name_prefix="webhook-background")
+    return _executor
+
+
+def get_http_client() -> httpx.Client:
+    """
+    Returns the process wide HTTP client.
+
+    The client keeps connections alive between requests, so replies to the same host
+    reuse an open connection instead of paying for a new TCP and TLS handshake.
+    """
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.Client(
+            timeout=httpx.Timeout(10.0, connect=5.0),
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=16, keepalive_expiry=60),
+        )
+    return _http_client
+
+
+def get_callback_client() -> httpx.Client:
+    """
+    Returns the process wide HTTP client for callbacks, which connects to public addresses only.
+
+    Proxies from the environment are not used, since the proxy would resolve the host.
+    """
+    global _callback_client
+    if _callback_client is None:
+        # httpcore is only imported once a callback is sent, like httpx imports it for its transports
+        import httpcore  # pylint: disable=import-outside-toplevel
+        from endpoints.public_network import PublicNetworkBackend  # pylint: disable=import-outside-toplevel
+
+        limits = httpx.Limits(max_connections=64, max_keepalive_connections=16, keepalive_expiry=60)
+        transport = httpx.HTTPTransport(limits=limits)
+        # HTTPTransport doesn't take a network backend, so its pool is replaced by an equivalent one
+        transport._pool = httpcore.ConnectionPool(  # pylint: disable=protected-access
+            ssl_context=httpx.create_ssl_context(),
+            max_connections=limits.max_connections,
+            max_keepalive_connections=limits.max_keepalive_connections,
+            keepalive_expiry=limits.keepalive_expiry,
+            network_backend=PublicNetworkBackend(),
+        )
+        _callback_client = httpx.Client(timeout=httpx.Timeout(10.0, connect=5.0), transport=transport,
+                                        trust_env=False)
+    return _callback_client
+
+
+def submit_background(fn: Callable, *args, **kwargs) -> Future:
+    """
+    Runs a function on the background executor and logs its exceptions.
+    """
+    future = get_executor().submit(fn, *args, **kwargs)
+    future.add_done_callback(_log_exception)
+    return future
+
+
+def _log_exception(future: Future) -> None:
+    exception = future.exception()
+    if exception is not None:
+        logger.error("Background invocation failed: %s", exception)
+
+
+class AsyncReply:
+    """
+    Describes where the result of an invocation is posted when a middleware acknowledges
+    the request immediately and the app runs in the background.
+
+    Attributes:
+        url: The URL the result is posted to
+        headers: Additional headers for the reply request
+        build_payload: Builds the JSON payload of the reply from the invocation result
+    """
+
+    def __init__(self, url: str, build_payload: Callable[[Mapping[str, Any]], Any],
+                 headers: Optional[Dict[str, str]] = None):
+        self.url = url
+        self.build_payload = build_payload
+        self.headers = headers or {}
+
+    def deliver(self, result: Mapping[str, Any]) -> httpx.Response:
+        """
+        Posts the reply for an invocation result through the shared HTTP client.
+
+        Raises:
+            httpx.HTTPError: If the reply could not be delivered
+        """
+        response = get_http_client().post(
+            self.url,
+            content=json.dumps(self.build_payload(result)),
+            headers={"Content-Type": "application/json", **self.headers},
+        )
+        response.raise_for_status()
+        logger.info("Delivered reply to %s", self.url)
+        return response
+
+    def fail(self, error: str) -> None:
+        """
+        Reports an invocation that did not return a result.
+        """
+        logger.error("No reply for %s, the invocation failed: %s", self.url, error)
+
+
+class CallbackDelivery:
+    """
+    A callback request that is delivered with retries.
+
+    The body is signed again for every attempt, so the signed timestamp of a late retry
+    is still within the tolerance of the receiver.
+
+    Attributes:
+        url: The callback URL
+        body: The JSON body of the callback
+        secret: The secret the body is signed with, or None to send it unsigned
+        headers: Additional headers of the callback request
+        attempts: The number of attempts made so far
+    """
+
+    def __init__(self, url: str, body: bytes, secret: Optional[str] = None,
+                 headers: Optional[Dict[str, str]] = None):
+        self.url = url
+        self.body = body
+        self.secret = secret
+        self.headers = headers or {}
+        self.attempts = 0
+
+    @property
+    def host(self) -> str:
+        return urlsplit(self.url).netloc.lower()
+
+    def signed_headers(self, timestamp: Optional[int] = None) -> Dict[str, str]:
+        """
+        Returns the request headers, with the signature over "<timestamp>.<body>" if a secret is set.
+        """
+        headers = {"Content-Type": "application/json", **self.headers}
+        if self.secret:
+            timestamp = int(time.time()) if timestamp is None else timestamp
+            mac = hmac.new(self.secret.encode("utf-8"), f"{timestamp}.".encode("utf-8"), hashlib.sha256)
+            mac.update(self.body)
+            headers["X-Webhook-Timestamp"] = str(timestamp)
+            headers["X-Webhook-Signature"] = f"sha256={mac.hexdigest()}"
+        return headers
+
+    def send(self) -> httpx.Response:
+        """
+        Sends the callback through the callback client, which checks the addresses of the
+        host again for every new connection.
+
+        Raises:
+            httpx.HTTPError: If the callback could not be delivered
+            ValueError: If the host no longer resolves to public addresses only
+        """
+        self.attempts += 1
+        response = get_callback_client().post(self.url, content=self.body, headers=self.signed_headers())
+        response.raise_for_status()
+        return response
+
+
+def is_retryable(error: httpx.HTTPError) -> bool:
+    """
+    Returns whether a failed delivery may succeed on a retry.
+    """
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status >= 500 or status in (408, 429)
+    return True
+
+
+class CallbackDispatcher:
+    """
+    Delivers callbacks on the background executor with a concurrency limit per host.
+
+    Deliveries above the limit of a host wait in a queue of that host instead of taking
+    executor threads, so a slow receiver only delays its own callbacks. Failed deliveries
+    are retried with exponential backoff.
+    """
+
+    def __init__(self, max_per_host: int = MAX_CALLBACKS_PER_HOST, max_attempts: int = CALLBACK_ATTEMPTS,
+                 base_delay: float = 1.0, max_delay: float = 60.0):
+        self.max_per_host = max_per_host
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, int] = {}
+        self._waiting: Dict[str, Deque[CallbackDelivery]] = {}
+
+    def submit(self, delivery: CallbackDelivery) -> None:
+        """
+        Delivers the callback now, or once a delivery to the same host completed.
+        """
+        host = delivery.host
+        with self._lock:
+            if self._in_flight.get(host, 0) >= self.max_per_host:
+                self._waiting.setdefault(host, deque()).append(delivery)
+                return
+            self._in_flight[host] = self._in_flight.get(host, 0) + 1
+        submit_background(self._run, delivery)
+
+    def _run(self, delivery: CallbackDelivery) -> None:
+        try:
+            delivery.send()
+            logger.info("Delivered callback to %s", delivery.url)
+        except httpx.HTTPError as e:
+            if delivery.attempts < self.max_attempts and is_retryable(e):
+                delay = min(self.base_delay * 2 ** (delivery.attempts - 1), self.max_delay)
+                logger.warning("Callback to %s failed, retrying in %ss: %s", delivery.url, delay, e)
+                timer = threading.Timer(delay, self.submit, (delivery,))
+                timer.daemon = True
+                timer.start()
+            else:
+                logger.error("Callback to %s failed after %d attempts: %s", delivery.url, delivery.attempts, e)
+        except ValueError as e:
+            logger.error("Callback to %s was rejected: %s", delivery.url, e)
+        finally:
+            self._release(delivery.host)
+
+    def _release(self, host: str) -> None:
+        with self._lock:
+            waiting = self._waiting.get(host)
+            if waiting:
+                delivery = waiting.popleft()
+                if not waiting:
+                    del self._waiting[host]
+            else:
+                delivery = None
+                self._in_flight[host] -= 1
+                if not self._in_flight[host]:
+                    del self._in_flight[host]
+        if delivery is not None:
+            submit_background(self._run, delivery)
+
+
+def get_callback_dispatcher() -> CallbackDispatcher:
+    """
+    Returns the process wide callback dispatcher.
+    """
+    global _callback_dispatcher
+    if _callback_dispatcher is None:
+        _callback_dispatcher = CallbackDispatcher()
+    return _callback_dispatcher
+
+
+class CallbackReply(AsyncReply):
+    """
+    Posts the result of an invocation to a callback URL supplied by the caller.
+
+    Unlike AsyncReply, the delivery is signed and retried by the callback dispatcher.
+
+    Attributes:
+        request_id: Identifies the request in the X-Webhook-Request-Id header of the callback
+        secret: The secret callbacks are signed with
+    """
+
+    def __init__(self, url: str, request_id: str, secret: Optional[str] = None):
+        super().__init__(url, lambda result: result, {"X-Webhook-Request-Id": request_id})
+        self.request_id = request_id
+        self.secret = secret
+
+    def deliver(self, result: Mapping[str, Any]) -> None:
+        """
+        Schedules the delivery of the result.
+        """
+        body = json.dumps(self.build_payload(result)).encode("utf-8")
+        get_callback_dispatcher().submit(CallbackDelivery(self.url, body, self.secret, self.headers))
+
+    def fail(self, error: str) -> None:
+        """
+        Schedules the delivery of an error, so the caller does not wait for a result forever.
+        """
+        body = json.dumps({"error": error}).encode("utf-8")
+        get_callback_dispatcher().submit(CallbackDelivery(self.url, body, self.secret, self.headers))
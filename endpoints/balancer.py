@@ -0,0 +1,176 @@
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from endpoints.state import StateBackend, get_state_backend
+
+# Weight of a new sample in the latency average of a replica
+LATENCY_WEIGHT = 0.3
+
+# Consecutive failures after which a replica is taken out of rotation
+FAILURE_THRESHOLD = 3
+
+# Time a failing replica is taken out of rotation in seconds
+EJECTION_TIME = 30.0
+
+
+class ReplicaStats:
+    """
+    The live state of a replica.
+
+    Attributes:
+        in_flight: The number of running invocations
+        latency: The exponentially weighted moving average of the latency in seconds
+        failures: The number of consecutive failed invocations
+        ejected_until: The time until which the replica is out of rotation
+    """
+
+    __slots__ = ("in_flight", "latency", "failures", "ejected_until")
+
+    def __init__(self):
+        self.in_flight = 0
+        self.latency: Optional[float] = None
+        self.failures = 0
+        self.ejected_until = 0.0
+
+    def to_dict(self) -> Dict[str, float]:
+        return {"in_flight": self.in_flight, "latency": self.latency, "failures": self.failures,
+                "ejected_until": self.ejected_until}
+
+
+class ReplicaBalancer:
+    """
+    Spreads invocations across equivalent apps.
+
+    Each invocation samples two healthy replicas and picks the one with the lower expected
+    cost, its running invocations times its average latency (power of two choices). This
+    reacts to load as quickly as least-loaded selection without sending every request to
+    the same replica in between updates. Replicas that fail `FAILURE_THRESHOLD` times in a
+    row are ejected for `EJECTION_TIME` seconds. If every replica is ejected, all of them
+    are used again.
+
+    With a state backend, failures are counted and ejections are recorded in the backend, so
+    a failing replica is taken out of rotation by every worker process. Latencies and running
+    invocations stay per process.
+    """
+
+    def __init__(self, replicas: Tuple[str, ...], rng: Optional[random.Random] = None,
+                 clock: Callable[[], float] = time.monotonic, state: Optional[StateBackend] = None):
+        self.replicas = replicas
+        self._rng = rng or random.Random()
+        self._clock = clock
+        self._state = state
+        self._lock = threading.Lock()
+        self._stats: Dict[str, ReplicaStats] = {replica: ReplicaStats() for replica in replicas}
+
+    def choose(self) -> str:
+        """
+        Chooses the replica for the next invocation.
+        """
+        ejected = set() if self._state is None else \
+            {replica for replica in self.replicas if self._state.get(f"replica-ejected:{replica}") is not None}
+        with self._lock:
+            now = self._clock()
+            healthy = [replica for replica in self.replicas
+                       if self._stats[replica].ejected_until <= now and replica not in ejected]
+            candidates = healthy or list(self.replicas)
+            if len(candidates) == 1:
+                return candidates[0]
+
+            known = [s.latency for s in self._stats.values() if s.latency is not None]
+            # Replicas without samples are assumed to be as fast as the fastest one, so they are probed
+            default_latency = min(known) if known else 1.0
+
+            def cost(replica: str) -> float:
+                stats = self._stats[replica]
+                return (stats.in_flight + 1) * (stats.latency if stats.latency is not None else default_latency)
+
+            first, second = self._rng.sample(candidates, 2)
+            return first if cost(first) <= cost(second) else second
+
+    @contextmanager
+    def track(self, replica: str) -> Iterator[None]:
+        """
+        Counts a running invocation of the replica and records its latency and outcome.
+        """
+        stats = self._stats[replica]
+        with self._lock:
+            stats.in_flight += 1
+        started = self._clock()
+        failed = True
+        try:
+            yield
+            failed = False
+        finally:
+            now = self._clock()
+            with self._lock:
+                stats.in_flight -= 1
+                if not failed:
+                    stats.failures = 0
+                    latency = now - started
+                    stats.latency = latency if stats.latency is None else \
+                        stats.latency + (latency - stats.latency) * LATENCY_WEIGHT
+            if failed:
+                self._record_failure(replica, now)
+            elif self._state is not None and self._state.get(f"replica-failures:{replica}") is not None:
+                self._state.delete(f"replica-failures:{replica}")
+
+    def _record_failure(self, replica: str, now: float) -> None:
+        # The shared counter expires with the ejection time, so sporadic failures don't add up
+        failures = None if self._state is None else \
+            self._state.incr(f"replica-failures:{replica}", 1, EJECTION_TIME)
+        stats = self._stats[replica]
+        with self._lock:
+            stats.failures = stats.failures + 1 if failures is None else failures
+            if stats.failures < FAILURE_THRESHOLD:
+                return
+            stats.ejected_until = now + EJECTION_TIME
+            stats.failures = 0
+        if self._state is not None:
+            self._state.set(f"replica-ejected:{replica}", "1", EJECTION_TIME)
+            self._state.delete(f"replica-failures:{replica}")
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {replica: stats.to_dict() for replica, stats in self._stats.items()}
+
+
+@lru_cache(maxsize=32)
+def load_replica_groups(config: str) -> Dict[str, Tuple[str, ...]]:
+    """
+    Parses the `replica_groups` setting, a JSON object that maps an app ID to the IDs of
+    its replicas, e.g. `{"<app_id>": ["<replica_app_id>", "<replica_app_id>"]}`.
+
+    Returns:
+        The replicas of each app, starting with the app itself
+
+    Raises:
+        ValueError: If the setting is invalid
+    """
+    if not config or not config.strip():
+        return {}
+    data = json.loads(config)
+    if not isinstance(data, dict):
+        raise ValueError("replica_groups must be an object")
+    groups = {}
+    for app_id, replicas in data.items():
+        if not isinstance(replicas, list) or not all(isinstance(replica, str) for replica in replicas):
+            raise ValueError(f"The replicas of {app_id} must be a list of app IDs")
+        group: List[str] = [app_id]
+        for replica in replicas:
+            if replica not in group:
+                group.append(replica)
+        groups[app_id] = tuple(group)
+    return groups
+
+
+@lru_cache(maxsize=64)
+def get_replica_balancer(replicas: Tuple[str, ...], state_store: str = "") -> ReplicaBalancer:
+    """
+    Returns the balancer of a replica group, shared by all endpoint instances. With the
+    `state_store` setting, ejections of failing replicas are shared by all worker processes.
+    """
+    return ReplicaBalancer(replicas, state=get_state_backend(state_store) if state_store.strip() else None)
@@ -0,0 +1,115 @@
+import logging
+import threading
+from concurrent.futures import Future
+from functools import lru_cache
+from typing import Any, Callable, Dict, Hashable, List, Optional
+from endpoints.mapping import compile_path
+
+logger = logging.getLogger(__name__)
+
+
+class _Batch:
+    __slots__ = ("invoke", "items", "futures", "timer")
+
+    def __init__(self, invoke: Callable[[List[Any]], List[Any]]):
+        self.invoke = invoke
+        self.items: List[Any] = []
+        self.futures: List[Future] = []
+        self.timer: Optional[threading.Timer] = None
+
+
+class MicroBatcher:
+    """
+    Aggregates items submitted within a time window into one invocation.
+
+    A batch is flushed `window` seconds after its first item arrived, or as soon as it
+    holds `max_items`. The batch is invoked by the function that was passed with its first
+    item, which returns one result per item. Every submitter waits for its own result.
+    """
+
+    def __init__(self, window: float, max_items: int):
+        self.window = window
+        self.max_items = max_items
+        self._lock = threading.Lock()
+        self._batches: Dict[Hashable, _Batch] = {}
+
+    def submit(self, key: Hashable, item: Any, invoke: Callable[[List[Any]], List[Any]],
+               timeout: Optional[float] = None) -> Any:
+        """
+        Adds an item to the open batch of the key and waits for its result.
+
+        Args:
+            key: Items with the same key are invoked together
+            item: The item to add
+            invoke: Invokes a batch and returns one result per item, used if the item opens a new batch
+            timeout: The maximum time to wait for the result in seconds
+
+        Returns:
+            The result of the item
+
+        Raises:
+            Exception: The exception raised by the invocation of the batch
+        """
+        future: Future = Future()
+        with self._lock:
+            batch = self._batches.get(key)
+            if batch is None:
+                batch = self._batches[key] = _Batch(invoke)
+                batch.timer = threading.Timer(self.window, self._flush, (key, batch))
+                batch.timer.daemon = True
+                batch.timer.start()
+            batch.items.append(item)
+            batch.futures.append(future)
+            full = len(batch.items) >= self.max_items
+
+        if full:
+            self._flush(key, batch)
+        return future.result(timeout)
+
+    def _flush(self, key: Hashable, batch: _Batch) -> None:
+        with self._lock:
+            # The timer and a full batch may both try to flush it
+            if self._batches.get(key) is not batch:
+                return
+            del self._batches[key]
+        batch.timer.cancel()
+
+        logger.info("Invoking batch of %d items", len(batch.items))
+        try:
+            results = batch.invoke(batch.items)
+        except Exception as e:  # pylint: disable=broad-except
+            for future in batch.futures:
+                future.set_exception(e)
+            return
+        for future, result in zip(batch.futures, results):
+            future.set_result(result)
+
+
+@lru_cache(maxsize=16)
+def get_micro_batcher(window_ms: float, max_items: int) -> MicroBatcher:
+    """
+    Returns the micro batcher for the `batch_window_ms` and `batch_max_items` settings.
+    """
+    return MicroBatcher(window_ms / 1000, max_items)
+
+
+def split_batch_result(response: Any, size: int, result_path: Optional[str] = None) -> List[Any]:
+    """
+    Splits the response of a batch invocation into one result per item.
+
+    Args:
+        response: The response of the batch invocation
+        size: The number of items of the batch
+        result_path: Path expression of a list in the response with one element per item
+
+    Returns:
+        The element of the list for each item, or the whole response for each item if
+        no path is set or the list does not match the batch
+    """
+    if result_path and response:
+        values = compile_path(result_path).get(response, None)
+        if isinstance(values, list) and len(values) == size:
+            return values
+        logger.warning("Batch result at %s does not have one element per item, returning the whole response",
+                       result_path)
+    return [response] * size
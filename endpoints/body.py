@@ -0,0 +1,156 @@
+import io
+import logging
+import tempfile
+from typing import IO, Any, Dict, List, Mapping, NamedTuple, Optional
+from werkzeug import Request
+from werkzeug.datastructures import FileStorage, MultiDict
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.formparser import FormDataParser
+
+logger = logging.getLogger(__name__)
+
+FORM_MIMETYPES = ("application/x-www-form-urlencoded", "multipart/form-data")
+
+# Default size limit of a single file part, matches the default upload limit of Dify
+DEFAULT_MAX_FILE_SIZE = 15 * 1024 * 1024
+
+# Size limit of the form fields, file parts are not held in memory and are not counted
+MAX_FORM_MEMORY_SIZE = 1024 * 1024
+
+# Limit of the number of parts of a multipart body
+MAX_FORM_PARTS = 1000
+
+
+class SpoolFile:
+    """
+    A temporary file on disk that a file part is streamed into.
+
+    Writes beyond the size limit raise RequestEntityTooLarge, so a single part can
+    neither exceed the limit nor fill the disk.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.size = 0
+        self._file = tempfile.TemporaryFile("w+b")
+
+    def write(self, data: bytes) -> int:
+        self.size += len(data)
+        if self.size > self.max_size:
+            raise RequestEntityTooLarge(f"File part exceeds the limit of {self.max_size} bytes")
+        return self._file.write(data)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._file, name)
+
+
+class FormBody(NamedTuple):
+    """
+    A decoded form body.
+
+    Attributes:
+        fields: The form fields, repeated fields are lists
+        files: The file parts by field name, backed by spool files on disk
+    """
+    fields: Dict[str, Any]
+    files: MultiDict
+
+    def close(self) -> None:
+        """
+        Closes the spool files, which removes them from disk.
+        """
+        for _, file in self.files.items(multi=True):
+            file.close()
+
+
+def is_form_request(r: Request) -> bool:
+    """
+    Returns whether the request has a form-urlencoded or multipart body.
+    """
+    return r.mimetype in FORM_MIMETYPES
+
+
+def request_stream(r: Request) -> IO[bytes]:
+    """
+    Returns the request body as a stream.
+
+    The body is read from the client as it arrives, unless a signature middleware already
+    read it to verify its signature, then it is read from that copy.
+    """
+    cached = getattr(r, "_cached_data", None)
+    return io.BytesIO(cached) if isinstance(cached, bytes) else r.stream
+
+
+def _to_dict(multi_dict: MultiDict) -> Dict[str, Any]:
+    # Repeated fields become lists, like repeated keys of a query string usually do
+    values = {}
+    for key, items in multi_dict.lists():
+        values[key] = items[0] if len(items) == 1 else items
+    return values
+
+
+def nest_inputs(values: Mapping[str, Any]) -> Dict[str, Any]:
+    """
+    Moves fields named "inputs[name]" into an "inputs" object, so form bodies support
+    the `explicit_inputs` setting just like JSON bodies.
+    """
+    nested: Dict[str, Any] = {}
+    for key, value in values.items():
+        if key.startswith("inputs[") and key.endswith("]") and len(key) > len("inputs[]"):
+            inputs = nested.setdefault("inputs", {})
+            if isinstance(inputs, dict):
+                inputs[key[len("inputs["):-1]] = value
+                continue
+        nested[key] = value
+    return nested
+
+
+def parse_form_body(r: Request, max_file_size: int = DEFAULT_MAX_FILE_SIZE) -> FormBody:
+    """
+    Decodes a form-urlencoded or multipart body.
+
+    File parts are streamed into spool files on disk and are never held in memory. The
+    caller closes the returned body once the files were processed.
+
+    Args:
+        r: The request with a form body
+        max_file_size: The size limit of a single file part in bytes
+
+    Returns:
+        The form fields and files
+
+    Raises:
+        RequestEntityTooLarge: If a file part, the form fields or the number of parts exceed their limit
+        ValueError: If the body is malformed
+    """
+    def stream_factory(total_content_length: Optional[int], content_type: Optional[str],
+                       filename: Optional[str], content_length: Optional[int] = None) -> IO[bytes]:
+        return SpoolFile(max_file_size)
+
+    parser = FormDataParser(stream_factory=stream_factory, max_form_memory_size=MAX_FORM_MEMORY_SIZE,
+                            silent=False, max_form_parts=MAX_FORM_PARTS)
+    _, form, files = parser.parse(request_stream(r), r.mimetype, r.content_length, r.mimetype_params)
+    logger.debug("Parsed form body with %d fields and %d files", len(form), len(files))
+    return FormBody(_to_dict(form), files)
+
+
+def file_parts(files: MultiDict) -> Dict[str, List[FileStorage]]:
+    """
+    Returns the non-empty file parts grouped by field name.
+    """
+    return {key: [file for file in items if file.filename] for key, items in files.lists()}
+
+
+def describe_files(files: MultiDict) -> Dict[str, Any]:
+    """
+    Describes the non-empty file parts by field name with their file name and MIME type,
+    so a form can be filtered and validated before its files are uploaded. Fields with
+    several files become lists.
+    """
+    described: Dict[str, Any] = {}
+    for key, parts in file_parts(files).items():
+        items = [{"filename": part.filename, "mime_type": part.mimetype or "application/octet-stream"}
+                 for part in parts]
+        if items:
+            described[key] = items[0] if len(items) == 1 else items
+    return described
@@ -0,0 +1,80 @@
+import json
+import logging
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, Set
+
+logger = logging.getLogger(__name__)
+
+# Upper bound for the number of lines of a bulk request that are invoked at the same time
+MAX_BULK_CONCURRENCY = 16
+
+
+def parse_line(line: bytes) -> Dict[str, Any]:
+    """
+    Parses one line of an NDJSON body.
+
+    Raises:
+        ValueError: If the line is not a JSON object
+    """
+    record = json.loads(line)
+    if not isinstance(record, dict):
+        raise ValueError("each line must be a JSON object")
+    return record
+
+
+def stream_results(lines: Iterable[bytes], process: Callable[[int, bytes], Dict[str, Any]],
+                   concurrency: int = 4, ordered: bool = True) -> Iterator[bytes]:
+    """
+    Processes the lines of an NDJSON body with bounded concurrency and yields one NDJSON
+    result line per input line as soon as it is ready.
+
+    Lines are read lazily, at most `concurrency` lines are in flight, so memory stays
+    constant regardless of the number of lines. Blank lines are skipped.
+
+    Args:
+        lines: The lines of the body
+        process: Processes a line with its 1-based line number, must not raise
+        concurrency: The maximum number of lines processed at the same time
+        ordered: When true results are yielded in input order, otherwise in completion order
+
+    Returns:
+        An iterator over the encoded result lines
+    """
+    concurrency = max(1, min(concurrency, MAX_BULK_CONCURRENCY))
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="webhook-bulk")
+    ordered_pending: Deque[Future] = deque()
+    unordered_pending: Set[Future] = set()
+
+    def encode(future: Future) -> bytes:
+        return (json.dumps(future.result()) + "\n").encode("utf-8")
+
+    try:
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            future = executor.submit(process, number, line)
+
+            if ordered:
+                ordered_pending.append(future)
+                # Yield finished results at the head right away, block only when the window is full
+                while ordered_pending and (ordered_pending[0].done() or len(ordered_pending) >= concurrency):
+                    yield encode(ordered_pending.popleft())
+            else:
+                unordered_pending.add(future)
+                if len(unordered_pending) >= concurrency:
+                    done, _ = wait(unordered_pending, return_when=FIRST_COMPLETED)
+                    for finished in done:
+                        unordered_pending.discard(finished)
+                        yield encode(finished)
+
+        while ordered_pending:
+            yield encode(ordered_pending.popleft())
+        while unordered_pending:
+            done, _ = wait(unordered_pending, return_when=FIRST_COMPLETED)
+            for finished in done:
+                unordered_pending.discard(finished)
+                yield encode(finished)
+    finally:
+        # Stops queued lines when the client disconnects before all results were sent
+        executor.shutdown(wait=False, cancel_futures=True)
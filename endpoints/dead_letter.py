@@ -0,0 +1,276 @@
+import argparse
+import json
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Mapping, NamedTuple, Optional
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Upper bound for the number of dead letters that are replayed at the same time
+MAX_REPLAY_CONCURRENCY = 8
+
+# Upper bound for the number of dead letters replayed by one request
+MAX_REPLAY_LIMIT = 100
+
+# Seconds after which a replay request starts no further invocations, below the request timeout of the plugin
+REPLAY_BUDGET = 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dead_letters (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    handler TEXT NOT NULL,
+    app_id TEXT NOT NULL,
+    request_body TEXT NOT NULL,
+    inputs TEXT NOT NULL,
+    error TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 1,
+    last_attempt_at REAL NOT NULL,
+    app_ids TEXT,
+    endpoint TEXT NOT NULL DEFAULT ''
+)
+"""
+
+
+class DeadLetter(NamedTuple):
+    """
+    A failed invocation that can be replayed.
+
+    Attributes:
+        id: The ID of the dead letter in the store
+        handler: The route handler of the invocation, "workflow" or "chatflow"
+        app_id: The ID of the invoked app
+        request_body: The parsed request body
+        inputs: The inputs extracted from the request body
+        error: The error of the last attempt
+        created_at: Unix timestamp of the first failed attempt
+        attempts: The number of failed attempts
+        last_attempt_at: Unix timestamp of the last failed attempt
+        app_ids: The apps resolved by the routing table, replayed instead of `app_id`
+        endpoint: The ID of the endpoint that invoked the app
+    """
+    id: int
+    handler: str
+    app_id: str
+    request_body: Dict[str, Any]
+    inputs: Dict[str, Any]
+    error: str
+    created_at: float
+    attempts: int
+    last_attempt_at: float
+    app_ids: Optional[List[str]] = None
+    endpoint: str = ""
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self._asdict()
+
+
+class DeadLetterStore:
+    """
+    Durable store for failed invocations, backed by SQLite in WAL mode.
+
+    Failures are rare compared to successful invocations, so every write is committed
+    with a full sync and survives a crash of the plugin process or the host.
+
+    Endpoints may share the store file, so each dead letter records the endpoint that
+    invoked the app, and the admin routes of an endpoint only see its own dead letters.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=FULL")
+        self._connection.execute(_SCHEMA)
+        columns = {row["name"] for row in self._connection.execute("PRAGMA table_info(dead_letters)")}
+        if "app_ids" not in columns:
+            # Stores created before fan-out failures were recorded
+            self._connection.execute("ALTER TABLE dead_letters ADD COLUMN app_ids TEXT")
+        if "endpoint" not in columns:
+            self._connection.execute("ALTER TABLE dead_letters ADD COLUMN endpoint TEXT NOT NULL DEFAULT ''")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM dead_letters").fetchone()[0]
+
+    def add(self, handler: str, app_id: str, request_body: Mapping, inputs: Mapping, error: str,
+            now: Optional[float] = None, app_ids: Optional[List[str]] = None, endpoint: str = "") -> int:
+        """
+        Appends a failed invocation and returns the ID of the dead letter.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            cursor = self._connection.execute(
+                "INSERT INTO dead_letters (handler, app_id, request_body, inputs, error, created_at, last_attempt_at,"
+                " app_ids, endpoint) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (handler, app_id, json.dumps(request_body), json.dumps(inputs), error, now, now,
+                 json.dumps(app_ids) if app_ids else None, endpoint),
+            )
+            return cursor.lastrowid
+
+    def list(self, limit: int = 100, after_id: int = 0, ids: Optional[Iterable[int]] = None,
+             endpoint: Optional[str] = None) -> List[DeadLetter]:
+        """
+        Lists dead letters in the order they were added.
+
+        Args:
+            limit: The maximum number of dead letters to return
+            after_id: Only return dead letters with a greater ID, used for pagination
+            ids: Only return the dead letters with these IDs
+            endpoint: Only return the dead letters of this endpoint, those of all endpoints if None
+        """
+        query = "SELECT * FROM dead_letters WHERE id > ?"
+        params: List[Any] = [after_id]
+        if endpoint is not None:
+            query += " AND endpoint = ?"
+            params.append(endpoint)
+        if ids is not None:
+            ids = list(ids)
+            query += f" AND id IN ({', '.join('?' for _ in ids)})"
+            params.extend(ids)
+        query += " ORDER BY id LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._connection.execute(query, params).fetchall()
+        return [DeadLetter(
+            id=row["id"],
+            handler=row["handler"],
+            app_id=row["app_id"],
+            request_body=json.loads(row["request_body"]),
+            inputs=json.loads(row["inputs"]),
+            error=row["error"],
+            created_at=row["created_at"],
+            attempts=row["attempts"],
+            last_attempt_at=row["last_attempt_at"],
+            app_ids=json.loads(row["app_ids"]) if row["app_ids"] else None,
+            endpoint=row["endpoint"],
+        ) for row in rows]
+
+    def delete(self, dead_letter_id: int) -> None:
+        """
+        Removes a dead letter, usually after it was replayed successfully.
+        """
+        with self._lock:
+            self._connection.execute("DELETE FROM dead_letters WHERE id = ?", (dead_letter_id,))
+
+    def record_attempt(self, dead_letter_id: int, error: str, now: Optional[float] = None) -> None:
+        """
+        Records another failed attempt of a dead letter.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            self._connection.execute(
+                "UPDATE dead_letters SET attempts = attempts + 1, error = ?, last_attempt_at = ? WHERE id = ?",
+                (error, now, dead_letter_id),
+            )
+
+
+@lru_cache(maxsize=8)
+def get_dead_letter_store(path: str) -> Optional[DeadLetterStore]:
+    """
+    Returns the dead letter store for the `dead_letter_store` setting, or None if it is not set.
+
+    The store is cached, so all endpoint instances share one connection per file.
+    """
+    path = path.strip()
+    if not path:
+        return None
+    return DeadLetterStore(path)
+
+
+def replay(store: DeadLetterStore, invoke: Callable[[DeadLetter], Optional[str]],
+           dead_letters: List[DeadLetter], concurrency: int = 4,
+           deadline: Optional[float] = None) -> Dict[str, List[int]]:
+    """
+    Replays dead letters with a bounded number of concurrent invocations.
+
+    Args:
+        store: The store the dead letters belong to
+        invoke: Invokes the app for a dead letter and returns an error message if it failed again
+        dead_letters: The dead letters to replay
+        concurrency: The maximum number of concurrent invocations
+        deadline: Unix timestamp after which no further invocation is started
+
+    Returns:
+        The IDs of the replayed, the failed and the pending dead letters. Replayed dead
+        letters are removed from the store, failed ones are kept with their attempt recorded,
+        and pending ones were not started before the deadline and are kept unchanged.
+    """
+    def replay_one(dead_letter: DeadLetter) -> Optional[bool]:
+        if deadline is not None and time.time() >= deadline:
+            return None
+        try:
+            error = invoke(dead_letter)
+        except Exception as e:  # pylint: disable=broad-except
+            error = str(e) or type(e).__name__
+        if error:
+            logger.warning("Replay of dead letter %s failed: %s", dead_letter.id, error)
+            store.record_attempt(dead_letter.id, error)
+            return False
+        store.delete(dead_letter.id)
+        return True
+
+    result = {"replayed": [], "failed": [], "pending": []}
+    if not dead_letters:
+        return result
+
+    concurrency = max(1, min(concurrency, MAX_REPLAY_CONCURRENCY, len(dead_letters)))
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="webhook-replay") as executor:
+        for dead_letter, replayed in zip(dead_letters, executor.map(replay_one, dead_letters)):
+            result["pending" if replayed is None else "replayed" if replayed else "failed"].append(dead_letter.id)
+    return result
+
+
+def main() -> None:
+    """
+    Lists or deletes dead letters of a store file, or replays them through the admin route.
+    """
+    parser = argparse.ArgumentParser(description="Manage the dead letters of failed invocations.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = subparsers.add_parser("list", help="List dead letters of a store file")
+    list_parser.add_argument("--path", required=True, help="The dead_letter_store file")
+    list_parser.add_argument("--limit", type=int, default=100, help="The maximum number of dead letters")
+    list_parser.add_argument("--after-id", type=int, default=0, help="Only list dead letters after this ID")
+    list_parser.add_argument("--endpoint", help="Only list dead letters of this endpoint ID")
+
+    delete_parser = subparsers.add_parser("delete", help="Delete dead letters from a store file")
+    delete_parser.add_argument("--path", required=True, help="The dead_letter_store file")
+    delete_parser.add_argument("ids", type=int, nargs="+", help="The IDs of the dead letters")
+
+    replay_parser = subparsers.add_parser("replay", help="Replay dead letters through the admin route")
+    replay_parser.add_argument("--url", required=True, help="The URL of the /dead-letters/replay route")
+    replay_parser.add_argument("--admin-key", required=True, help="The admin API key of the endpoint")
+    replay_parser.add_argument("--limit", type=int, default=MAX_REPLAY_LIMIT,
+                               help=f"The maximum number of dead letters, at most {MAX_REPLAY_LIMIT}")
+    replay_parser.add_argument("--concurrency", type=int, default=4, help="The number of concurrent invocations")
+    replay_parser.add_argument("ids", type=int, nargs="*", help="Only replay the dead letters with these IDs")
+
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for dead_letter in DeadLetterStore(args.path).list(args.limit, args.after_id, endpoint=args.endpoint):
+            print(json.dumps(dead_letter.to_dict()))
+    elif args.command == "delete":
+        store = DeadLetterStore(args.path)
+        for dead_letter_id in args.ids:
+            store.delete(dead_letter_id)
+    else:
+        body: Dict[str, Any] = {"limit": args.limit, "concurrency": args.concurrency}
+        if args.ids:
+            body["ids"] = args.ids
+        response = httpx.post(args.url, json=body, headers={"X-API-Key": args.admin_key}, timeout=None)
+        print(response.text)
+        response.raise_for_status()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+import json
+import re
+from functools import lru_cache
+from typing import Any, Callable, List, Mapping, Optional
+from endpoints.mapping import MISSING, compile_path
+
+Predicate = Callable[[Mapping[str, str], Any], bool]
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _number(op: str, argument: Any) -> Any:
+    if not _is_number(argument):
+        raise ValueError(f"Event filter {op} must be a number")
+    return argument
+
+
+def _exists(argument: Any) -> Callable[[Any], bool]:
+    if not isinstance(argument, bool):
+        raise ValueError("Event filter exists must be true or false")
+    return lambda value: (value is not MISSING) == argument
+
+
+def _in(argument: Any) -> Callable[[Any], bool]:
+    if not isinstance(argument, list):
+        raise ValueError("Event filter in must be a list")
+    return lambda value: value is not MISSING and value in argument
+
+
+def _contains(argument: Any) -> Callable[[Any], bool]:
+    return lambda value: (isinstance(value, list) and argument in value) or (
+        isinstance(value, str) and isinstance(argument, str) and argument in value)
+
+
+def _matches(argument: Any) -> Callable[[Any], bool]:
+    if not isinstance(argument, str):
+        raise ValueError("Event filter matches must be a regular expression")
+    try:
+        pattern = re.compile(argument)
+    except re.error as e:
+        raise ValueError(f"Invalid event filter pattern {argument!r}: {e}") from e
+    return lambda value: isinstance(value, str) and pattern.search(value) is not None
+
+
+def _gt(argument: Any) -> Callable[[Any], bool]:
+    bound = _number("gt", argument)
+    return lambda value: _is_number(value) and value > bound
+
+
+def _gte(argument: Any) -> Callable[[Any], bool]:
+    bound = _number("gte", argument)
+    return lambda value: _is_number(value) and value >= bound
+
+
+def _lt(argument: Any) -> Callable[[Any], bool]:
+    bound = _number("lt", argument)
+    return lambda value: _is_number(value) and value < bound
+
+
+def _lte(argument: Any) -> Callable[[Any], bool]:
+    bound = _number("lte", argument)
+    return lambda value: _is_number(value) and value <= bound
+
+
+_OPERATORS = {
+    "equals": lambda argument: lambda value: value is not MISSING and value == argument,
+    "in": _in,
+    "contains": _contains,
+    "matches": _matches,
+    "exists": _exists,
+    "gt": _gt,
+    "gte": _gte,
+    "lt": _lt,
+    "lte": _lte,
+}
+
+
+def _compile(rule: Any) -> Predicate:
+    if isinstance(rule, list):
+        return _all([_compile(item) for item in rule])
+    if not isinstance(rule, dict):
+        raise ValueError("Each event filter rule must be an object")
+
+    for combinator in ("all", "any", "not"):
+        if combinator in rule:
+            if len(rule) != 1:
+                raise ValueError(f"Event filter {combinator} must be the only key of its rule")
+            operand = rule[combinator]
+            if combinator == "not":
+                predicate = _compile(operand)
+                return lambda headers, body: not predicate(headers, body)
+            if not isinstance(operand, list):
+                raise ValueError(f"Event filter {combinator} must be a list of rules")
+            predicates = [_compile(item) for item in operand]
+            return _all(predicates) if combinator == "all" else _any(predicates)
+    return _condition(rule)
+
+
+def _all(predicates: List[Predicate]) -> Predicate:
+    return lambda headers, body: all(predicate(headers, body) for predicate in predicates)
+
+
+def _any(predicates: List[Predicate]) -> Predicate:
+    return lambda headers, body: any(predicate(headers, body) for predicate in predicates)
+
+
+def _condition(rule: Mapping[str, Any]) -> Predicate:
+    if ("header" in rule) == ("field" in rule):
+        raise ValueError("Each event filter condition must define either a header or a field")
+
+    if "header" in rule:
+        if not isinstance(rule["header"], str):
+            raise ValueError("Event filter header must be a header name")
+        name = rule["header"].lower()
+
+        def read(headers: Mapping[str, str], body: Any) -> Any:
+            return headers.get(name, MISSING)
+    else:
+        path = compile_path(rule["field"])
+
+        def read(headers: Mapping[str, str], body: Any) -> Any:
+            return path.get(body, MISSING)
+
+    operators = {op: argument for op, argument in rule.items() if op not in ("header", "field")}
+    unknown = set(operators) - set(_OPERATORS)
+    if unknown:
+        raise ValueError(f"Unknown event filter operators: {', '.join(sorted(unknown))}")
+    if not operators:
+        raise ValueError("Each event filter condition must define an operator")
+    tests = [_OPERATORS[op](argument) for op, argument in operators.items()]
+
+    def predicate(headers: Mapping[str, str], body: Any) -> bool:
+        value = read(headers, body)
+        return all(test(value) for test in tests)
+    return predicate
+
+
+class EventFilter:
+    """
+    Decides whether an event is forwarded to the app, based on its headers and body fields.
+
+    A rule is either a condition or a combination of rules:
+    - `{"header": "X-GitHub-Event", "equals": "issues"}` tests a header, names are case-insensitive
+    - `{"field": "$.action", "in": ["opened", "reopened"]}` tests a body field with a path expression
+    - Conditions support `equals`, `in`, `contains`, `matches` (a regular expression), `exists`,
+      and the numeric ranges `gt`, `gte`, `lt` and `lte`; all operators of a condition must hold
+    - `{"all": [...]}`, `{"any": [...]}` and `{"not": {...}}` combine rules, a list means `all`
+
+    The rules are compiled once into nested closures, so matching an event does not
+    interpret the configuration again.
+    """
+
+    __slots__ = ("_predicate",)
+
+    def __init__(self, rules: Any):
+        self._predicate = _compile(rules)
+
+    def matches(self, headers: Mapping[str, str], body: Any) -> bool:
+        """
+        Checks whether an event passes the filter.
+
+        Args:
+            headers: The request headers
+            body: The parsed request body
+
+        Returns:
+            True if the event should be forwarded to the app
+        """
+        return self._predicate(headers, body)
+
+
+@lru_cache(maxsize=32)
+def load_event_filter(config: str) -> Optional[EventFilter]:
+    """
+    Parses the `event_filter` setting into an EventFilter.
+
+    Args:
+        config: The raw setting value
+
+    Returns:
+        The EventFilter, or None if no filter is configured
+
+    Raises:
+        ValueError: If the setting is not valid
+    """
+    if not config or not config.strip():
+        return None
+    return EventFilter(json.loads(config))
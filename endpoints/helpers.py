@@ -1,30 +1,56 @@
+import hmac
+import ipaddress
 import json
-from typing import Literal, Mapping, Optional
+import socket
+import sqlite3
+from typing import FrozenSet, List, Literal, Mapping, Optional, Type
+from urllib.parse import urlsplit
 from werkzeug import Request, Response
-from middlewares.discord_middleware import DiscordMiddleware
+from middlewares.base_middleware import SignatureMiddleware
 from middlewares.default_middleware import DefaultMiddleware
+from endpoints.auth import load_key_index
+from endpoints.mapping import compile_path
+from endpoints.registry import LazyRegistry
+from endpoints.router import Router, RouteMatch
+from endpoints.state import get_state_backend
 
-def apply_middleware(r: Request, settings: Mapping) -> Optional[Response]:
+# Maps the values of the middleware setting to the middleware classes. A middleware module,
+# and libraries like nacl, is only imported when a request is configured to use it.
+MIDDLEWARES: LazyRegistry[Type[SignatureMiddleware]] = LazyRegistry({
+    "discord": "middlewares.discord_middleware:DiscordMiddleware",
+    "github": "middlewares.hmac_middleware:GitHubMiddleware",
+    "stripe": "middlewares.hmac_middleware:StripeMiddleware",
+    "slack": "middlewares.slack_middleware:SlackMiddleware",
+    "hmac": "middlewares.hmac_middleware:HmacMiddleware",
+})
+
+def apply_middleware(r: Request, settings: Mapping, stream_body: bool = False) -> Optional[Response]:
     """
     Applies middleware based on the settings provided.
 
     :param r: The request object
     :param settings: A dictionary containing configuration settings
+    :param stream_body: Whether the route streams the body, the default middleware is then
+                        skipped, since its transformations read the whole body
     :return: A Response object if middleware processing returns a response, otherwise None
     """
     try:
-        middleware_type = settings.get("middleware")
-        signature_verification_key = settings.get("signature_verification_key")
+        middleware_class = MIDDLEWARES.get(settings.get("middleware"))
 
-        if middleware_type == "discord":
-            middleware = DiscordMiddleware(signature_verification_key)
+        if middleware_class:
+            middleware = middleware_class.from_settings(settings)
+            if settings.get("state_store"):
+                middleware.state = get_state_backend(settings["state_store"])
             response = middleware.invoke(r)
             if response:
                 return response
-    except (json.JSONDecodeError, KeyError, TypeError) as e:
+    except (ValueError, KeyError, TypeError, ImportError, sqlite3.Error) as e:
         print(f"Middleware Error: {str(e)}")
         return Response(json.dumps({"error": f"Middleware error: {str(e)}"}), status=500, content_type="application/json")
 
+    if stream_body:
+        return None
+
     try:
         default_middleware = DefaultMiddleware()
         default_middleware.invoke(r, settings)
@@ -38,6 +64,10 @@ def validate_api_key(r: Request, settings: Mapping) -> Optional[Response]:
     """
     Validates the API key based on the location specified in the settings.
 
+    The key is checked against the single `api_key` setting and against the key index
+    configured in `api_keys`. When the key comes from the index, its metadata is attached
+    to the request as `api_key_info` for later checks.
+
     :param r: The request object
     :param settings: A dictionary containing configuration settings
     :return: A Response object if validation fails, otherwise None
@@ -45,25 +75,187 @@ def validate_api_key(r: Request, settings: Mapping) -> Optional[Response]:
     api_key_location = settings.get("api_key_location", "api_key_header")
     expected_api_key = settings.get("api_key")
 
-    if api_key_location != 'none' and not expected_api_key:
+    try:
+        key_index = load_key_index(settings.get("api_keys") or "")
+    except (json.JSONDecodeError, ValueError, TypeError) as e:
+        return Response(json.dumps({"error": f"Invalid api_keys setting: {str(e)}"}),
+                        status=500, content_type="application/json")
+
+    if api_key_location != 'none' and not expected_api_key and not key_index:
         return Response(json.dumps({"error": "Expected API key is not configured."}),
                         status=500, content_type="application/json")
 
     if api_key_location == "api_key_header":
         request_api_key = r.headers.get("x-api-key")
-        if request_api_key != expected_api_key:
-            return Response(json.dumps({"error": "Invalid API key"}),
-                            status=403, content_type="application/json")
-    
     elif api_key_location == "token_query_param":
         request_api_key = r.args.get("difyToken")
-        if request_api_key != expected_api_key:
-            return Response(json.dumps({"error": "Invalid API key"}),
-                            status=403, content_type="application/json")
+    else:
+        return None
 
+    if expected_api_key and request_api_key and hmac.compare_digest(
+            request_api_key.encode("utf-8"), expected_api_key.encode("utf-8")):
+        return None
+
+    api_key_info = key_index.lookup(request_api_key) if key_index else None
+    if api_key_info is None:
+        return Response(json.dumps({"error": "Invalid API key"}),
+                        status=403, content_type="application/json")
+
+    if api_key_info.is_expired():
+        return Response(json.dumps({"error": "API key expired"}),
+                        status=403, content_type="application/json")
+
+    r.api_key_info = api_key_info
     return None
 
-EndpointRoute = Literal["/workflow/<app_id>", "/chatflow/<app_id>", "/single-workflow", "/single-chatflow"]
+def validate_admin_key(r: Request, settings: Mapping) -> Optional[Response]:
+    """
+    Validates the admin API key of the admin routes.
+
+    The admin routes are disabled unless the `admin_api_key` setting is configured. The key
+    is always read from the X-API-Key header, so it never ends up in access logs.
+
+    :param r: The request object
+    :param settings: A dictionary containing configuration settings
+    :return: A Response object if validation fails, otherwise None
+    """
+    expected_admin_key = settings.get("admin_api_key")
+    if not expected_admin_key:
+        return Response(json.dumps({"error": "Admin routes are disabled"}),
+                        status=404, content_type="application/json")
+
+    request_admin_key = r.headers.get("x-api-key")
+    if not request_admin_key or not hmac.compare_digest(
+            request_admin_key.encode("utf-8"), expected_admin_key.encode("utf-8")):
+        return Response(json.dumps({"error": "Invalid admin API key"}),
+                        status=403, content_type="application/json")
+    return None
+
+def get_callback_url(r: Request, request_body: Mapping, settings: Mapping) -> Optional[str]:
+    """
+    Reads the callback URL from the X-Callback-URL header, or from the body field
+    configured in the `callback_url_field` setting.
+
+    Callbacks are only posted to public addresses. When the `callback_allowed_hosts`
+    setting is configured, the host must also be on that list.
+
+    :param r: The request object
+    :param request_body: The parsed request body
+    :param settings: A dictionary containing configuration settings
+    :return: The callback URL, or None if the request has no callback URL
+    :raises ValueError: If the callback URL is not an absolute http(s) URL to an allowed public host
+    """
+    callback_url = r.headers.get("x-callback-url")
+    field = settings.get("callback_url_field")
+    if not callback_url and field and isinstance(request_body, Mapping):
+        callback_url = compile_path(field).get(request_body, None)
+    if not callback_url:
+        return None
+
+    if not isinstance(callback_url, str):
+        raise ValueError("callback_url must be a string")
+    parts = urlsplit(callback_url)
+    if parts.scheme not in ("http", "https") or not parts.netloc:
+        raise ValueError("callback_url must be an absolute http or https URL")
+    try:
+        host = (parts.hostname or "").rstrip(".").lower()
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+    except ValueError:
+        raise ValueError("callback_url has an invalid port")
+    if not is_allowed_callback_host(host, settings.get("callback_allowed_hosts") or ""):
+        raise ValueError(f"callback_url host {host} is not allowed")
+    check_public_host(host, port)
+    return callback_url
+
+def is_allowed_callback_host(host: str, allowed_hosts: str) -> bool:
+    """
+    Checks a callback host against the comma-separated `callback_allowed_hosts` setting.
+
+    Entries match the host exactly, entries like `*.example.com` match its subdomains. An
+    empty setting allows all hosts.
+
+    :param host: The lowercase host of the callback URL
+    :param allowed_hosts: The comma-separated allowed hosts
+    :return: True if the host is allowed
+    """
+    entries = [entry.strip().rstrip(".").lower() for entry in allowed_hosts.split(",") if entry.strip()]
+    if not entries:
+        return True
+    for entry in entries:
+        if entry.startswith("*.") and host.endswith(entry[1:]):
+            return True
+        if host == entry:
+            return True
+    return False
+
+def check_public_host(host: str, port: int) -> List[str]:
+    """
+    Resolves a callback host and rejects it unless all of its addresses are public.
+
+    Private, loopback, link-local and other reserved addresses would let a caller reach
+    services next to the plugin, such as the Dify API or cloud metadata endpoints.
+
+    :param host: The host name or IP address
+    :param port: The port of the callback URL
+    :return: The checked addresses, in the order of the resolver
+    :raises ValueError: If the host cannot be resolved or resolves to a non-public address
+    """
+    try:
+        addresses = list(dict.fromkeys(
+            info[4][0] for info in socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)))
+    except (socket.gaierror, UnicodeError):
+        raise ValueError(f"callback_url host {host} cannot be resolved")
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split("%", 1)[0])
+        if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped:
+            ip = ip.ipv4_mapped
+        if not ip.is_global or ip.is_multicast:
+            raise ValueError(f"callback_url host {host} resolves to the non-public address {ip}")
+    return addresses
+
+EndpointRoute = Literal["/workflow/<app_id>", "/chatflow/<app_id>", "/single-workflow", "/single-chatflow",
+                        "/workflow/<app_id>/bulk", "/single-workflow/bulk"]
+
+# Maps each route declared in the endpoint YAML files to the name of its handler
+ROUTES: Mapping[EndpointRoute, str] = {
+    "/workflow/<app_id>": "workflow",
+    "/chatflow/<app_id>": "chatflow",
+    "/single-workflow": "workflow",
+    "/single-chatflow": "chatflow",
+    "/workflow/<app_id>/bulk": "bulk_workflow",
+    "/single-workflow/bulk": "bulk_workflow",
+}
+
+AdminRoute = Literal["/dead-letters", "/dead-letters/replay", "/jobs/stats", "/jobs/run", "/cache/stats", "/ready"]
+
+# Maps each admin route to the name of its handler, admin routes bypass the middlewares
+ADMIN_ROUTES: Mapping[AdminRoute, str] = {
+    "/dead-letters": "list_dead_letters",
+    "/dead-letters/replay": "replay_dead_letters",
+    "/jobs/stats": "job_stats",
+    "/jobs/run": "run_jobs",
+    "/cache/stats": "cache_stats",
+    "/ready": "ready",
+}
+
+# Admin routes that are served without the admin API key, they only report the state of the plugin
+PUBLIC_ADMIN_ROUTES: FrozenSet[AdminRoute] = frozenset({"/ready"})
+
+ROUTER = Router()
+for _route, _handler in {**ROUTES, **ADMIN_ROUTES}.items():
+    ROUTER.add(_route, _handler)
+
+def match_route(path: str) -> Optional[RouteMatch]:
+    """
+    Resolves the request path to a declared route and extracts its path parameters.
+
+    Args:
+        path: The request path
+
+    Returns:
+        The matched route with its handler and path parameters, or None if the path doesn't match
+    """
+    return ROUTER.match(path)
 
 def determine_route(path: str) -> Optional[EndpointRoute]:
     """
@@ -75,12 +267,5 @@ def determine_route(path: str) -> Optional[EndpointRoute]:
     Returns:
         The endpoint route as a string, or None if the path doesn't match
     """
-    if path.startswith("/workflow"):
-        return "/workflow/<app_id>"
-    elif path.startswith("/chatflow"):
-        return "/chatflow/<app_id>"
-    elif path.startswith("/single-workflow"):
-        return "/single-workflow"
-    elif path.startswith("/single-chatflow"):
-        return "/single-chatflow"
-    return None
\ No newline at end of file
+    match = ROUTER.match(path)
+    return match.route if match else None
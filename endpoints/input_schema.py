@@ -0,0 +1,214 @@
+import logging
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Time the input variables of an app are cached in seconds
+DEFAULT_SCHEMA_TTL = 300
+
+# Time a failed fetch is remembered, so an unavailable source isn't asked on every request
+FAILED_FETCH_TTL = 30
+
+# Fetches the app info of an app ID, e.g. session.app.fetch_app
+SchemaSource = Callable[[str], Mapping[str, Any]]
+
+Check = Callable[[Any], Any]
+
+
+class InputField(NamedTuple):
+    """
+    An input variable declared by an app.
+
+    Attributes:
+        variable: The name of the input
+        type: The form type, e.g. "text-input", "paragraph", "select", "number" or "file"
+        required: Whether the input must be provided
+        max_length: The maximum length of text inputs
+        options: The allowed values of select inputs
+    """
+    variable: str
+    type: str
+    required: bool = False
+    max_length: Optional[int] = None
+    options: Optional[Tuple[str, ...]] = None
+
+
+def _text(field: InputField) -> Check:
+    def check(value: Any) -> Any:
+        if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+            raise ValueError(f"{field.variable} must be a string")
+        value = str(value)
+        if field.max_length and len(value) > field.max_length:
+            raise ValueError(f"{field.variable} must be at most {field.max_length} characters")
+        return value
+    return check
+
+
+def _select(field: InputField) -> Check:
+    options = frozenset(field.options or ())
+
+    def check(value: Any) -> Any:
+        # Lists and objects can't be looked up in the set of options
+        if not isinstance(value, str) or value not in options:
+            raise ValueError(f"{field.variable} must be one of {', '.join(field.options or ())}")
+        return value
+    return check
+
+
+def _number(field: InputField) -> Check:
+    def check(value: Any) -> Any:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return value
+        if isinstance(value, str):
+            try:
+                return int(value)
+            except ValueError:
+                try:
+                    return float(value)
+                except ValueError:
+                    pass
+        raise ValueError(f"{field.variable} must be a number")
+    return check
+
+
+def _checkbox(field: InputField) -> Check:
+    def check(value: Any) -> Any:
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, str) and value.lower() in ("true", "false"):
+            return value.lower() == "true"
+        raise ValueError(f"{field.variable} must be a boolean")
+    return check
+
+
+_CHECKS: Dict[str, Callable[[InputField], Check]] = {
+    "text-input": _text,
+    "paragraph": _text,
+    "select": _select,
+    "number": _number,
+    "checkbox": _checkbox,
+}
+
+
+class InputSchema:
+    """
+    Validates and coerces inputs against the input variables of an app.
+
+    Required inputs must be present and not empty, text inputs are converted to strings and
+    limited to their max length, numbers are parsed from strings, and select inputs must be
+    one of their options. Other input types, like files, are only checked for presence.
+    Inputs the app doesn't declare are passed through.
+    """
+
+    def __init__(self, fields: List[InputField]):
+        self.fields = fields
+        self._checks: List[Tuple[InputField, Optional[Check]]] = [
+            (field, _CHECKS[field.type](field) if field.type in _CHECKS else None) for field in fields]
+
+    def validate(self, inputs: Mapping[str, Any]) -> Dict[str, Any]:
+        """
+        Validates the inputs.
+
+        Args:
+            inputs: The inputs of the request
+
+        Returns:
+            A copy of the inputs with coerced values
+
+        Raises:
+            ValueError: With all violations if the inputs are invalid
+        """
+        validated = dict(inputs)
+        errors = []
+        for field, check in self._checks:
+            value = validated.get(field.variable)
+            if value is None or value == "":
+                if field.required:
+                    errors.append(f"{field.variable} is required")
+                continue
+            if check is None:
+                continue
+            try:
+                validated[field.variable] = check(value)
+            except ValueError as e:
+                errors.append(str(e))
+        if errors:
+            raise ValueError("; ".join(errors))
+        return validated
+
+
+def parse_app_info(app_info: Mapping[str, Any]) -> InputSchema:
+    """
+    Compiles the `user_input_form` of an app into an InputSchema.
+
+    Args:
+        app_info: The app info returned by the schema source, the parameters of the app
+            optionally wrapped in a `data` object
+
+    Returns:
+        The InputSchema of the app
+    """
+    parameters = app_info.get("data", app_info) if isinstance(app_info, Mapping) else {}
+    fields = []
+    for item in parameters.get("user_input_form") or []:
+        # Each item maps the form type to its config, e.g. {"text-input": {"variable": "title", ...}}
+        if not isinstance(item, Mapping) or len(item) != 1:
+            continue
+        field_type, config = next(iter(item.items()))
+        if not isinstance(config, Mapping) or not config.get("variable"):
+            continue
+        options = config.get("options")
+        fields.append(InputField(
+            variable=config["variable"],
+            type=field_type,
+            required=bool(config.get("required", False)),
+            max_length=config.get("max_length") or None,
+            options=tuple(options) if field_type == "select" and options else None,
+        ))
+    return InputSchema(fields)
+
+
+class SchemaCache:
+    """
+    Caches the compiled input schemas of apps for `ttl` seconds.
+
+    The schema source is passed on every lookup, so it can be bound to the current session.
+    If the source fails, no schema is returned for `FAILED_FETCH_TTL` seconds and requests
+    are not validated.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_SCHEMA_TTL, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._schemas: Dict[str, Tuple[Optional[InputSchema], float]] = {}
+
+    def get(self, app_id: str, source: SchemaSource) -> Optional[InputSchema]:
+        """
+        Returns the schema of an app, fetching it from the source if it is not cached.
+        """
+        now = self._clock()
+        with self._lock:
+            entry = self._schemas.get(app_id)
+        if entry is not None and entry[1] > now:
+            return entry[0]
+
+        try:
+            schema, ttl = parse_app_info(source(app_id)), self.ttl
+        except Exception as e:  # pylint: disable=broad-except
+            logger.warning("Failed to fetch the input schema of app %s: %s", app_id, str(e))
+            schema, ttl = None, FAILED_FETCH_TTL
+        with self._lock:
+            self._schemas[app_id] = (schema, now + ttl)
+        return schema
+
+
+@lru_cache(maxsize=1)
+def get_schema_cache() -> SchemaCache:
+    """
+    Returns the schema cache shared by all endpoint instances.
+    """
+    return SchemaCache()
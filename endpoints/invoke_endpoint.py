@@ -1,9 +1,34 @@
 import json
 import logging
-from typing import Mapping, Dict, Any, Optional
+import sqlite3
+import time
+import uuid
+from typing import Callable, Mapping, Dict, Any, List, Optional, Tuple, Union
 from werkzeug import Request, Response
+from werkzeug.exceptions import RequestEntityTooLarge
 from dify_plugin import Endpoint
-from endpoints.helpers import apply_middleware, validate_api_key, determine_route
+from endpoints.helpers import (ADMIN_ROUTES, PUBLIC_ADMIN_ROUTES, apply_middleware, get_callback_url,
+                               validate_admin_key, validate_api_key, match_route)
+from endpoints.background import AsyncReply, CallbackReply, submit_background
+from endpoints.body import (DEFAULT_MAX_FILE_SIZE, FormBody, describe_files, file_parts, is_form_request,
+                            nest_inputs, parse_form_body, request_stream)
+from endpoints.dead_letter import (MAX_REPLAY_LIMIT, REPLAY_BUDGET, DeadLetter, get_dead_letter_store,
+                                   replay)
+from endpoints.job_queue import JOB_RUN_BUDGET, Job, JobQueue, get_job_queue
+from endpoints.scheduler import load_priority_config
+from endpoints.limiter import Overloaded, get_adaptive_limiter
+from endpoints.balancer import get_replica_balancer, load_replica_groups
+from endpoints.input_schema import get_schema_cache
+from endpoints.result_cache import (DEFAULT_RESULT_CACHE_SIZE_MB, DEFAULT_RESULT_CACHE_TTL, cache_key,
+                                    get_result_cache, is_cached_app, is_succeeded_run)
+from endpoints.affinity import DEFAULT_CONVERSATION_TTL, ConversationCache, get_conversation_cache
+from endpoints.batching import get_micro_batcher, split_batch_result
+from endpoints.bulk import parse_line, stream_results
+from endpoints.event_filter import EventFilter, load_event_filter
+from endpoints.routing import fan_out, load_routing_table
+from endpoints.warmup import readiness
+from endpoints.mapping import (InputMapping, OutputProjection, compile_path, load_input_mapping,
+                               load_output_projection)
 
 logger = logging.getLogger(__name__)
 
@@ -27,7 +52,30 @@ class WebhookEndpoint(Endpoint):
 
     The endpoint behavior can be configured with:
     - `explicit_inputs`: When true, inputs should be in req.body.inputs. When false, req.body is used.
+      Form bodies provide req.body.inputs with fields named `inputs[<name>]`, file parts become file inputs.
+    - `input_mapping`: Path expressions that build the inputs from req.body, overrides `explicit_inputs`
     - `raw_data_output`: When true, workflow responses will only return the data.outputs
+    - `output_projection`: Path expressions that select, rename or remove fields of the response
+    - `dead_letter_store`: SQLite file where failed invocations are stored, see the /dead-letters admin routes
+    - `job_queue`: SQLite file of a durable queue, requests are acknowledged with 202 and invoked in the background
+    - `priority_classes`: Weighted fair shares of the job queue workers per class of handler, app or API key tier
+    - `callback_url_field`, `callback_secret`: Results are posted to the callback URL of the request instead
+    - `callback_allowed_hosts`: Hosts that callbacks may be posted to, non-public addresses are always rejected
+    - `conversation_affinity_key`: Path expression of a body field, chatflow requests with the same value
+      continue the same conversation without sending a conversation_id
+    - `validate_inputs`: Inputs are checked against the input variables of the app before it is invoked
+    - `event_filter`: Rules on headers and body fields, events that don't match are answered with 204
+    - `routing_table`: Routes workflow events to one or more apps by headers and body fields, the apps
+      run concurrently and their results are aggregated
+    - `batch_window_ms`: Workflow requests within the window are aggregated into one invocation
+    - `result_cache_apps`: Workflow results of these apps are cached by their inputs for `result_cache_ttl`
+      seconds, requests with `Cache-Control: no-cache` run the workflow again
+    - `replica_groups`: Equivalent apps that share the load of an app, conversations stay on the app
+      that created them
+    - `adaptive_concurrency`: Concurrent invocations of each app follow its latency, requests that wait
+      longer than `queue_delay_target_ms` are shed with 503
+    - `state_store`: SQLite file that shares replay records, cached results and conversation affinity
+      between the plugin worker processes
     """
 
     def _invoke(self, r: Request, values: Mapping, settings: Mapping) -> Response:
@@ -37,16 +85,20 @@ class WebhookEndpoint(Endpoint):
         logger.info("Received request to unified endpoint")
 
         # Determine the endpoint mode
-        route = determine_route(r.path)
-        if not route:
+        match = match_route(r.path)
+        if not match:
             logger.error("Invalid path: %s", r.path)
             return Response(json.dumps({"error": "Invalid path. Use /workflow/ or /chatflow/"}),
                             status=404, content_type="application/json")
 
+        route = match.route
         logger.info("Request mode: %s", route)
 
-        # Apply middleware
-        middleware_response = apply_middleware(r, settings)
+        if route in ADMIN_ROUTES:
+            return self._invoke_admin(r, match.handler, settings, route not in PUBLIC_ADMIN_ROUTES)
+
+        # Apply middleware, bulk bodies are streamed and must not be read by the default middleware
+        middleware_response = apply_middleware(r, settings, stream_body=match.handler == "bulk_workflow")
         if middleware_response:
             logger.debug("Middleware response: %s", middleware_response)
             return middleware_response
@@ -58,100 +110,152 @@ class WebhookEndpoint(Endpoint):
             return validation_response
 
         try:
-            request_body = getattr(
-                r, 'default_middleware_json', {}) or r.get_json()
-            
-            dynamic_app_id = values.get("app_id")
             static_app_id = settings.get("static_app_id")
             if isinstance(static_app_id, dict):
                 static_app_id = static_app_id.get('app_id')
-                
-            logger.debug("Parsed request body: %s", request_body)
-            logger.debug("Extracted dynamic_app_id: %s", dynamic_app_id)
+
+            logger.debug("Extracted path params: %s", match.params)
             logger.debug("Extracted static_app_id: %s", static_app_id)
 
-            if not dynamic_app_id and not static_app_id:
+            if "app_id" in match.params:
+                if static_app_id:
+                    # Do not handle requests to /<mode>/<app_id> when a static app_id is defined
+                    # Static app_id is explicitly used to only expose one single app
+                    return Response(status=404, content_type="application/json")
+                app_id = values.get("app_id") or match.params["app_id"]
+            else:
+                app_id = static_app_id
+
+            if not app_id:
                 logger.error("app_id is required but not provided.")
                 return Response(status=404, content_type="application/json")
 
-            # Handle inputs based on explicit_inputs setting
-            explicit_inputs = settings.get('explicit_inputs', True)
+            api_key_info = getattr(r, 'api_key_info', None)
+            if api_key_info and not api_key_info.allows_app(app_id):
+                logger.warning("API key %s is not allowed to invoke app %s", api_key_info.key_id, app_id)
+                return Response(json.dumps({"error": "API key is not allowed to invoke this app"}),
+                                status=403, content_type="application/json")
 
-            if explicit_inputs:
-                inputs = request_body.get("inputs", {})
-            else:
-                inputs = request_body.copy()
+            try:
+                input_mapping = load_input_mapping(settings.get('input_mapping') or "")
+            except ValueError as e:
+                logger.error("Invalid input_mapping setting: %s", str(e))
+                return Response(json.dumps({"error": f"Invalid input_mapping setting: {str(e)}"}),
+                                status=500, content_type="application/json")
 
-            if not isinstance(inputs, dict):
-                logger.error(
-                    "Invalid inputs type: expected object, got %s", type(inputs).__name__)
-                return Response(json.dumps({"error": "inputs must be an object"}),
-                                status=400, content_type="application/json")
+            try:
+                output_projection = load_output_projection(settings.get('output_projection') or "")
+            except ValueError as e:
+                logger.error("Invalid output_projection setting: %s", str(e))
+                return Response(json.dumps({"error": f"Invalid output_projection setting: {str(e)}"}),
+                                status=500, content_type="application/json")
 
-            # initialize empty response
-            response = None
+            try:
+                event_filter = load_event_filter(settings.get('event_filter') or "")
+            except ValueError as e:
+                logger.error("Invalid event_filter setting: %s", str(e))
+                return Response(json.dumps({"error": f"Invalid event_filter setting: {str(e)}"}),
+                                status=500, content_type="application/json")
 
-            if route == "/chatflow/<app_id>":
-                if static_app_id:
-                    # Do not handle requests to /chatflow/<app_id> when a static app_id is defined
-                    # Static app_id is explicitly used to only expose one single app
-                    return Response(status=404, content_type="application/json")
+            try:
+                routing_table = load_routing_table(settings.get('routing_table') or "")
+            except ValueError as e:
+                logger.error("Invalid routing_table setting: %s", str(e))
+                return Response(json.dumps({"error": f"Invalid routing_table setting: {str(e)}"}),
+                                status=500, content_type="application/json")
 
-                query = request_body.get(
-                    "query", None) if explicit_inputs else inputs.pop("query", None)
-                if not query or not isinstance(query, str):
-                    logger.error("query is required and must be a string")
-                    return Response(json.dumps({"error": "query must be a string"}),
-                                    status=400, content_type="application/json")
+            refresh_cache = "no-cache" in (r.headers.get("cache-control") or "").lower()
 
-                conversation_id = request_body.get(
-                    "conversation_id") if explicit_inputs else inputs.pop("conversation_id", None)
-                if conversation_id is not None and not isinstance(conversation_id, str):
-                    logger.error(
-                        "conversation_id must be a string if provided")
-                    return Response(json.dumps({"error": "conversation_id must be a string"}),
-                                    status=400, content_type="application/json")
+            if match.handler == "bulk_workflow":
+                # The body is read line by line while the results are streamed back
+                return self._invoke_bulk(r, app_id, settings, input_mapping, output_projection, refresh_cache,
+                                         event_filter)
 
-                # Invoke chatflow
-                response = self._invoke_chatflow(
-                    dynamic_app_id, query, conversation_id, inputs)
-            elif route == "/single-chatflow":
-                query = request_body.get(
-                    "query") if explicit_inputs else inputs.pop("query", None)
-                if not query or not isinstance(query, str):
-                    logger.error("query is required and must be a string")
-                    return Response(json.dumps({"error": "query must be a string"}),
-                                    status=400, content_type="application/json")
+            form = None
+            request_body = getattr(r, 'default_middleware_json', {})
+            if not request_body and is_form_request(r):
+                form = self._parse_form(r, settings)
+                if isinstance(form, Response):
+                    return form
+                # Files are described until the event passed the filter and the validation
+                request_body = nest_inputs({**form.fields, **describe_files(form.files)})
+            elif not request_body:
+                request_body = r.get_json()
+            logger.debug("Parsed request body: %s", request_body)
+
+            try:
+                if event_filter and not event_filter.matches(r.headers, request_body):
+                    logger.info("Event does not match the event_filter, app %s is not invoked", app_id)
+                    return Response(status=204)
 
-                conversation_id = request_body.get(
-                    "conversation_id") if explicit_inputs else inputs.pop("conversation_id", None)
-                if conversation_id is not None and not isinstance(conversation_id, str):
+                inputs = self._extract_inputs(request_body, settings, input_mapping)
+                if not isinstance(inputs, dict):
                     logger.error(
-                        "conversation_id must be a string if provided")
-                    return Response(json.dumps({"error": "conversation_id must be a string"}),
+                        "Invalid inputs type: expected object, got %s", type(inputs).__name__)
+                    return Response(json.dumps({"error": "inputs must be an object"}),
                                     status=400, content_type="application/json")
 
-                # Invoke chatflow
-                response = self._invoke_chatflow(
-                    static_app_id, query, conversation_id, inputs)
+                # Chatflows keep conversations with a single app, only workflows are routed
+                app_ids = routing_table.route(r.headers, request_body) \
+                    if routing_table and match.handler == "workflow" else None
+                if app_ids:
+                    logger.info("Routing event to apps %s", ", ".join(app_ids))
 
-            elif route == "/workflow/<app_id>":
-                if static_app_id:
-                    # Do not handle requests to /chatflow/<app_id> when a static app_id is defined
-                    # Static app_id is explicitly used to only expose one single app
-                    return Response(status=404, content_type="application/json")
-                # Invoking workflow
-                response = self._invoke_workflow(
-                    dynamic_app_id, inputs, settings.get('raw_data_output', False))
+                # Invalid inputs are rejected before the request is acknowledged or queued, the
+                # handlers validate again to coerce the inputs of queued jobs and replays
+                for target in app_ids or [app_id]:
+                    validated = self._validate_inputs(target, inputs, settings)
+                    if isinstance(validated, Response):
+                        return validated
+
+                if form is not None and form.files:
+                    request_body = self._upload_form_files(form)
+                    inputs = self._extract_inputs(request_body, settings, input_mapping)
+            finally:
+                if form is not None:
+                    form.close()
+
+            async_reply = getattr(r, 'async_reply', None)
+            if async_reply:
+                # The middleware acknowledges the request right away, the app runs in the background
+                submit_background(self._reply_async, match.handler, async_reply,
+                                  app_id, request_body, inputs, settings, output_projection, refresh_cache,
+                                  app_ids)
+                return Response(status=200)
+
+            try:
+                callback_url = get_callback_url(r, request_body, settings)
+            except ValueError as e:
+                logger.error("Invalid callback URL: %s", str(e))
+                return Response(json.dumps({"error": str(e)}), status=400, content_type="application/json")
+            callback = CallbackReply(callback_url, uuid.uuid4().hex,
+                                     settings.get("callback_secret")) if callback_url else None
 
-            elif route == "/single-workflow":
-                # Invoking workflow
-                response = self._invoke_workflow(
-                    static_app_id, inputs, settings.get('raw_data_output', False))
+            job_queue_response = self._enqueue_job(match.handler, app_id, request_body, inputs, settings, callback,
+                                                   self._priority_class(r, match.handler, app_id, settings),
+                                                   app_ids)
+            if job_queue_response:
+                return job_queue_response
+
+            if callback:
+                # The caller does not wait for the result, it is posted to the callback URL
+                submit_background(self._reply_async, match.handler, callback,
+                                  app_id, request_body, inputs, settings, output_projection, refresh_cache,
+                                  app_ids)
+                return Response(json.dumps({"request_id": callback.request_id}),
+                                status=202, content_type="application/json")
+
+            response = self._invoke_handler(match.handler, app_id, request_body, inputs, settings, refresh_cache,
+                                            app_ids)
+            if isinstance(response, Response):
+                return response
 
             if not response:
                 return Response(json.dumps({"error": "Failed to get response"}), status=500, content_type="application/json")
             else:
+                # Project the response before serializing it, so dropped fields are never encoded
+                if output_projection:
+                    response = output_projection.apply(response)
                 # Return response
                 logger.debug("%s response: %s", route, response)
                 return Response(json.dumps(response), status=200, content_type="application/json")
@@ -160,6 +264,819 @@ class WebhookEndpoint(Endpoint):
             logger.error("Error during request processing: %s", str(e))
             return Response(json.dumps({"error": str(e)}), status=500, content_type="application/json")
 
+    def _extract_inputs(self, request_body: Mapping, settings: Mapping,
+                        input_mapping: Optional[InputMapping]) -> Any:
+        """
+        Extracts the inputs from the request body based on the input_mapping and explicit_inputs settings.
+
+        Args:
+            request_body: The parsed request body
+            settings: The endpoint settings
+            input_mapping: The compiled input_mapping setting
+
+        Returns:
+            The inputs, which the caller validates to be an object
+        """
+        if input_mapping:
+            return input_mapping.apply(request_body)
+        if settings.get('explicit_inputs', True):
+            return request_body.get("inputs", {})
+        return request_body.copy()
+
+    def _invoke_bulk(self, r: Request, app_id: str, settings: Mapping, input_mapping: Optional[InputMapping],
+                     output_projection: Optional[OutputProjection], refresh_cache: bool = False,
+                     event_filter: Optional[EventFilter] = None) -> Response:
+        """
+        Invokes the workflow once per line of an NDJSON body and streams one NDJSON result line per input line.
+
+        The `concurrency` query parameter limits the number of lines invoked at the same time, up to the
+        `bulk_concurrency` setting. With `ordered=false` results are streamed in completion order, each
+        result line contains the number of its input line.
+
+        Args:
+            r: The request with an NDJSON body
+            app_id: The ID of the workflow to invoke
+            settings: The endpoint settings
+            input_mapping: The compiled input_mapping setting, applied to each line
+            output_projection: The compiled output_projection setting, applied to each result
+            refresh_cache: Whether cached results are ignored
+            event_filter: The compiled event_filter setting, lines that don't match are not invoked
+
+        Returns:
+            A streamed NDJSON response
+        """
+        try:
+            max_concurrency = int(settings.get("bulk_concurrency") or 4)
+            concurrency = min(int(r.args.get("concurrency", max_concurrency)), max_concurrency)
+        except ValueError:
+            return Response(json.dumps({"error": "concurrency must be an integer"}),
+                            status=400, content_type="application/json")
+        ordered = r.args.get("ordered", "true").lower() not in ("false", "0", "no")
+        raw_data_output = settings.get('raw_data_output', False)
+
+        def process(line_number: int, line: bytes) -> Dict[str, Any]:
+            try:
+                record = parse_line(line)
+                if event_filter and not event_filter.matches(r.headers, record):
+                    return {"line": line_number, "filtered": True}
+                inputs = self._extract_inputs(record, settings, input_mapping)
+                if not isinstance(inputs, dict):
+                    raise ValueError("inputs must be an object")
+                inputs = self._validate_inputs(app_id, inputs, settings)
+                if isinstance(inputs, Response):
+                    return {"line": line_number, "error": json.loads(inputs.get_data())["error"]}
+                result = self._invoke_cached("workflow", app_id, inputs, settings, refresh_cache,
+                                             lambda: self._invoke_balanced(settings, app_id, self._invoke_workflow,
+                                                                           inputs, raw_data_output)[1])
+            except Exception as e:  # pylint: disable=broad-except
+                logger.error("Bulk line %d failed: %s", line_number, str(e))
+                return {"line": line_number, "error": str(e) or type(e).__name__}
+            if not result:
+                return {"line": line_number, "error": "Failed to get response"}
+            if output_projection:
+                result = output_projection.apply(result)
+            return {"line": line_number, "result": result}
+
+        logger.info("Streaming bulk invocation of app %s with concurrency %d", app_id, concurrency)
+        return Response(stream_results(request_stream(r), process, concurrency, ordered),
+                        status=200, content_type="application/x-ndjson")
+
+    def _parse_form(self, r: Request, settings: Mapping) -> Union[Response, FormBody]:
+        """
+        Decodes a form-urlencoded or multipart body.
+
+        File parts are spooled to disk while the body is parsed and are only uploaded by
+        `_upload_form_files`, so events that are filtered or rejected never upload files.
+        The caller closes the returned body.
+
+        Args:
+            r: The request with a form body
+            settings: The endpoint settings
+
+        Returns:
+            The form fields and files, or an error Response
+        """
+        try:
+            max_file_size_mb = settings.get("max_file_size")
+            max_file_size = int(float(max_file_size_mb) * 1024 * 1024) if max_file_size_mb else DEFAULT_MAX_FILE_SIZE
+        except ValueError:
+            return Response(json.dumps({"error": "Invalid max_file_size setting"}),
+                            status=500, content_type="application/json")
+
+        try:
+            return parse_form_body(r, max_file_size)
+        except RequestEntityTooLarge as e:
+            logger.error("Form body exceeds a limit: %s", e.description)
+            return Response(json.dumps({"error": e.description}), status=413, content_type="application/json")
+        except ValueError as e:
+            logger.error("Failed to parse form body: %s", str(e))
+            return Response(json.dumps({"error": f"Invalid form body: {str(e)}"}),
+                            status=400, content_type="application/json")
+
+    def _upload_form_files(self, form: FormBody) -> Dict[str, Any]:
+        """
+        Uploads the file parts of a form to Dify.
+
+        The files are uploaded one at a time, so at most one file is held in memory. Each
+        file field becomes a file input, or a list of file inputs if the field has several files.
+
+        Returns:
+            The request body with the form fields and file inputs
+        """
+        fields = dict(form.fields)
+        for name, files in file_parts(form.files).items():
+            uploaded = []
+            for file in files:
+                mimetype = file.mimetype or "application/octet-stream"
+                upload = self.session.file.upload(file.filename, file.stream.read(), mimetype)
+                uploaded.append(upload.to_app_parameter())
+                # Release the spool file as soon as it is uploaded
+                file.close()
+            if uploaded:
+                fields[name] = uploaded[0] if len(uploaded) == 1 else uploaded
+        return nest_inputs(fields)
+
+    def _invoke_handler(self, handler_name: str, app_id: str, request_body: Mapping, inputs: Dict[str, Any],
+                        settings: Mapping, refresh_cache: bool = False,
+                        app_ids: Optional[List[str]] = None) -> Union[Response, Dict[str, Any], None]:
+        """
+        Invokes a route handler and stores the invocation in the dead letter store if it fails.
+
+        Args:
+            handler_name: The name of the route handler, "workflow" or "chatflow"
+            app_id: The ID of the app to invoke
+            request_body: The parsed request body
+            inputs: The inputs extracted from the request body
+            settings: The endpoint settings
+            refresh_cache: Whether a cached result is ignored
+            app_ids: The apps resolved by the routing table, invoked instead of `app_id`
+
+        Returns:
+            The result of the handler
+        """
+        handler: Callable = getattr(self, f"_handle_{handler_name}")
+        # Handlers may pop fields from the inputs, keep the original ones for a replay
+        original_inputs = dict(inputs)
+        try:
+            if app_ids:
+                response = self._fan_out(handler_name, app_ids, request_body, inputs, settings, refresh_cache)
+            else:
+                response = self._invoke_cached(handler_name, app_id, original_inputs, settings, refresh_cache,
+                                               lambda: handler(app_id, request_body, inputs, settings))
+        except Overloaded as e:
+            # The sender is asked to retry, the invocation is not lost
+            logger.warning("Shed invocation of app %s: %s", app_id, str(e))
+            return Response(json.dumps({"error": str(e)}), status=503, content_type="application/json",
+                            headers={"Retry-After": "1"})
+        except Exception as e:
+            self._store_dead_letter(settings, handler_name, app_id, request_body, original_inputs,
+                                    str(e) or type(e).__name__, app_ids)
+            raise
+
+        if not isinstance(response, Response) and not response:
+            self._store_dead_letter(settings, handler_name, app_id, request_body, original_inputs,
+                                    "Failed to get response", app_ids)
+        return response
+
+    def _fan_out(self, handler_name: str, app_ids: List[str], request_body: Mapping, inputs: Dict[str, Any],
+                 settings: Mapping, refresh_cache: bool = False) -> Dict[str, Any]:
+        """
+        Invokes the apps resolved by the routing table concurrently.
+
+        Depending on the `mode` of the routing table, the results of all apps are aggregated,
+        or the result of the first app that succeeded is returned. When some of the apps
+        failed while others succeeded, each failed app is stored as its own dead letter, so
+        a replay only invokes the apps that failed.
+
+        Args:
+            handler_name: The name of the route handler
+            app_ids: The apps to invoke
+            request_body: The parsed request body
+            inputs: The inputs extracted from the request body
+            settings: The endpoint settings
+            refresh_cache: Whether cached results are ignored
+
+        Returns:
+            The aggregated response
+
+        Raises:
+            RuntimeError: If every app failed
+        """
+        handler: Callable = getattr(self, f"_handle_{handler_name}")
+        routing_table = load_routing_table(settings.get('routing_table') or "")
+
+        def invoke(target: str) -> Any:
+            response = self._invoke_cached(handler_name, target, inputs, settings, refresh_cache,
+                                           lambda: handler(target, request_body, dict(inputs), settings))
+            if isinstance(response, Response):
+                raise RuntimeError(response.get_data(as_text=True) or f"Status {response.status_code}")
+            return response
+
+        response = fan_out(app_ids, invoke, routing_table.mode if routing_table else "all")
+        for target, error in response.get("errors", {}).items():
+            self._store_dead_letter(settings, handler_name, target, request_body, inputs, error)
+        return response
+
+    def _invoke_cached(self, handler_name: str, app_id: str, inputs: Dict[str, Any], settings: Mapping,
+                       refresh_cache: bool, invoke: Callable[[], Any]) -> Any:
+        """
+        Returns the cached result of a workflow invocation for the same inputs, if the app is
+        listed in the `result_cache_apps` setting. Otherwise calls `invoke` and caches its result.
+
+        Args:
+            handler_name: The name of the route handler, only workflow results are cached
+            app_id: The ID of the app to invoke
+            inputs: The inputs of the invocation, the cache key
+            settings: The endpoint settings
+            refresh_cache: Whether a cached result is ignored, the new result is cached
+            invoke: Invokes the app
+
+        Returns:
+            The cached result, or the result of `invoke`
+        """
+        cached_apps = settings.get("result_cache_apps")
+        if handler_name != "workflow" or not cached_apps or not is_cached_app(app_id, cached_apps):
+            return invoke()
+
+        key = cache_key(app_id, inputs, bool(settings.get('raw_data_output', False)))
+        try:
+            cache = get_result_cache(float(settings.get("result_cache_size_mb") or DEFAULT_RESULT_CACHE_SIZE_MB),
+                                     settings.get("state_store") or "")
+            result = None if refresh_cache else cache.get(key)
+        except sqlite3.Error as e:
+            logger.error("Result cache is unavailable: %s", str(e))
+            return invoke()
+        if result is not None:
+            logger.debug("Result cache hit for app %s", app_id)
+            return result
+
+        result = invoke()
+        # Failed and rejected invocations are not cached, neither are runs that failed or were stopped
+        if result and not isinstance(result, Response) and is_succeeded_run(result):
+            try:
+                cache.set(key, result, float(settings.get("result_cache_ttl") or DEFAULT_RESULT_CACHE_TTL))
+            except sqlite3.Error as e:
+                logger.error("Failed to cache the result of app %s: %s", app_id, str(e))
+        return result
+
+    def _store_dead_letter(self, settings: Mapping, handler_name: str, app_id: str, request_body: Mapping,
+                           inputs: Dict[str, Any], error: str, app_ids: Optional[List[str]] = None) -> None:
+        """
+        Appends a failed invocation to the dead letter store, if one is configured.
+
+        Errors of the store are logged, so they never hide the error of the invocation. The
+        apps of a fan-out are stored with the dead letter, so a replay invokes all of them.
+        """
+        try:
+            store = get_dead_letter_store(settings.get("dead_letter_store") or "")
+            if store is not None:
+                dead_letter_id = store.add(handler_name, app_id, request_body, inputs, error, app_ids=app_ids,
+                                           endpoint=self._endpoint_id())
+                logger.warning("Stored failed invocation of app %s as dead letter %s", app_id, dead_letter_id)
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logger.error("Failed to store dead letter for app %s: %s", app_id, str(e))
+
+    def _priority_class(self, r: Request, handler_name: str, app_id: str, settings: Mapping) -> Optional[str]:
+        """
+        Resolves the priority class of a request from the `priority_classes` setting, the
+        X-Priority-Class header and the tier of the API key.
+
+        Returns:
+            The priority class, or None if the setting is invalid
+        """
+        try:
+            config = load_priority_config(settings.get("priority_classes") or "")
+        except ValueError as e:
+            logger.error("Invalid priority_classes setting: %s", str(e))
+            return None
+        api_key_info = getattr(r, 'api_key_info', None)
+        return config.classify(handler_name, app_id, api_key_info.tier if api_key_info else None,
+                               r.headers.get("x-priority-class"))
+
+    def _enqueue_job(self, handler_name: str, app_id: str, request_body: Mapping, inputs: Dict[str, Any],
+                     settings: Mapping, callback: Optional[CallbackReply] = None,
+                     priority_class: Optional[str] = None, app_ids: Optional[List[str]] = None) -> Optional[Response]:
+        """
+        Persists the invocation in the job queue, if one is configured.
+
+        The request is acknowledged once the job is committed, and the queue workers invoke
+        the app with at-least-once delivery. Jobs that exhaust their attempts are moved to
+        the dead letter store. If the request has a callback, the result is posted to it.
+
+        Returns:
+            A 202 response with the job ID, an error response, or None if no queue is configured
+        """
+        try:
+            job_queue = get_job_queue(settings.get("job_queue") or "")
+            if job_queue is None:
+                return None
+            self._bind_job_queue(job_queue, settings)
+            job_queue.start_workers()
+            payload = {"handler": handler_name, "app_id": app_id, "request_body": request_body, "inputs": inputs}
+            if callback:
+                payload.update(callback_url=callback.url, request_id=callback.request_id)
+            if app_ids:
+                payload["app_ids"] = app_ids
+            if priority_class is None:
+                return Response(json.dumps({"error": "Invalid priority_classes setting"}),
+                                status=500, content_type="application/json")
+            # Weights can change with the settings, the queue is shared
+            job_queue.set_weights(load_priority_config(settings.get("priority_classes") or "").weights)
+            job_id = job_queue.enqueue(payload, priority_class, endpoint=self._endpoint_id())
+        except (sqlite3.Error, TimeoutError) as e:
+            logger.error("Failed to enqueue job for app %s: %s", app_id, str(e))
+            return Response(json.dumps({"error": "Job queue is unavailable"}),
+                            status=503, content_type="application/json")
+
+        logger.info("Enqueued job %s for app %s", job_id, app_id)
+        body = {"job_id": job_id}
+        if callback:
+            body["request_id"] = callback.request_id
+        return Response(json.dumps(body), status=202, content_type="application/json")
+
+    def _endpoint_id(self) -> str:
+        """
+        Returns the ID of the endpoint that the session belongs to, or an empty string.
+        """
+        return getattr(self.session, "endpoint_id", None) or ""
+
+    def _bind_job_queue(self, job_queue: JobQueue, settings: Mapping) -> None:
+        """
+        Binds the settings and the session of this request to the jobs of its endpoint.
+
+        Apps can only be invoked through the session of a request, so workers process the jobs
+        of an endpoint with the session of its latest request, and never with the session or
+        the settings of another endpoint that shares the queue file. Jobs left over from a
+        restart wait for the next request to their endpoint, or for POST /jobs/run.
+        """
+        job_queue.bind(lambda job: self._process_job(job, settings),
+                       lambda job, error: self._fail_job(job, error, settings), self._endpoint_id())
+
+    def _job_callback(self, job: Job, settings: Mapping) -> Optional[CallbackReply]:
+        """
+        Returns the callback of a queued job, or None if the job has no callback.
+        """
+        callback_url = job.payload.get("callback_url")
+        if not callback_url:
+            return None
+        return CallbackReply(callback_url, job.payload.get("request_id") or str(job.id),
+                             settings.get("callback_secret"))
+
+    def _process_job(self, job: Job, settings: Mapping) -> None:
+        """
+        Invokes the app of a queued job.
+
+        Raises:
+            RuntimeError: If the app returned no response, so the job is retried
+        """
+        payload = job.payload
+        if payload.get("app_ids"):
+            response = self._fan_out(payload["handler"], payload["app_ids"], payload["request_body"],
+                                     payload["inputs"], settings)
+        else:
+            handler: Callable = getattr(self, f"_handle_{payload['handler']}")
+            response = handler(payload["app_id"], payload["request_body"], dict(payload["inputs"]), settings)
+        callback = self._job_callback(job, settings)
+        if isinstance(response, Response):
+            # Invalid requests won't succeed on a retry
+            logger.error("Job %s was rejected: %s", job.id, response.get_data(as_text=True))
+            if callback:
+                callback.fail(response.get_data(as_text=True))
+            return
+        if not response:
+            raise RuntimeError("Failed to get response")
+        logger.info("Job %s completed", job.id)
+
+        if callback:
+            output_projection = load_output_projection(settings.get('output_projection') or "")
+            callback.deliver(output_projection.apply(response) if output_projection else response)
+
+    def _fail_job(self, job: Job, error: str, settings: Mapping) -> None:
+        """
+        Moves a job that exhausted its attempts to the dead letter store and reports it to its callback.
+        """
+        payload = job.payload
+        self._store_dead_letter(settings, payload["handler"], payload["app_id"],
+                                payload["request_body"], payload["inputs"], error, payload.get("app_ids"))
+        callback = self._job_callback(job, settings)
+        if callback:
+            callback.fail(error)
+
+    def _invoke_admin(self, r: Request, handler_name: str, settings: Mapping,
+                      authenticate: bool = True) -> Response:
+        """
+        Handles the admin routes, which are authenticated with the admin API key.
+
+        Args:
+            r: The request
+            handler_name: The name of the admin handler
+            settings: The endpoint settings
+            authenticate: Whether the route requires the admin API key
+
+        Returns:
+            The response of the admin handler
+        """
+        if authenticate:
+            admin_response = validate_admin_key(r, settings)
+            if admin_response:
+                return admin_response
+
+        try:
+            return getattr(self, f"_admin_{handler_name}")(r, settings)
+        except sqlite3.Error as e:
+            logger.error("Admin request failed: %s", str(e))
+            return Response(json.dumps({"error": f"Admin request failed: {str(e)}"}),
+                            status=500, content_type="application/json")
+        except (TypeError, ValueError) as e:
+            return Response(json.dumps({"error": str(e)}), status=400, content_type="application/json")
+
+    @staticmethod
+    def _not_configured(name: str) -> Response:
+        return Response(json.dumps({"error": f"{name} is not configured"}),
+                        status=404, content_type="application/json")
+
+    def _admin_list_dead_letters(self, r: Request, settings: Mapping) -> Response:
+        """
+        Lists the dead letters of this endpoint, paginated with the `limit` and `after_id` query parameters.
+        """
+        store = get_dead_letter_store(settings.get("dead_letter_store") or "")
+        if store is None:
+            return self._not_configured("Dead letter store")
+
+        limit = int(r.args.get("limit", 100))
+        after_id = int(r.args.get("after_id", 0))
+        dead_letters = [dead_letter.to_dict() for dead_letter in store.list(limit, after_id,
+                                                                              endpoint=self._endpoint_id())]
+        return Response(json.dumps({"dead_letters": dead_letters}), status=200, content_type="application/json")
+
+    def _admin_replay_dead_letters(self, r: Request, settings: Mapping) -> Response:
+        """
+        Replays the dead letters of this endpoint with the current settings.
+
+        The request body may contain `ids` to replay specific dead letters, `limit` for the
+        maximum number of dead letters, at most MAX_REPLAY_LIMIT, and `concurrency` for the
+        number of concurrent invocations. Dead letters that were not started within
+        REPLAY_BUDGET seconds are returned as pending, so the request ends before it times out.
+        """
+        store = get_dead_letter_store(settings.get("dead_letter_store") or "")
+        if store is None:
+            return self._not_configured("Dead letter store")
+
+        body = r.get_json(silent=True) or {}
+        ids = body.get("ids")
+        if ids is not None and (not isinstance(ids, list) or not all(isinstance(i, int) for i in ids)):
+            raise ValueError("ids must be a list of integers")
+
+        limit = min(int(body.get("limit", MAX_REPLAY_LIMIT)), MAX_REPLAY_LIMIT)
+        dead_letters = store.list(limit, ids=ids, endpoint=self._endpoint_id())
+        result = replay(store, lambda dead_letter: self._replay_dead_letter(dead_letter, settings),
+                        dead_letters, int(body.get("concurrency", 4)), time.time() + REPLAY_BUDGET)
+        logger.info("Replayed %d dead letters, %d failed, %d pending", len(result["replayed"]),
+                    len(result["failed"]), len(result["pending"]))
+        return Response(json.dumps(result), status=200, content_type="application/json")
+
+    def _admin_job_stats(self, r: Request, settings: Mapping) -> Response:
+        """
+        Returns the depth, weight and wait times of each priority class of the job queue.
+        """
+        job_queue = get_job_queue(settings.get("job_queue") or "")
+        if job_queue is None:
+            return self._not_configured("Job queue")
+        job_queue.set_weights(load_priority_config(settings.get("priority_classes") or "").weights)
+        return Response(json.dumps({"priority_classes": job_queue.stats()}),
+                        status=200, content_type="application/json")
+
+    def _admin_run_jobs(self, r: Request, settings: Mapping) -> Response:
+        """
+        Processes the waiting jobs of this endpoint within the session of the admin request,
+        for at most JOB_RUN_BUDGET seconds, and returns the number of processed and remaining jobs.
+        """
+        job_queue = get_job_queue(settings.get("job_queue") or "")
+        if job_queue is None:
+            return self._not_configured("Job queue")
+        self._bind_job_queue(job_queue, settings)
+        processed = job_queue.drain(self._endpoint_id(), time.time() + JOB_RUN_BUDGET)
+        return Response(json.dumps({"processed": processed, "remaining": job_queue.count(self._endpoint_id())}),
+                        status=200, content_type="application/json")
+
+    def _admin_cache_stats(self, r: Request, settings: Mapping) -> Response:
+        """
+        Returns the size and the hit and miss counts of the result cache.
+        """
+        if not settings.get("result_cache_apps"):
+            return self._not_configured("Result cache")
+        cache = get_result_cache(float(settings.get("result_cache_size_mb") or DEFAULT_RESULT_CACHE_SIZE_MB),
+                                 settings.get("state_store") or "")
+        return Response(json.dumps(cache.stats()), status=200, content_type="application/json")
+
+    def _admin_ready(self, r: Request, settings: Mapping) -> Response:
+        """
+        Returns 200 once the warm-up of the plugin has finished, 503 before or if a step
+        failed, with the duration of the warm-up steps and the errors of the failed steps.
+        Served without the admin API key, so health checks work on every endpoint.
+        """
+        state = readiness()
+        headers = {} if state["ready"] else {"Retry-After": "1"}
+        return Response(json.dumps(state), status=200 if state["ready"] else 503,
+                        headers=headers, content_type="application/json")
+
+    def _replay_dead_letter(self, dead_letter: DeadLetter, settings: Mapping) -> Optional[str]:
+        """
+        Invokes the app of a dead letter again.
+
+        Returns:
+            An error message if the invocation failed again, otherwise None
+        """
+        if dead_letter.app_ids:
+            # Raises if every app failed again, the replay records the error
+            response = self._fan_out(dead_letter.handler, dead_letter.app_ids, dead_letter.request_body,
+                                     dict(dead_letter.inputs), settings)
+        else:
+            handler: Callable = getattr(self, f"_handle_{dead_letter.handler}")
+            response = handler(dead_letter.app_id, dead_letter.request_body, dict(dead_letter.inputs), settings)
+        if isinstance(response, Response):
+            return response.get_data(as_text=True) or f"Status {response.status_code}"
+        if not response:
+            return "Failed to get response"
+        return None
+
+    def _reply_async(self, handler_name: str, async_reply: AsyncReply, app_id: str, request_body: Mapping,
+                     inputs: Dict[str, Any], settings: Mapping,
+                     output_projection: Optional[OutputProjection], refresh_cache: bool = False,
+                     app_ids: Optional[List[str]] = None) -> None:
+        """
+        Invokes the app in the background and posts the result to the reply URL.
+
+        Args:
+            handler_name: The name of the route handler that invokes the app
+            async_reply: Where the result is posted to
+            app_id: The ID of the app to invoke
+            request_body: The parsed request body
+            inputs: The inputs extracted from the request body
+            settings: The endpoint settings
+            output_projection: The projection applied to the result before it is posted
+            refresh_cache: Whether a cached result is ignored
+            app_ids: The apps resolved by the routing table, invoked instead of `app_id`
+        """
+        try:
+            response = self._invoke_handler(handler_name, app_id, request_body, inputs, settings, refresh_cache,
+                                            app_ids)
+        except Exception as e:
+            async_reply.fail(str(e) or type(e).__name__)
+            raise
+
+        if isinstance(response, Response):
+            async_reply.fail(response.get_data(as_text=True))
+            return
+        if not response:
+            async_reply.fail("Failed to get response")
+            return
+
+        if output_projection:
+            response = output_projection.apply(response)
+        async_reply.deliver(response)
+
+    def _handle_chatflow(self, app_id: str, request_body: Mapping, inputs: Dict[str, Any],
+                         settings: Mapping) -> Union[Response, Dict[str, Any]]:
+        """
+        Handles the chatflow routes by extracting the query and conversation_id from the request.
+
+        Args:
+            app_id: The ID of the chatflow to invoke
+            request_body: The parsed request body
+            inputs: The inputs extracted from the request body
+            settings: The endpoint settings
+
+        Returns:
+            The chatflow response, or an error Response if the request is invalid
+        """
+        # Mapped inputs may provide query and conversation_id just like a non-explicit body
+        explicit_inputs = settings.get('explicit_inputs', True) and not settings.get('input_mapping')
+
+        query = request_body.get(
+            "query") if explicit_inputs else inputs.pop("query", None)
+        if not query or not isinstance(query, str):
+            logger.error("query is required and must be a string")
+            return Response(json.dumps({"error": "query must be a string"}),
+                            status=400, content_type="application/json")
+
+        conversation_id = request_body.get(
+            "conversation_id") if explicit_inputs else inputs.pop("conversation_id", None)
+        if conversation_id is not None and not isinstance(conversation_id, str):
+            logger.error(
+                "conversation_id must be a string if provided")
+            return Response(json.dumps({"error": "conversation_id must be a string"}),
+                            status=400, content_type="application/json")
+
+        inputs = self._validate_inputs(app_id, inputs, settings)
+        if isinstance(inputs, Response):
+            return inputs
+
+        affinity = self._conversation_affinity(app_id, request_body, settings)
+        if affinity and conversation_id is None:
+            conversation_id = affinity[0].get(affinity[1])
+            logger.debug("Conversation affinity %s continues conversation %s", affinity[1], conversation_id)
+
+        # Conversations only exist on the replica that created them, unknown ones on the app itself
+        owners = self._conversation_owners(settings) if self._replica_group(app_id, settings) else None
+        replica = None
+        if owners is not None and conversation_id:
+            replica = owners.get(f"replica:{conversation_id}") or app_id
+
+        try:
+            replica, response = self._invoke_balanced(settings, app_id, self._invoke_chatflow,
+                                                      query, conversation_id, inputs, replica=replica)
+        except Exception:
+            if affinity:
+                # The conversation may be gone, the next message starts a new one
+                affinity[0].delete(affinity[1])
+            raise
+
+        if isinstance(response, dict) and response.get("conversation_id"):
+            if affinity:
+                affinity[0].set(affinity[1], response["conversation_id"])
+            if owners is not None:
+                owners.set(f"replica:{response['conversation_id']}", replica)
+        return response
+
+    def _validate_inputs(self, app_id: str, inputs: Dict[str, Any],
+                         settings: Mapping) -> Union[Response, Dict[str, Any]]:
+        """
+        Validates and coerces the inputs against the input variables of the app, if `validate_inputs` is enabled.
+
+        The input variables are fetched from Dify once and cached. If they can't be fetched,
+        the inputs are passed on unchecked.
+
+        Returns:
+            The coerced inputs, or a 400 response describing the invalid inputs
+        """
+        if not settings.get("validate_inputs"):
+            return inputs
+        schema = get_schema_cache().get(app_id, self.session.app.fetch_app)
+        if schema is None:
+            return inputs
+        try:
+            return schema.validate(inputs)
+        except ValueError as e:
+            logger.error("Invalid inputs for app %s: %s", app_id, str(e))
+            return Response(json.dumps({"error": f"Invalid inputs: {str(e)}"}),
+                            status=400, content_type="application/json")
+
+    def _replica_group(self, app_id: str, settings: Mapping) -> Optional[Tuple[str, ...]]:
+        """
+        Returns the replicas of an app from the `replica_groups` setting, or None if the app has no replicas.
+        """
+        try:
+            return load_replica_groups(settings.get("replica_groups") or "").get(app_id)
+        except ValueError as e:
+            logger.error("Invalid replica_groups setting: %s", str(e))
+            return None
+
+    def _conversation_owners(self, settings: Mapping) -> Optional[ConversationCache]:
+        """
+        Returns the cache that maps conversation IDs to the replica that created them.
+        """
+        try:
+            return get_conversation_cache(settings.get("conversation_store") or "",
+                                          float(settings.get("conversation_ttl") or DEFAULT_CONVERSATION_TTL),
+                                          settings.get("state_store") or "")
+        except (ValueError, sqlite3.Error) as e:
+            logger.error("Conversation owners are unavailable: %s", str(e))
+            return None
+
+    def _invoke_balanced(self, settings: Mapping, app_id: str, invoke: Callable, *args: Any,
+                         replica: Optional[str] = None) -> Tuple[str, Any]:
+        """
+        Invokes an app, or one of its replicas from the `replica_groups` setting.
+
+        The adaptive concurrency limit applies to the whole group.
+
+        Args:
+            settings: The endpoint settings
+            app_id: The ID of the app
+            invoke: Invokes Dify with the app ID and the remaining arguments
+            replica: The replica to invoke, otherwise the balancer chooses one
+
+        Returns:
+            The ID of the invoked app and the result
+        """
+        group = self._replica_group(app_id, settings)
+        if not group:
+            return app_id, self._invoke_limited(settings, app_id, invoke, app_id, *args)
+        balancer = get_replica_balancer(group, settings.get("state_store") or "")
+
+        def invoke_replica() -> Tuple[str, Any]:
+            chosen = replica if replica in group else balancer.choose()
+            with balancer.track(chosen):
+                return chosen, invoke(chosen, *args)
+
+        return self._invoke_limited(settings, app_id, invoke_replica)
+
+    def _conversation_affinity(self, app_id: str, request_body: Mapping,
+                               settings: Mapping) -> Optional[Tuple[ConversationCache, str]]:
+        """
+        Resolves the conversation cache and the affinity key of a chatflow request.
+
+        The affinity key is read from the request body with the `conversation_affinity_key`
+        path expression, and is scoped to the app.
+
+        Returns:
+            The cache and the affinity key, or None if the request has no affinity key
+        """
+        path = settings.get("conversation_affinity_key")
+        if not path:
+            return None
+        try:
+            value = compile_path(path).get(request_body, None)
+            if value is None or isinstance(value, (dict, list)):
+                return None
+            cache = get_conversation_cache(settings.get("conversation_store") or "",
+                                           float(settings.get("conversation_ttl") or DEFAULT_CONVERSATION_TTL),
+                                           settings.get("state_store") or "")
+        except (ValueError, sqlite3.Error) as e:
+            logger.error("Conversation affinity is unavailable: %s", str(e))
+            return None
+        return cache, f"{app_id}:{value}"
+
+    def _handle_workflow(self, app_id: str, request_body: Mapping, inputs: Dict[str, Any],
+                         settings: Mapping) -> Union[Response, Dict[str, Any]]:
+        """
+        Handles the workflow routes.
+
+        Args:
+            app_id: The ID of the workflow to invoke
+            request_body: The parsed request body
+            inputs: The inputs extracted from the request body
+            settings: The endpoint settings
+
+        Returns:
+            The workflow response
+        """
+        inputs = self._validate_inputs(app_id, inputs, settings)
+        if isinstance(inputs, Response):
+            return inputs
+        if settings.get("batch_window_ms"):
+            return self._invoke_batched(app_id, request_body, inputs, settings)
+        return self._invoke_balanced(settings, app_id, self._invoke_workflow,
+                                     inputs, settings.get('raw_data_output', False))[1]
+
+    def _invoke_batched(self, app_id: str, request_body: Mapping, inputs: Dict[str, Any],
+                        settings: Mapping) -> Union[Response, Dict[str, Any]]:
+        """
+        Adds the inputs to a micro batch and waits for the result of the batch.
+
+        Requests for the same app and `batch_group_key` value within `batch_window_ms` are
+        invoked together, up to `batch_max_items` requests. The workflow receives the inputs of
+        all requests as a JSON array string in the `batch_input` variable.
+
+        Args:
+            app_id: The ID of the workflow to invoke
+            request_body: The parsed request body
+            inputs: The inputs extracted from the request body
+            settings: The endpoint settings
+
+        Returns:
+            The slice of the batch result at `batch_result_path` for this request, or the whole batch result
+        """
+        try:
+            window_ms = float(settings["batch_window_ms"])
+            if window_ms <= 0:
+                return self._invoke_balanced(settings, app_id, self._invoke_workflow,
+                                             inputs, settings.get('raw_data_output', False))[1]
+            batcher = get_micro_batcher(window_ms, int(settings.get("batch_max_items") or 100))
+            group_path = settings.get("batch_group_key")
+            group = compile_path(group_path).get(request_body, None) if group_path else None
+        except ValueError as e:
+            logger.error("Invalid batch settings: %s", str(e))
+            return Response(json.dumps({"error": f"Invalid batch settings: {str(e)}"}),
+                            status=500, content_type="application/json")
+
+        batch_input = settings.get("batch_input") or "events"
+        raw_data_output = settings.get('raw_data_output', False)
+        result_path = settings.get("batch_result_path")
+
+        def invoke(items: list) -> list:
+            response = self._invoke_balanced(settings, app_id, self._invoke_workflow,
+                                             {batch_input: json.dumps(items)}, raw_data_output)[1]
+            return split_batch_result(response, len(items), result_path)
+
+        key = (app_id, json.dumps(group, sort_keys=True), batch_input, raw_data_output, result_path)
+        return batcher.submit(key, inputs, invoke)
+
+    def _invoke_limited(self, settings: Mapping, app_id: str, invoke: Callable, *args: Any) -> Any:
+        """
+        Calls an invocation of Dify under the adaptive concurrency limit of the app,
+        if `adaptive_concurrency` is enabled.
+
+        Raises:
+            Overloaded: If the invocation was shed because the app is overloaded
+        """
+        if not settings.get("adaptive_concurrency"):
+            return invoke(*args)
+        target_ms = float(settings.get("queue_delay_target_ms") or 500)
+        with get_adaptive_limiter(app_id, target_ms).acquire():
+            return invoke(*args)
+
     def _invoke_chatflow(self, app_id: str, query: str, conversation_id: Optional[str], inputs: Dict[str, Any]) -> Dict[str, Any]:
         """
         Invokes a Dify chatflow with the given parameters.
@@ -204,4 +1121,11 @@ class WebhookEndpoint(Endpoint):
         )
 
         # Process workflow response if raw_data_output is enabled
-        return dify_response["data"]["outputs"] if raw_data_output else dify_response
+        if not raw_data_output:
+            return dify_response
+
+        outputs = (dify_response.get("data") or {}).get("outputs") if isinstance(dify_response, dict) else None
+        if outputs is None:
+            logger.warning("Workflow response has no data.outputs, returning the full response")
+            return dify_response
+        return outputs
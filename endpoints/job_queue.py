@@ -0,0 +1,365 @@
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from functools import lru_cache
+from typing import Any, Callable, Collection, Dict, List, Mapping, NamedTuple, Optional, Tuple
+from endpoints.scheduler import DEFAULT_CLASS, FairScheduler
+
+logger = logging.getLogger(__name__)
+
+# Number of threads that process jobs of a queue
+JOB_WORKERS = 4
+
+# Seconds that POST /jobs/run leases jobs, below the request timeout of the plugin
+JOB_RUN_BUDGET = 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    visible_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    priority_class TEXT NOT NULL DEFAULT 'default',
+    endpoint TEXT NOT NULL DEFAULT ''
+)
+"""
+
+
+class Job(NamedTuple):
+    """
+    A job leased from the queue.
+
+    Attributes:
+        id: The ID of the job
+        payload: The payload the job was enqueued with
+        created_at: Unix timestamp of the enqueue
+        attempts: The number of times the job was leased, including this lease
+        priority_class: The priority class the job was scheduled in
+        endpoint: The ID of the endpoint that enqueued the job
+    """
+    id: int
+    payload: Dict[str, Any]
+    created_at: float
+    attempts: int
+    priority_class: str = DEFAULT_CLASS
+    endpoint: str = ""
+
+
+class JobQueue:
+    """
+    Durable job queue backed by SQLite in WAL mode, with at-least-once delivery.
+
+    A job is leased by `dequeue` and becomes visible again when it is not acknowledged
+    within the visibility timeout, so jobs of a crashed worker or of a restarted plugin
+    process are delivered again.
+
+    Enqueues are group committed: a single writer thread inserts all pending jobs in one
+    transaction, so the cost of the fsync is shared by all requests that arrived in the
+    meantime. `enqueue` only returns after the commit, which makes the acknowledgment of
+    the request durable.
+
+    Jobs are leased in FIFO order within their priority class, and the classes are served
+    by a FairScheduler according to their weights, so the backlog of one class does not
+    starve the others.
+
+    Endpoints that share the queue file have their own settings and sessions, so each job
+    belongs to the endpoint that enqueued it, and is only processed with the callbacks that
+    endpoint bound with `bind`. Workers may be started before any callbacks are bound, e.g.
+    at boot, and only lease jobs of endpoints whose callbacks are bound.
+    """
+
+    def __init__(self, path: str, visibility_timeout: float = 300, max_attempts: int = 5,
+                 max_batch: int = 256, poll_interval: float = 1.0):
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.max_batch = max_batch
+        self.poll_interval = poll_interval
+
+        self._lock = threading.Lock()
+        self._connection = self._connect()
+        self._connection.execute(_SCHEMA)
+        columns = {row[1] for row in self._connection.execute("PRAGMA table_info(jobs)")}
+        if "priority_class" not in columns:
+            self._connection.execute(
+                "ALTER TABLE jobs ADD COLUMN priority_class TEXT NOT NULL DEFAULT 'default'")
+        if "endpoint" not in columns:
+            self._connection.execute("ALTER TABLE jobs ADD COLUMN endpoint TEXT NOT NULL DEFAULT ''")
+        self._connection.execute("DROP INDEX IF EXISTS jobs_visible_at")
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_class_visible_at ON jobs (priority_class, visible_at, id)")
+        self.scheduler = FairScheduler()
+
+        self._pending: "queue.Queue[Tuple[str, str, str, Future]]" = queue.Queue()
+        self._available = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+        self._workers: List[threading.Thread] = []
+        self._processors: Dict[str, Tuple[Callable[[Job], None], Optional[Callable[[Job, str], None]]]] = {}
+        self._bound = threading.Event()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=FULL")
+        return connection
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+    def count(self, endpoint: str = "") -> int:
+        """
+        Returns the number of jobs of an endpoint, including leased jobs.
+        """
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM jobs WHERE endpoint = ?", (endpoint,)).fetchone()[0]
+
+    def enqueue(self, payload: Dict[str, Any], priority_class: str = DEFAULT_CLASS,
+                timeout: Optional[float] = 30, endpoint: str = "") -> int:
+        """
+        Appends a job and waits until it is committed.
+
+        Args:
+            payload: The JSON serializable payload of the job
+            priority_class: The priority class the job is scheduled in
+            timeout: The maximum time to wait for the commit in seconds
+            endpoint: The ID of the endpoint whose callbacks process the job
+
+        Returns:
+            The ID of the job
+        """
+        serialized = json.dumps(payload)
+        future: Future = Future()
+        self._start_writer()
+        self._pending.put((serialized, priority_class, endpoint, future))
+        return future.result(timeout)
+
+    def _start_writer(self) -> None:
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="webhook-queue-writer", daemon=True)
+                self._writer.start()
+
+    def _write_loop(self) -> None:
+        connection = self._connect()
+        while True:
+            batch = [self._pending.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._pending.get_nowait())
+                except queue.Empty:
+                    break
+
+            now = time.time()
+            try:
+                connection.execute("BEGIN IMMEDIATE")
+                ids = [connection.execute(
+                    "INSERT INTO jobs (payload, created_at, visible_at, priority_class, endpoint) VALUES (?, ?, ?, ?, ?)",
+                    (payload, now, now, priority_class, endpoint),
+                ).lastrowid for payload, priority_class, endpoint, _ in batch]
+                connection.execute("COMMIT")
+            except sqlite3.Error as e:
+                logger.error("Failed to commit %d jobs: %s", len(batch), e)
+                if connection.in_transaction:
+                    connection.execute("ROLLBACK")
+                for *_, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (*_, future), job_id in zip(batch, ids):
+                future.set_result(job_id)
+            self._available.set()
+
+    def dequeue(self, now: Optional[float] = None, endpoints: Optional[Collection[str]] = None) -> Optional[Job]:
+        """
+        Leases the oldest visible job of the priority class chosen by the scheduler for the
+        visibility timeout.
+
+        Args:
+            now: The current Unix timestamp
+            endpoints: Only lease jobs of these endpoints, jobs of all endpoints if None
+
+        Returns:
+            The leased job, or None if no job is visible
+        """
+        now = time.time() if now is None else now
+        if endpoints is not None and not endpoints:
+            return None
+        condition, parameters = "visible_at <= ?", [now]
+        if endpoints is not None:
+            condition += f" AND endpoint IN ({', '.join('?' * len(endpoints))})"
+            parameters.extend(endpoints)
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                heads = dict(self._connection.execute(
+                    f"SELECT priority_class, MIN(id) FROM jobs WHERE {condition} GROUP BY priority_class",
+                    parameters,
+                ).fetchall())
+                priority_class = self.scheduler.choose(heads)
+                row = None
+                if priority_class is not None:
+                    row = self._connection.execute(
+                        "SELECT id, payload, created_at, attempts, endpoint FROM jobs WHERE id = ?",
+                        (heads[priority_class],),
+                    ).fetchone()
+                if row is not None:
+                    self._connection.execute(
+                        "UPDATE jobs SET visible_at = ?, attempts = attempts + 1 WHERE id = ?",
+                        (now + self.visibility_timeout, row[0]),
+                    )
+                self._connection.execute("COMMIT")
+            except sqlite3.Error:
+                self._connection.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        self.scheduler.record_wait(priority_class, max(now - row[2], 0.0))
+        return Job(id=row[0], payload=json.loads(row[1]), created_at=row[2], attempts=row[3] + 1,
+                   priority_class=priority_class, endpoint=row[4])
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns the queue depth and the wait time statistics of each priority class.
+        """
+        with self._lock:
+            depths = dict(self._connection.execute(
+                "SELECT priority_class, COUNT(*) FROM jobs GROUP BY priority_class").fetchall())
+        wait_stats = self.scheduler.stats()
+        return {
+            priority_class: {"depth": depths.get(priority_class, 0), "weight": self.scheduler.weight(priority_class),
+                             **wait_stats.get(priority_class, {})}
+            for priority_class in sorted(set(depths) | set(wait_stats))
+        }
+
+    def set_weights(self, weights: Mapping[str, float]) -> None:
+        """
+        Replaces the weights of the priority classes.
+        """
+        self.scheduler.weights = dict(weights)
+
+    def ack(self, job_id: int) -> None:
+        """
+        Removes a job after it was processed.
+        """
+        with self._lock:
+            self._connection.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def nack(self, job_id: int, delay: float = 0, now: Optional[float] = None) -> None:
+        """
+        Makes a leased job visible again after the delay.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            self._connection.execute("UPDATE jobs SET visible_at = ? WHERE id = ?", (now + delay, job_id))
+
+    def bind(self, process: Callable[[Job], None], on_dead: Optional[Callable[[Job, str], None]] = None,
+             endpoint: str = "") -> None:
+        """
+        Binds the callbacks that process the jobs of an endpoint, or replaces them.
+
+        Args:
+            process: Processes a job, raises an exception if the job should be retried
+            on_dead: Called with the job and the error once a job exhausted its attempts
+            endpoint: The ID of the endpoint whose jobs the callbacks process
+        """
+        with self._lock:
+            self._processors[endpoint] = (process, on_dead)
+        self._bound.set()
+
+    def drain(self, endpoint: str = "", deadline: Optional[float] = None) -> int:
+        """
+        Processes the visible jobs of an endpoint in the calling thread, with its bound callbacks.
+
+        Args:
+            endpoint: The ID of the endpoint
+            deadline: Unix timestamp after which no further job is leased
+
+        Returns:
+            The number of processed jobs
+        """
+        processed = 0
+        while deadline is None or time.time() < deadline:
+            job = self.dequeue(endpoints=(endpoint,))
+            if job is None:
+                break
+            self.run_job(job)
+            processed += 1
+        return processed
+
+    def start_workers(self, workers: int = JOB_WORKERS) -> None:
+        """
+        Starts the worker threads, which wait until callbacks are bound with `bind`.
+
+        Args:
+            workers: The number of worker threads
+        """
+        with self._lock:
+            while len(self._workers) < workers:
+                worker = threading.Thread(target=self._work_loop, daemon=True,
+                                          name=f"webhook-queue-worker-{len(self._workers)}")
+                self._workers.append(worker)
+                worker.start()
+
+    def _work_loop(self) -> None:
+        self._bound.wait()
+        while True:
+            with self._lock:
+                endpoints = list(self._processors)
+            try:
+                job = self.dequeue(endpoints=endpoints)
+            except sqlite3.Error as e:
+                logger.error("Failed to lease a job: %s", e)
+                job = None
+            if job is None:
+                self._available.wait(self.poll_interval)
+                self._available.clear()
+                continue
+            self.run_job(job)
+
+    def run_job(self, job: Job) -> None:
+        """
+        Processes a leased job and acknowledges it, retries it with exponential backoff,
+        or hands it to the dead callback once it exhausted its attempts.
+        """
+        with self._lock:
+            binding = self._processors.get(job.endpoint)
+        if binding is None:
+            # Another endpoint's worker can't process it, it waits for its endpoint to bind callbacks
+            self.nack(job.id)
+            return
+        process, on_dead = binding
+        try:
+            process(job)
+        except Exception as e:  # pylint: disable=broad-except
+            error = str(e) or type(e).__name__
+            if job.attempts < self.max_attempts:
+                delay = min(2 ** job.attempts, 60)
+                logger.warning("Job %s failed, retrying in %ss: %s", job.id, delay, error)
+                self.nack(job.id, delay)
+                return
+            logger.error("Job %s failed after %d attempts: %s", job.id, job.attempts, error)
+            if on_dead:
+                try:
+                    on_dead(job, error)
+                except Exception as e:  # pylint: disable=broad-except
+                    logger.error("Failed to hand over dead job %s: %s", job.id, e)
+        self.ack(job.id)
+
+
+@lru_cache(maxsize=8)
+def get_job_queue(path: str) -> Optional[JobQueue]:
+    """
+    Returns the job queue for the `job_queue` setting, or None if it is not set.
+
+    The queue is cached, so all endpoint instances share its writer and worker threads.
+    """
+    path = path.strip()
+    if not path:
+        return None
+    return JobQueue(path)
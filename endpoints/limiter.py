@@ -0,0 +1,192 @@
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Bounds of the number of concurrent invocations of one app
+MIN_LIMIT = 1
+MAX_LIMIT = 64
+INITIAL_LIMIT = 4
+
+# Multiplicative decrease of the limit on failures and rising latency
+BACKOFF = 0.9
+
+# The limit is decreased when the recent latency exceeds the baseline by this factor
+LATENCY_TOLERANCE = 2.0
+
+# Weight of a new sample in the recent latency
+RECENT_LATENCY_WEIGHT = 0.2
+
+# The baseline follows the lowest latency and rises by this fraction of the difference per sample,
+# so it recovers when the app becomes slower for good
+BASELINE_DRIFT = 0.01
+
+# Waiters are shed once the queueing delay stayed above the target for this multiple of the target
+CODEL_INTERVAL_FACTOR = 10
+
+DEFAULT_QUEUE_DELAY_TARGET = 0.5
+
+
+class Overloaded(Exception):
+    """
+    Raised when an invocation is shed because the app is overloaded.
+    """
+
+
+class _Waiter:
+    __slots__ = ("event", "enqueued_at", "admitted")
+
+    def __init__(self, enqueued_at: float):
+        self.event = threading.Event()
+        self.enqueued_at = enqueued_at
+        self.admitted: Optional[bool] = None
+
+
+class AdaptiveLimiter:
+    """
+    Limits the concurrent invocations of an app to a limit that adapts to its latency.
+
+    The limit grows by one per round trip while it is used and the latency stays close to
+    the baseline, the lowest latency observed, and shrinks by 10% at most once per round trip
+    when the latency rises or invocations fail (AIMD). Invocations above the limit wait in
+    FIFO order. Like CoDel, once the queueing delay stayed above `target` for a whole
+    interval, the oldest waiters are shed with Overloaded until the delay is below the
+    target again.
+    """
+
+    def __init__(self, target: float = DEFAULT_QUEUE_DELAY_TARGET, interval: Optional[float] = None,
+                 initial_limit: float = INITIAL_LIMIT, min_limit: int = MIN_LIMIT, max_limit: int = MAX_LIMIT,
+                 max_wait: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self.target = target
+        self.interval = interval if interval is not None else target * CODEL_INTERVAL_FACTOR
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        # Waiters are shed at the latest when they could never be admitted in time
+        self.max_wait = max_wait if max_wait is not None else self.target + self.interval
+        self.in_flight = 0
+        self.shed = 0
+        self.baseline: Optional[float] = None
+        self.recent: Optional[float] = None
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._waiters: Deque[_Waiter] = deque()
+        self._above_target_since: Optional[float] = None
+        self._last_decrease = float("-inf")
+
+    @property
+    def allowed(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    @contextmanager
+    def acquire(self) -> Iterator[None]:
+        """
+        Holds one slot of the limit while the invocation runs.
+
+        Raises:
+            Overloaded: If the invocation was shed while waiting for a slot
+        """
+        saturated = self._admit()
+        started = self._clock()
+        failed = True
+        try:
+            yield
+            failed = False
+        finally:
+            self._release(self._clock() - started, failed, saturated)
+
+    def _admit(self) -> bool:
+        with self._lock:
+            now = self._clock()
+            self._shed_oldest(now)
+            if self.in_flight < self.allowed and not self._waiters:
+                self.in_flight += 1
+                return self.in_flight * 2 >= self.allowed
+            waiter = _Waiter(now)
+            self._waiters.append(waiter)
+
+        waiter.event.wait(self.max_wait)
+        with self._lock:
+            if waiter.admitted is None:
+                self._waiters.remove(waiter)
+                self._reject(waiter)
+        if not waiter.admitted:
+            raise Overloaded("The app is overloaded, retry later")
+        # Waiting for a slot means the limit was used up
+        return True
+
+    def _release(self, latency: float, failed: bool, saturated: bool) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self._update_limit(latency, failed, saturated)
+            now = self._clock()
+            while self._waiters and self.in_flight < self.allowed:
+                waiter = self._waiters.popleft()
+                if self._should_drop(now - waiter.enqueued_at, now):
+                    self._reject(waiter)
+                    continue
+                self.in_flight += 1
+                waiter.admitted = True
+                waiter.event.set()
+
+    def _update_limit(self, latency: float, failed: bool, saturated: bool) -> None:
+        if not failed:
+            if self.baseline is None or latency < self.baseline:
+                self.baseline = latency
+            else:
+                self.baseline += (latency - self.baseline) * BASELINE_DRIFT
+            self.recent = latency if self.recent is None else \
+                self.recent + (latency - self.recent) * RECENT_LATENCY_WEIGHT
+
+        if failed or self.recent > self.baseline * LATENCY_TOLERANCE:
+            now = self._clock()
+            # Completions of the same round trip reflect the same overload, decrease once
+            if now - self._last_decrease >= (self.recent or 0.0):
+                self.limit = max(self.min_limit, self.limit * BACKOFF)
+                self._last_decrease = now
+        elif saturated:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+    def _should_drop(self, sojourn: float, now: float) -> bool:
+        if sojourn < self.target:
+            self._above_target_since = None
+            return False
+        if self._above_target_since is None:
+            self._above_target_since = now
+            return False
+        return now - self._above_target_since >= self.interval
+
+    def _shed_oldest(self, now: float) -> None:
+        while self._waiters and self._should_drop(now - self._waiters[0].enqueued_at, now):
+            self._reject(self._waiters.popleft())
+
+    def _reject(self, waiter: _Waiter) -> None:
+        self.shed += 1
+        waiter.admitted = False
+        waiter.event.set()
+
+
+_limiters: Dict[Tuple[str, float], AdaptiveLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_adaptive_limiter(app_id: str, target_ms: float) -> AdaptiveLimiter:
+    """
+    Returns the limiter of an app for the `queue_delay_target_ms` setting.
+
+    Limiters are never evicted, since they track the invocations that are in flight.
+    """
+    key = (app_id, target_ms)
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = _limiters[key] = AdaptiveLimiter(target=target_ms / 1000)
+        return limiter
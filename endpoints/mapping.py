@@ -0,0 +1,308 @@
+import json
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Union
+
+MISSING = object()
+
+_WILDCARD = object()
+
+_TOKEN = re.compile(
+    r"""\.(?P<name>[^.\[\]]+)        # .name
+      | \[(?P<index>-?\d+)\]         # [0]
+      | \[(?P<quote>['"])(?P<key>.*?)(?P=quote)\]  # ['name']
+      | \[\*\]                       # [*]
+    """,
+    re.VERBOSE,
+)
+
+
+class PathExpression:
+    """
+    A compiled JSONPath-like expression that reads values from parsed JSON data.
+
+    Supported syntax:
+    - `$` refers to the root, and can be omitted: `$.issue.title` equals `issue.title`
+    - `.name` or `['name']` selects an object field
+    - `[0]` or `[-1]` selects a list item
+    - `[*]` or `.*` selects every item of a list (or every value of an object); the
+      remaining path is applied to each item and the results are returned as a list
+
+    The expression is parsed once into a tuple of steps, so evaluating it is a plain
+    loop over the data without any string handling.
+    """
+
+    __slots__ = ("expression", "_steps")
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        self._steps = _parse(expression)
+
+    def __repr__(self) -> str:
+        return f"PathExpression({self.expression!r})"
+
+    def get(self, data: Any, default: Any = None) -> Any:
+        """
+        Evaluates the expression against the data.
+
+        Args:
+            data: The parsed JSON data
+            default: The value to return when the path does not exist
+
+        Returns:
+            The selected value, or the default if the path does not exist
+        """
+        value = _resolve(data, self._steps, 0)
+        return default if value is MISSING else value
+
+    def exists(self, data: Any) -> bool:
+        """
+        Checks whether the path exists in the data.
+        """
+        return _resolve(data, self._steps, 0) is not MISSING
+
+    def remove(self, data: Any) -> Any:
+        """
+        Returns the data without the value at the path.
+
+        Only the objects and lists along the path are copied, the rest of the data is
+        shared with the input, which is left unchanged.
+        """
+        if not self._steps:
+            return data
+        return _remove(data, self._steps, 0)
+
+
+def _parse(expression: str) -> Tuple[Any, ...]:
+    if not isinstance(expression, str):
+        raise ValueError(f"Path expression must be a string, got {type(expression).__name__}")
+
+    text = expression.strip()
+    if text.startswith("$"):
+        text = text[1:]
+    if text and text[0] not in ".[":
+        text = "." + text
+
+    steps = []
+    position = 0
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if not match:
+            raise ValueError(f"Invalid path expression {expression!r} at position {position}")
+        if match.group("name") is not None:
+            name = match.group("name")
+            steps.append(_WILDCARD if name == "*" else name)
+        elif match.group("index") is not None:
+            steps.append(int(match.group("index")))
+        elif match.group("quote") is not None:
+            steps.append(match.group("key"))
+        else:
+            steps.append(_WILDCARD)
+        position = match.end()
+    return tuple(steps)
+
+
+def _resolve(value: Any, steps: Tuple[Any, ...], start: int) -> Any:
+    for position in range(start, len(steps)):
+        step = steps[position]
+        if step is _WILDCARD:
+            if isinstance(value, Mapping):
+                items = value.values()
+            elif isinstance(value, list):
+                items = value
+            else:
+                return MISSING
+            results = []
+            for item in items:
+                result = _resolve(item, steps, position + 1)
+                if result is not MISSING:
+                    results.append(result)
+            return results
+        if isinstance(step, int):
+            if not isinstance(value, list) or not -len(value) <= step < len(value):
+                return MISSING
+            value = value[step]
+        else:
+            if not isinstance(value, Mapping) or step not in value:
+                return MISSING
+            value = value[step]
+    return value
+
+
+def _remove(value: Any, steps: Tuple[Any, ...], position: int) -> Any:
+    step = steps[position]
+    last = position == len(steps) - 1
+
+    if step is _WILDCARD:
+        if isinstance(value, Mapping):
+            if last:
+                return {}
+            return {key: _remove(item, steps, position + 1) for key, item in value.items()}
+        if isinstance(value, list):
+            if last:
+                return []
+            return [_remove(item, steps, position + 1) for item in value]
+        return value
+
+    if isinstance(step, int):
+        if not isinstance(value, list) or not -len(value) <= step < len(value):
+            return value
+        copy = list(value)
+        if last:
+            del copy[step]
+        else:
+            copy[step] = _remove(copy[step], steps, position + 1)
+        return copy
+
+    if not isinstance(value, Mapping) or step not in value:
+        return value
+    copy = dict(value)
+    if last:
+        del copy[step]
+    else:
+        copy[step] = _remove(copy[step], steps, position + 1)
+    return copy
+
+
+@lru_cache(maxsize=1024)
+def compile_path(expression: str) -> PathExpression:
+    """
+    Compiles a path expression, reusing previously compiled expressions.
+
+    Raises:
+        ValueError: If the expression is not valid
+    """
+    return PathExpression(expression)
+
+
+class InputMapping:
+    """
+    Maps fields of an arbitrary webhook payload to Dify inputs.
+
+    Each rule maps an input name either to a path expression, or to an object with a
+    `path` and a `default` that is used when the path does not exist. Inputs whose path
+    does not exist and that have no default are left out.
+    """
+
+    def __init__(self, rules: Mapping[str, Union[str, Mapping]]):
+        self._rules: List[Tuple[str, PathExpression, Any]] = []
+        for name, rule in rules.items():
+            path, default = (rule.get("path"), rule.get("default", MISSING)) if isinstance(rule, Mapping) \
+                else (rule, MISSING)
+            if not isinstance(path, str):
+                raise ValueError(f"Input mapping rule for {name} must define a path string")
+            self._rules.append((name, compile_path(path), default))
+
+    def apply(self, data: Any) -> Dict[str, Any]:
+        """
+        Builds the inputs object from the payload in a single pass over the rules.
+
+        Args:
+            data: The parsed request body
+
+        Returns:
+            The mapped inputs
+        """
+        inputs = {}
+        for name, path, default in self._rules:
+            value = path.get(data, default)
+            if value is not MISSING:
+                inputs[name] = value
+        return inputs
+
+
+@lru_cache(maxsize=32)
+def load_input_mapping(config: str) -> Optional[InputMapping]:
+    """
+    Parses the `input_mapping` setting into an InputMapping.
+
+    The setting is a JSON object that maps input names to path expressions, e.g.
+    `{"title": "$.issue.title", "labels": "$.issue.labels[*].name"}`. The result is
+    cached per configuration string, so the rules are only compiled once.
+
+    Args:
+        config: The raw setting value
+
+    Returns:
+        The InputMapping, or None if no mapping is configured
+
+    Raises:
+        ValueError: If the setting is not valid
+    """
+    if not config or not config.strip():
+        return None
+
+    rules = json.loads(config)
+    if not isinstance(rules, dict):
+        raise ValueError("input_mapping must be an object")
+    return InputMapping(rules)
+
+
+class OutputProjection:
+    """
+    Shapes a Dify response before it is serialized.
+
+    With `fields`, a new object is built from the response just like an InputMapping,
+    which selects and renames fields. With `exclude`, the listed paths are removed from
+    the response, e.g. to drop large metadata blocks. When both are given, `exclude` is
+    applied to the projected object, so its paths refer to the output names. Missing paths
+    are ignored.
+    """
+
+    def __init__(self, fields: Optional[Mapping[str, Union[str, Mapping]]] = None,
+                 exclude: Optional[List[str]] = None):
+        self._fields = InputMapping(fields) if fields else None
+        for path in exclude or ():
+            if not isinstance(path, str):
+                raise ValueError(f"Excluded path must be a string, got {type(path).__name__}")
+        self._exclude = [compile_path(path) for path in exclude or ()]
+
+    def apply(self, data: Any) -> Any:
+        """
+        Projects the response.
+
+        Args:
+            data: The Dify response
+
+        Returns:
+            The projected response
+        """
+        if self._fields:
+            data = self._fields.apply(data)
+        for path in self._exclude:
+            data = path.remove(data)
+        return data
+
+
+@lru_cache(maxsize=32)
+def load_output_projection(config: str) -> Optional[OutputProjection]:
+    """
+    Parses the `output_projection` setting into an OutputProjection.
+
+    The setting is a JSON object with `fields`, mapping output names to path expressions,
+    and/or `exclude`, a list of paths to remove, e.g.
+    `{"fields": {"answer": "$.answer", "tokens": "$.metadata.usage.total_tokens"}}`.
+    The result is cached per configuration string.
+
+    Args:
+        config: The raw setting value
+
+    Returns:
+        The OutputProjection, or None if no projection is configured
+
+    Raises:
+        ValueError: If the setting is not valid
+    """
+    if not config or not config.strip():
+        return None
+
+    data = json.loads(config)
+    if not isinstance(data, dict) or not set(data) <= {"fields", "exclude"}:
+        raise ValueError("output_projection must be an object with fields and/or exclude")
+    fields = data.get("fields")
+    exclude = data.get("exclude")
+    if fields is not None and not isinstance(fields, dict):
+        raise ValueError("output_projection fields must be an object")
+    if exclude is not None and not isinstance(exclude, list):
+        raise ValueError("output_projection exclude must be a list")
+    return OutputProjection(fields, exclude)
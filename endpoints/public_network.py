@@ -0,0 +1,32 @@
+from typing import Iterable, Optional
+import httpcore
+from endpoints.helpers import check_public_host
+
+
+class PublicNetworkBackend(httpcore.SyncBackend):
+    """
+    Network backend that resolves the host of every new connection and only connects to
+    the checked public addresses.
+
+    The host of a callback URL is checked when the request is accepted, but it could be
+    rebound to an internal address before the callback is sent. Connecting to the address
+    that was checked closes that gap, while TLS and the Host header still use the host name.
+    """
+
+    def connect_tcp(self, host: str, port: int, timeout: Optional[float] = None,
+                    local_address: Optional[str] = None,
+                    socket_options: Optional[Iterable] = None) -> httpcore.NetworkStream:
+        """
+        Connects to the first reachable address of the host.
+
+        Raises:
+            ValueError: If the host cannot be resolved or resolves to a non-public address
+            httpcore.ConnectError: If no address of the host is reachable
+        """
+        error: Optional[Exception] = None
+        for address in check_public_host(host, port):
+            try:
+                return super().connect_tcp(address, port, timeout, local_address, socket_options)
+            except httpcore.ConnectError as e:
+                error = e
+        raise error or httpcore.ConnectError(f"No address of {host}")
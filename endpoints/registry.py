@@ -0,0 +1,49 @@
+import importlib
+import threading
+from typing import Any, Dict, Generic, Iterator, Mapping, TypeVar
+
+T = TypeVar("T")
+
+
+class LazyRegistry(Mapping[str, T], Generic[T]):
+    """
+    Maps names to objects that are imported on first use.
+
+    Each entry is declared as `"module:attribute"`, so registering a middleware or codec
+    costs nothing until a request configures it. Listing and testing the names doesn't
+    import anything.
+    """
+
+    def __init__(self, entries: Mapping[str, str]):
+        for name, target in entries.items():
+            if ":" not in target:
+                raise ValueError(f"Registry entry {name} must be declared as module:attribute")
+        self._entries = dict(entries)
+        self._loaded: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name: str) -> T:
+        loaded = self._loaded.get(name)
+        if loaded is not None:
+            return loaded
+        target = self._entries[name]
+        with self._lock:
+            if name not in self._loaded:
+                module, attribute = target.split(":", 1)
+                self._loaded[name] = getattr(importlib.import_module(module), attribute)
+            return self._loaded[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._entries
+
+    def is_loaded(self, name: str) -> bool:
+        """
+        Returns whether the object of the name has been imported.
+        """
+        return name in self._loaded
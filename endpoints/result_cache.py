@@ -0,0 +1,144 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Mapping, NamedTuple, Optional
+from endpoints.state import StateBackend, get_state_backend
+
+DEFAULT_RESULT_CACHE_TTL = 300
+DEFAULT_RESULT_CACHE_SIZE_MB = 64
+
+
+class _Entry(NamedTuple):
+    value: bytes
+    expires_at: float
+
+
+class ResultCache:
+    """
+    Caches the results of deterministic invocations within a byte budget.
+
+    Results are stored serialized, so callers can't change cached results, and their size
+    is counted against `max_bytes`. Entries expire after their TTL and are evicted in LRU
+    order when the budget is exceeded.
+
+    With a state backend, results are also written to the backend, and local misses are
+    looked up there, so every worker process can answer from the results of the others.
+    """
+
+    def __init__(self, max_bytes: int, backend: Optional[StateBackend] = None):
+        self.max_bytes = max_bytes
+        self.backend = backend
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str, now: Optional[float] = None) -> Optional[Any]:
+        """
+        Returns the cached result of the key, or None on a miss.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= now:
+                self._remove(key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if entry is not None:
+            return json.loads(entry.value)
+
+        shared = self.backend.get(f"result:{key}") if self.backend is not None else None
+        with self._lock:
+            if shared is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(shared)
+
+    def set(self, key: str, value: Any, ttl: float, now: Optional[float] = None) -> None:
+        """
+        Caches a result for `ttl` seconds. Results larger than the whole budget are not cached.
+        """
+        now = time.monotonic() if now is None else now
+        encoded = json.dumps(value, separators=(",", ":")).encode("utf-8")
+        if len(encoded) + len(key) > self.max_bytes:
+            return
+        if self.backend is not None:
+            self.backend.set(f"result:{key}", encoded.decode("utf-8"), ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(encoded, now + ttl)
+            self.size += len(encoded) + len(key)
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "size_bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self.size -= len(entry.value) + len(key)
+
+
+def cache_key(app_id: str, inputs: Mapping[str, Any], variant: Any = None) -> str:
+    """
+    Returns the cache key of an invocation, a hash of the canonical JSON of the inputs, so
+    the key does not depend on the order of the fields.
+
+    Args:
+        app_id: The ID of the invoked app
+        inputs: The inputs of the invocation
+        variant: Settings that change the result for the same inputs, such as raw_data_output
+    """
+    canonical = json.dumps([app_id, variant, inputs], sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def is_cached_app(app_id: str, cached_apps: str) -> bool:
+    """
+    Returns whether the results of an app are cached by the `result_cache_apps` setting,
+    a comma-separated list of app IDs or * for all apps.
+    """
+    apps = {app.strip() for app in cached_apps.split(",")}
+    return "*" in apps or app_id in apps
+
+
+def is_succeeded_run(result: Any) -> bool:
+    """
+    Returns whether a workflow result may be cached. Runs whose `data.status` is failed or
+    stopped are answered like successful ones, but are not cached. Results without a status,
+    such as raw outputs, are cached.
+    """
+    data = result.get("data") if isinstance(result, Mapping) else None
+    status = data.get("status") if isinstance(data, Mapping) else None
+    return status is None or status == "succeeded"
+
+
+@lru_cache(maxsize=8)
+def get_result_cache(size_mb: float = DEFAULT_RESULT_CACHE_SIZE_MB, state_store: str = "") -> ResultCache:
+    """
+    Returns the result cache for the `result_cache_size_mb` and `state_store` settings.
+    """
+    return ResultCache(int(size_mb * 1024 * 1024), get_state_backend(state_store) if state_store.strip() else None)
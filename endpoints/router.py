@@ -0,0 +1,110 @@
+from typing import Dict, NamedTuple, Optional
+
+
+class RouteMatch(NamedTuple):
+    """
+    The result of a successful route lookup.
+
+    Attributes:
+        route: The declared route pattern, e.g. "/workflow/<app_id>"
+        handler: The name of the handler registered for the route
+        params: Path parameters extracted from the request path
+    """
+    route: str
+    handler: str
+    params: Dict[str, str]
+
+
+class _Node:
+    __slots__ = ("children", "param_name", "param_child", "route", "handler")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.param_name: Optional[str] = None
+        self.param_child: Optional["_Node"] = None
+        self.route: Optional[str] = None
+        self.handler: Optional[str] = None
+
+
+class Router:
+    """
+    A segment trie that maps request paths to declared endpoint routes.
+
+    Routes are declared with the same syntax as the endpoint YAML files, where
+    `<name>` marks a path parameter. Literal segments are resolved with a dict
+    lookup and take precedence over parameters, so the lookup cost depends on the
+    depth of the path and not on the number of registered routes.
+    """
+
+    def __init__(self):
+        self._root = _Node()
+
+    def add(self, pattern: str, handler: str) -> None:
+        """
+        Registers a route pattern.
+
+        Args:
+            pattern: The route pattern, e.g. "/chatflow/<app_id>"
+            handler: The name of the handler for the route
+
+        Raises:
+            ValueError: If the pattern conflicts with an already registered route
+        """
+        node = self._root
+        for segment in _split(pattern):
+            if segment.startswith("<") and segment.endswith(">"):
+                name = segment[1:-1]
+                if node.param_child is None:
+                    node.param_name = name
+                    node.param_child = _Node()
+                elif node.param_name != name:
+                    raise ValueError(
+                        f"Conflicting path parameter <{name}> in route {pattern}")
+                node = node.param_child
+            else:
+                node = node.children.setdefault(segment, _Node())
+
+        if node.route is not None:
+            raise ValueError(f"Route {pattern} is already registered")
+        node.route = pattern
+        node.handler = handler
+
+    def match(self, path: str) -> Optional[RouteMatch]:
+        """
+        Resolves a request path to a registered route.
+
+        Args:
+            path: The request path
+
+        Returns:
+            A RouteMatch with the extracted path parameters, or None if no route matches
+        """
+        params: Dict[str, str] = {}
+        node = _walk(self._root, _split(path), 0, params)
+        if node is None:
+            return None
+        return RouteMatch(node.route, node.handler, params)
+
+
+def _split(path: str) -> list:
+    return path.strip("/").split("/") if path.strip("/") else []
+
+
+def _walk(node: _Node, segments: list, index: int, params: Dict[str, str]) -> Optional[_Node]:
+    if index == len(segments):
+        return node if node.route is not None else None
+
+    segment = segments[index]
+    child = node.children.get(segment)
+    if child is not None:
+        found = _walk(child, segments, index + 1, params)
+        if found is not None:
+            return found
+
+    if node.param_child is not None and segment:
+        found = _walk(node.param_child, segments, index + 1, params)
+        if found is not None:
+            params[node.param_name] = segment
+            return found
+
+    return None
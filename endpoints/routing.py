@@ -0,0 +1,200 @@
+import json
+import logging
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Literal, Mapping, NamedTuple, Optional, Set
+from endpoints.event_filter import EventFilter
+from endpoints.mapping import MISSING, compile_path
+
+logger = logging.getLogger(__name__)
+
+# Number of threads shared by all fan-out invocations
+FAN_OUT_WORKERS = 32
+
+FanOutMode = Literal["all", "first"]
+
+
+class Route(NamedTuple):
+    """
+    A rule of the routing table.
+
+    Attributes:
+        apps: The app IDs invoked by the route
+        when: Optional condition on headers and body fields, see EventFilter
+    """
+    apps: List[str]
+    when: Optional[EventFilter] = None
+
+
+class RoutingTable:
+    """
+    Maps events to the apps that handle them.
+
+    Routes with a `key` are stored in a hash index by the value of the `index` header or
+    field, so only the routes of the event's key are evaluated no matter how many keys are
+    configured. Routes without a key are evaluated for every event. The apps of all
+    matching routes are invoked, each app once.
+    """
+
+    def __init__(self, index: Optional[Mapping[str, str]], routes: List[Mapping[str, Any]],
+                 mode: FanOutMode = "all"):
+        self.mode = mode
+        self._index_header: Optional[str] = None
+        self._index_path = None
+        if index is not None:
+            if not isinstance(index, dict) or len(index) != 1 or not set(index) <= {"header", "field"}:
+                raise ValueError("routing_table index must be an object with a header or a field")
+            if "header" in index:
+                self._index_header = str(index["header"]).lower()
+            else:
+                self._index_path = compile_path(index["field"])
+
+        self._keyed: Dict[str, List[Route]] = {}
+        self._scanned: List[Route] = []
+        for rule in routes:
+            if not isinstance(rule, dict) or not set(rule) <= {"key", "when", "apps"}:
+                raise ValueError("Each route must be an object with apps, and a key and/or when")
+            apps = rule.get("apps")
+            if not isinstance(apps, list) or not apps or not all(isinstance(app, str) for app in apps):
+                raise ValueError("Each route must list its app IDs in apps")
+            route = Route(apps, EventFilter(rule["when"]) if "when" in rule else None)
+
+            if "key" not in rule:
+                if route.when is None:
+                    raise ValueError("Each route must define a key or a when condition")
+                self._scanned.append(route)
+                continue
+            if index is None:
+                raise ValueError("Routes with a key require an index")
+            keys = rule["key"] if isinstance(rule["key"], list) else [rule["key"]]
+            for key in keys:
+                if not isinstance(key, str):
+                    raise ValueError("Route keys must be strings")
+                self._keyed.setdefault(key, []).append(route)
+
+    def route(self, headers: Mapping[str, str], body: Any) -> Optional[List[str]]:
+        """
+        Resolves the apps of an event.
+
+        Args:
+            headers: The request headers
+            body: The parsed request body
+
+        Returns:
+            The app IDs of the matching routes in configuration order, or None if no route matches
+        """
+        candidates = self._scanned
+        if self._keyed:
+            if self._index_header is not None:
+                key = headers.get(self._index_header, MISSING)
+            else:
+                key = self._index_path.get(body, MISSING)
+            keyed = self._keyed.get(key) if isinstance(key, str) else None
+            if keyed:
+                candidates = keyed + self._scanned
+
+        apps: List[str] = []
+        seen: Set[str] = set()
+        for route in candidates:
+            if route.when is not None and not route.when.matches(headers, body):
+                continue
+            for app in route.apps:
+                if app not in seen:
+                    seen.add(app)
+                    apps.append(app)
+        return apps or None
+
+
+@lru_cache(maxsize=32)
+def load_routing_table(config: str) -> Optional[RoutingTable]:
+    """
+    Parses the `routing_table` setting.
+
+    Example:
+        {"index": {"header": "X-GitHub-Event"}, "mode": "all", "routes": [
+            {"key": "issues", "apps": ["<triage_app_id>", "<notify_app_id>"]},
+            {"key": ["push", "release"], "when": {"field": "$.ref", "equals": "refs/heads/main"},
+             "apps": ["<deploy_app_id>"]},
+            {"when": {"field": "$.sender.type", "equals": "Bot"}, "apps": ["<audit_app_id>"]}]}
+
+    Returns:
+        The RoutingTable, or None if no routing table is configured
+
+    Raises:
+        ValueError: If the setting is not valid
+    """
+    if not config or not config.strip():
+        return None
+    data = json.loads(config)
+    if not isinstance(data, dict) or not set(data) <= {"index", "routes", "mode"}:
+        raise ValueError("routing_table must be an object with routes, and an optional index and mode")
+    routes = data.get("routes")
+    if not isinstance(routes, list):
+        raise ValueError("routing_table routes must be a list")
+    mode = data.get("mode", "all")
+    if mode not in ("all", "first"):
+        raise ValueError("routing_table mode must be all or first")
+    return RoutingTable(data.get("index"), routes, mode)
+
+
+@lru_cache(maxsize=1)
+def get_fan_out_executor() -> ThreadPoolExecutor:
+    """
+    Returns the thread pool of fan-out invocations, separate from the background pool so
+    background invocations that fan out can't wait on their own pool.
+    """
+    return ThreadPoolExecutor(max_workers=FAN_OUT_WORKERS, thread_name_prefix="webhook-fan-out")
+
+
+def fan_out(app_ids: List[str], invoke: Callable[[str], Any], mode: FanOutMode = "all") -> Dict[str, Any]:
+    """
+    Invokes several apps concurrently.
+
+    Args:
+        app_ids: The apps to invoke
+        invoke: Invokes one app and returns its result, raises or returns a falsy result on failure
+        mode: "all" waits for every app, "first" returns as soon as one app succeeded
+
+    Returns:
+        With "all", `{"results": {app_id: result}}` with an `errors` object for the failed apps.
+        With "first", `{"app_id": app_id, "result": result}` of the first app that succeeded.
+
+    Raises:
+        RuntimeError: If every app failed
+    """
+    executor = get_fan_out_executor()
+    futures: Dict[Future, str] = {executor.submit(invoke, app_id): app_id for app_id in app_ids}
+    results: Dict[str, Any] = {}
+    errors: Dict[str, str] = {}
+
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            app_id = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:  # pylint: disable=broad-except
+                errors[app_id] = str(e) or type(e).__name__
+                continue
+            if not result:
+                errors[app_id] = "Failed to get response"
+                continue
+            results[app_id] = result
+
+        if mode == "first" and results:
+            for future in pending:
+                # Apps that already started keep running, their results are dropped
+                future.cancel()
+            app_id = next(app for app in app_ids if app in results)
+            return {"app_id": app_id, "result": results[app_id]}
+
+    if not results:
+        raise RuntimeError("All routed apps failed: " + "; ".join(f"{app}: {error}" for app, error in errors.items()))
+    for app_id, error in errors.items():
+        logger.warning("Routed app %s failed: %s", app_id, error)
+
+    response: Dict[str, Any] = {"results": {app: results[app] for app in app_ids if app in results}}
+    if errors:
+        response["errors"] = errors
+    return response
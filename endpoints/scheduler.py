@@ -0,0 +1,175 @@
+import json
+import threading
+from functools import lru_cache
+from typing import Dict, Iterable, Mapping, NamedTuple, Optional
+
+DEFAULT_CLASS = "default"
+
+
+class ClassStats:
+    """
+    Wait time statistics of a priority class.
+
+    Attributes:
+        dequeued: The number of jobs leased from the class
+        total_wait: The total time the leased jobs waited in the queue in seconds
+        max_wait: The longest time a leased job waited in the queue in seconds
+        last_wait: The time the last leased job waited in the queue in seconds
+    """
+
+    __slots__ = ("dequeued", "total_wait", "max_wait", "last_wait")
+
+    def __init__(self):
+        self.dequeued = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.last_wait = 0.0
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "dequeued": self.dequeued,
+            "avg_wait": self.total_wait / self.dequeued if self.dequeued else 0.0,
+            "max_wait": self.max_wait,
+            "last_wait": self.last_wait,
+        }
+
+
+class FairScheduler:
+    """
+    Chooses the priority class that is served next, with start-time fair queuing.
+
+    Every class has a virtual time that advances by 1 / weight for each job it is served,
+    and the class with a waiting job and the lowest virtual time is served next. A class
+    with weight 4 is therefore served four times as often as a class with weight 1 while
+    both have a backlog. An idle class does not accumulate credit: when it becomes active
+    again, its virtual time is moved up to the virtual time of the last served job, so it
+    can't monopolize the queue afterwards.
+    """
+
+    def __init__(self, weights: Optional[Mapping[str, float]] = None):
+        self.weights: Dict[str, float] = dict(weights or {})
+        self._lock = threading.Lock()
+        self._virtual_times: Dict[str, float] = {}
+        self._clock = 0.0
+        self._stats: Dict[str, ClassStats] = {}
+
+    def weight(self, priority_class: str) -> float:
+        return self.weights.get(priority_class, 1.0)
+
+    def choose(self, active_classes: Iterable[str]) -> Optional[str]:
+        """
+        Chooses the class to serve next and charges it for one job.
+
+        Args:
+            active_classes: The classes with at least one waiting job
+
+        Returns:
+            The class to serve, or None if no class is active
+        """
+        active_classes = list(active_classes)
+        if not active_classes:
+            return None
+
+        with self._lock:
+            for priority_class in active_classes:
+                # Classes that were idle restart at the current virtual time
+                self._virtual_times[priority_class] = max(
+                    self._virtual_times.get(priority_class, self._clock), self._clock)
+
+            chosen = min(active_classes, key=lambda c: (self._virtual_times[c], -self.weight(c), c))
+            self._clock = self._virtual_times[chosen]
+            self._virtual_times[chosen] += 1.0 / self.weight(chosen)
+            return chosen
+
+    def record_wait(self, priority_class: str, wait: float) -> None:
+        """
+        Records the time a leased job of the class waited in the queue.
+        """
+        with self._lock:
+            stats = self._stats.setdefault(priority_class, ClassStats())
+            stats.dequeued += 1
+            stats.total_wait += wait
+            stats.max_wait = max(stats.max_wait, wait)
+            stats.last_wait = wait
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {priority_class: stats.to_dict() for priority_class, stats in self._stats.items()}
+
+
+class PriorityConfig(NamedTuple):
+    """
+    The parsed `priority_classes` setting.
+
+    Attributes:
+        weights: The weight of each class, classes without a weight have weight 1
+        apps: The class of each app ID
+        handlers: The class of each route handler, e.g. {"chatflow": "interactive"}
+        default: The class of jobs that match nothing else
+    """
+    weights: Mapping[str, float]
+    apps: Mapping[str, str]
+    handlers: Mapping[str, str]
+    default: str
+
+    def classify(self, handler: str, app_id: str, api_key_tier: Optional[str] = None,
+                 requested_class: Optional[str] = None) -> str:
+        """
+        Resolves the class of a job from, in this order, the tier of the API key, the app ID
+        and the route handler. The tier is only used if it names a class with a configured weight.
+
+        The X-Priority-Class header may only lower the priority: it is used if it names a
+        class with a configured weight that is not higher than the weight of the resolved
+        class, so a caller can't move its jobs ahead of its own class.
+        """
+        if api_key_tier and api_key_tier in self.weights:
+            priority_class = api_key_tier
+        else:
+            priority_class = self.apps.get(app_id) or self.handlers.get(handler) or self.default
+        if requested_class and requested_class in self.weights and \
+                self.weights[requested_class] <= self.weights.get(priority_class, 1.0):
+            return requested_class
+        return priority_class
+
+
+DEFAULT_PRIORITY_CONFIG = PriorityConfig({}, {}, {}, DEFAULT_CLASS)
+
+
+def _string_map(config: dict, name: str) -> Dict[str, str]:
+    value = config.get(name, {})
+    if not isinstance(value, dict) or not all(isinstance(v, str) for v in value.values()):
+        raise ValueError(f"priority_classes {name} must map names to class names")
+    return value
+
+
+@lru_cache(maxsize=32)
+def load_priority_config(config: str) -> PriorityConfig:
+    """
+    Parses the `priority_classes` setting.
+
+    Example:
+        {"weights": {"interactive": 8, "bulk": 1}, "handlers": {"chatflow": "interactive"},
+         "apps": {"<app_id>": "bulk"}, "default": "default"}
+
+    Raises:
+        ValueError: If the setting is invalid
+    """
+    if not config.strip():
+        return DEFAULT_PRIORITY_CONFIG
+    parsed = json.loads(config)
+    if not isinstance(parsed, dict):
+        raise ValueError("priority_classes must be an object")
+    unknown = set(parsed) - {"weights", "apps", "handlers", "default"}
+    if unknown:
+        raise ValueError(f"Unknown priority_classes keys: {', '.join(sorted(unknown))}")
+
+    weights = parsed.get("weights", {})
+    if not isinstance(weights, dict) or not all(
+            isinstance(w, (int, float)) and not isinstance(w, bool) and w > 0 for w in weights.values()):
+        raise ValueError("priority_classes weights must be positive numbers")
+    default = parsed.get("default", DEFAULT_CLASS)
+    if not isinstance(default, str):
+        raise ValueError("priority_classes default must be a class name")
+
+    return PriorityConfig({k: float(v) for k, v in weights.items()}, _string_map(parsed, "apps"),
+                          _string_map(parsed, "handlers"), default)
@@ -0,0 +1,292 @@
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+import time
+from functools import lru_cache
+from typing import Callable, Dict, Optional, Tuple, Union
+
+# Values are strings, counters created by `incr` are integers
+Value = Union[str, int]
+
+# Writes a worker accumulates before they are committed in one transaction
+FLUSH_BATCH_SIZE = 100
+
+# Time after which buffered writes are committed in seconds, even if the batch isn't full
+FLUSH_INTERVAL = 0.05
+
+# Time between sweeps of expired entries in seconds
+PURGE_INTERVAL = 60.0
+
+
+class StateBackend(ABC):
+    """
+    Key value store for the state that has to be shared by all plugin worker processes,
+    such as replay records, cached results, conversation affinity and the failure counters
+    of replicas.
+
+    Every entry expires after its TTL. Expiry uses the wall clock, since the monotonic
+    clocks of different processes are not comparable.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Value]:
+        """
+        Returns the value of the key, or None if it is missing or expired.
+        """
+
+    @abstractmethod
+    def set(self, key: str, value: str, ttl: float) -> None:
+        """
+        Stores the value of the key for `ttl` seconds. Writes may be buffered briefly, but
+        are visible to `get` of the same backend immediately.
+        """
+
+    @abstractmethod
+    def add(self, key: str, value: str, ttl: float) -> bool:
+        """
+        Stores the value for `ttl` seconds unless the key already holds a live value.
+
+        Returns:
+            True if the value was stored, False if the key exists
+        """
+
+    @abstractmethod
+    def incr(self, key: str, amount: int = 1, ttl: float = 60.0) -> int:
+        """
+        Increments the counter of the key, which starts at 0 and expires `ttl` seconds after
+        it was created, so the counter covers a fixed window.
+
+        Returns:
+            The value of the counter after the increment
+        """
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """
+        Removes the key.
+        """
+
+    def flush(self) -> None:
+        """
+        Commits buffered writes, backends that don't buffer have nothing to do.
+        """
+
+
+class MemoryStateBackend(StateBackend):
+    """
+    State backend of a single process. Expired entries are dropped when they are read and
+    swept every `PURGE_INTERVAL` seconds.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[Value, float]] = {}
+        self._next_purge = clock() + PURGE_INTERVAL
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Value]:
+        now = self._clock()
+        with self._lock:
+            entry = self._live(key, now)
+        return entry[0] if entry is not None else None
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        now = self._clock()
+        with self._lock:
+            self._entries[key] = (value, now + ttl)
+            self._purge(now)
+
+    def add(self, key: str, value: str, ttl: float) -> bool:
+        now = self._clock()
+        with self._lock:
+            if self._live(key, now) is not None:
+                return False
+            self._entries[key] = (value, now + ttl)
+            self._purge(now)
+            return True
+
+    def incr(self, key: str, amount: int = 1, ttl: float = 60.0) -> int:
+        now = self._clock()
+        with self._lock:
+            entry = self._live(key, now)
+            if entry is None:
+                entry = (amount, now + ttl)
+                self._purge(now)
+            else:
+                entry = (int(entry[0]) + amount, entry[1])
+            self._entries[key] = entry
+            return entry[0]
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def _live(self, key: str, now: float) -> Optional[Tuple[Value, float]]:
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] <= now:
+            del self._entries[key]
+            return None
+        return entry
+
+    def _purge(self, now: float) -> None:
+        if now < self._next_purge:
+            return
+        self._next_purge = now + PURGE_INTERVAL
+        for key in [key for key, entry in self._entries.items() if entry[1] <= now]:
+            del self._entries[key]
+
+
+class SqliteStateBackend(StateBackend):
+    """
+    State backend shared by the worker processes of a host through a SQLite file in WAL
+    mode, so readers never wait for writers.
+
+    Each thread uses its own connection and no lock is held while SQLite works. Plain
+    writes are buffered and committed in batches of `batch_size`, or after `flush_interval`
+    seconds, in a single transaction, while `add`, `incr` and `delete` are applied
+    immediately because their result must be consistent across processes.
+    """
+
+    def __init__(self, path: str, clock: Callable[[], float] = time.time,
+                 batch_size: int = FLUSH_BATCH_SIZE, flush_interval: float = FLUSH_INTERVAL):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._clock = clock
+        self._local = threading.local()
+        # Guards the write buffers only, never held during a query
+        self._lock = threading.Lock()
+        # Serializes the commit of a batch with deletes, so a deleted key isn't committed again
+        self._flush_lock = threading.Lock()
+        self._pending: Dict[str, Tuple[str, float]] = {}
+        self._flushing: Dict[str, Tuple[str, float]] = {}
+        self._timer: Optional[threading.Timer] = None
+        self._next_purge = clock() + PURGE_INTERVAL
+
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value NOT NULL, expires_at REAL NOT NULL)")
+
+    def get(self, key: str) -> Optional[Value]:
+        now = self._clock()
+        with self._lock:
+            entry = self._pending.get(key) or self._flushing.get(key)
+        if entry is not None:
+            return entry[0] if entry[1] > now else None
+        row = self._connection().execute(
+            "SELECT value FROM state WHERE key = ? AND expires_at > ?", (key, now)).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        with self._lock:
+            self._pending[key] = (value, self._clock() + ttl)
+            full = len(self._pending) >= self.batch_size
+            if not full and self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+
+    def add(self, key: str, value: str, ttl: float) -> bool:
+        self._flush_key(key)
+        now = self._clock()
+        cursor = self._connection().execute(
+            "INSERT INTO state (key, value, expires_at) VALUES (?, ?, ?)"
+            " ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at"
+            " WHERE state.expires_at <= ?",
+            (key, value, now + ttl, now),
+        )
+        return cursor.rowcount == 1
+
+    def incr(self, key: str, amount: int = 1, ttl: float = 60.0) -> int:
+        self._flush_key(key)
+        now = self._clock()
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "INSERT INTO state (key, value, expires_at) VALUES (?, ?, ?)"
+                " ON CONFLICT (key) DO UPDATE SET"
+                " value = CASE WHEN state.expires_at <= ? THEN excluded.value ELSE state.value + excluded.value END,"
+                " expires_at = CASE WHEN state.expires_at <= ? THEN excluded.expires_at ELSE state.expires_at END",
+                (key, amount, now + ttl, now, now),
+            )
+            value = connection.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()[0]
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return int(value)
+
+    def delete(self, key: str) -> None:
+        with self._flush_lock:
+            with self._lock:
+                self._pending.pop(key, None)
+                self._flushing.pop(key, None)
+            self._connection().execute("DELETE FROM state WHERE key = ?", (key,))
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                if not self._pending:
+                    return
+                # Other threads keep reading the batch from memory until it is committed
+                batch, self._pending = self._pending, {}
+                self._flushing.update(batch)
+
+            now = self._clock()
+            connection = self._connection()
+            try:
+                connection.execute("BEGIN IMMEDIATE")
+                try:
+                    connection.executemany(
+                        "INSERT INTO state (key, value, expires_at) VALUES (?, ?, ?)"
+                        " ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+                        [(key, value, expires_at) for key, (value, expires_at) in batch.items()],
+                    )
+                    if now >= self._next_purge:
+                        self._next_purge = now + PURGE_INTERVAL
+                        connection.execute("DELETE FROM state WHERE expires_at <= ?", (now,))
+                    connection.execute("COMMIT")
+                except BaseException:
+                    connection.execute("ROLLBACK")
+                    raise
+            finally:
+                with self._lock:
+                    for key, entry in batch.items():
+                        if self._flushing.get(key) is entry:
+                            del self._flushing[key]
+
+    def _flush_key(self, key: str) -> None:
+        # Buffered writes of the key have to be committed before it is changed in place
+        with self._lock:
+            buffered = key in self._pending
+        if buffered:
+            self.flush()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, isolation_level=None, timeout=5.0)
+            # Losing the last writes on a power failure only drops cached state
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+
+@lru_cache(maxsize=8)
+def get_state_backend(path: str = "") -> StateBackend:
+    """
+    Returns the state backend for the `state_store` setting, shared by all endpoint
+    instances of the process. Without a path the state is kept in memory.
+    """
+    path = path.strip()
+    return SqliteStateBackend(path) if path else MemoryStateBackend()
@@ -0,0 +1,175 @@
+import importlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+from werkzeug import Request
+
+logger = logging.getLogger(__name__)
+
+# Modules that are otherwise imported by the first request that needs them
+WARM_MODULES = ("endpoints.invoke_endpoint", "werkzeug.formparser", "werkzeug.sansio.multipart")
+
+# Keys the signature middlewares are built with, so their key parsing and crypto libraries are loaded
+_PROBE_KEYS = {"discord": "00" * 32}
+
+_ready = threading.Event()
+_timings: Dict[str, float] = {}
+_failed_steps: Dict[str, str] = {}
+
+
+class _ProbeWorkflow:
+    def invoke(self, **kwargs: Any) -> Dict[str, Any]:
+        return {"data": {"outputs": kwargs.get("inputs")}}
+
+
+class _ProbeApp:
+    workflow = _ProbeWorkflow()
+
+
+class _ProbeSession:
+    """
+    Session of the warm-up probes, answers workflow invocations without calling Dify.
+    """
+    app = _ProbeApp()
+
+
+def _import_modules() -> None:
+    for module in WARM_MODULES:
+        importlib.import_module(module)
+
+
+def _build_middlewares(names: Optional[Iterable[str]]) -> None:
+    # Imported by the steps, so their duration includes the imports
+    from endpoints.helpers import MIDDLEWARES  # pylint: disable=import-outside-toplevel
+
+    for name in MIDDLEWARES if names is None else names:
+        if name in MIDDLEWARES:
+            MIDDLEWARES[name](_PROBE_KEYS.get(name, "warm-up"))
+
+
+def _probe() -> None:
+    # Only the probes need the test client of werkzeug
+    from werkzeug.test import EnvironBuilder  # pylint: disable=import-outside-toplevel
+    from endpoints.invoke_endpoint import WebhookEndpoint  # pylint: disable=import-outside-toplevel
+
+    settings = {"api_key_location": "none", "explicit_inputs": True}
+    bodies = [
+        {"data": json.dumps({"inputs": {"text": "warm"}}), "content_type": "application/json"},
+        {"data": {"inputs[text]": "warm"}},
+    ]
+    for body in bodies:
+        request = Request(EnvironBuilder(method="POST", path="/workflow/warm-up", **body).get_environ())
+        response = WebhookEndpoint(_ProbeSession())._invoke(request, {}, settings)  # pylint: disable=protected-access
+        if response.status_code != 200:
+            raise RuntimeError(f"Warm-up probe failed with {response.status_code}: {response.get_data(as_text=True)}")
+        # The probe workflow echoes its inputs, so a body that was parsed wrong fails the probe
+        outputs = json.loads(response.get_data())["data"]["outputs"]
+        if outputs != {"text": "warm"}:
+            raise RuntimeError(f"Warm-up probe parsed the inputs {outputs} from a {request.mimetype} body")
+
+
+def _start_job_queue(path: str) -> None:
+    from endpoints.job_queue import get_job_queue  # pylint: disable=import-outside-toplevel
+
+    get_job_queue(path).start_workers()
+
+
+def warm_up(middlewares: Optional[Iterable[str]] = None, probe: bool = False,
+            job_queue: str = "") -> Dict[str, float]:
+    """
+    Prepares the plugin for its first request and marks it ready.
+
+    Imports the modules used by requests, builds the signature middlewares, which loads
+    their crypto libraries, and optionally sends probe requests through the endpoint with
+    a session that doesn't call Dify. A failed step doesn't stop the others, but the plugin
+    is not marked ready and the failed steps are reported by `readiness`.
+
+    Args:
+        middlewares: The names of the middlewares to build, all of them if None
+        probe: Whether to send the probe requests
+        job_queue: The `job_queue` setting of the endpoint, its file is opened and its workers
+            are started, they process the jobs of an endpoint once a request to it provides a session
+
+    Returns:
+        The duration of each step and the total in milliseconds
+    """
+    steps: Dict[str, Callable[[], None]] = {
+        "imports": _import_modules,
+        "middlewares": lambda: _build_middlewares(middlewares),
+    }
+    if probe:
+        steps["probe"] = _probe
+    if job_queue.strip():
+        steps["job_queue"] = lambda: _start_job_queue(job_queue)
+
+    started = time.perf_counter()
+    timings: Dict[str, float] = {}
+    failed_steps: Dict[str, str] = {}
+    for name, step in steps.items():
+        step_started = time.perf_counter()
+        try:
+            step()
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error("Warm-up step %s failed: %s", name, str(e))
+            failed_steps[name] = str(e) or type(e).__name__
+        timings[name] = (time.perf_counter() - step_started) * 1000
+    timings["total"] = (time.perf_counter() - started) * 1000
+
+    _timings.clear()
+    _timings.update(timings)
+    _failed_steps.clear()
+    _failed_steps.update(failed_steps)
+    if failed_steps:
+        _ready.clear()
+        logger.error("Warm-up failed in %.1f ms, the plugin is not ready", timings["total"])
+    else:
+        _ready.set()
+        logger.info("Warm-up finished in %.1f ms", timings["total"])
+    return timings
+
+
+def warm_up_from_env() -> Dict[str, float]:
+    """
+    Runs the warm-up configured by the environment of the plugin:
+    - `WARMUP_MIDDLEWARES`: Comma-separated middlewares to build, `*` for all of them, or
+      `none` (the default), since middlewares are otherwise only imported when they are used
+    - `WARMUP_PROBE`: `true` to send probe requests through the endpoint
+    - `WARMUP_JOB_QUEUE`: The `job_queue` setting of the endpoint, to start the queue workers at boot
+    """
+    names = os.environ.get("WARMUP_MIDDLEWARES", "none").strip()
+    if names == "*":
+        middlewares = None
+    elif names.lower() in ("", "none"):
+        middlewares = []
+    else:
+        middlewares = [name.strip() for name in names.split(",") if name.strip()]
+    probe = os.environ.get("WARMUP_PROBE", "").strip().lower() in ("1", "true", "yes")
+    return warm_up(middlewares, probe, os.environ.get("WARMUP_JOB_QUEUE", ""))
+
+
+def start_warm_up_from_env() -> threading.Thread:
+    """
+    Runs the warm-up configured by the environment in a background thread, so the plugin
+    already serves requests, and answers /ready with 503, while it runs.
+    """
+    thread = threading.Thread(target=warm_up_from_env, name="webhook-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def is_ready() -> bool:
+    """
+    Returns whether the warm-up has finished without a failed step.
+    """
+    return _ready.is_set()
+
+
+def readiness() -> Dict[str, Any]:
+    """
+    Returns the readiness of the plugin, the duration of the warm-up steps and the errors
+    of the failed steps.
+    """
+    return {"ready": is_ready(), "warm_up_ms": dict(_timings), "failed_steps": dict(_failed_steps)}
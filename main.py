@@ -1,6 +1,9 @@
 from dify_plugin import Plugin, DifyPluginEnv
+from endpoints.warmup import start_warm_up_from_env
 
 plugin = Plugin(DifyPluginEnv(MAX_REQUEST_TIMEOUT=120))
 
 if __name__ == '__main__':
+    # The warm-up runs while the plugin serves, /ready answers 503 until it has finished
+    start_warm_up_from_env()
     plugin.run()
@@ -0,0 +1,134 @@
+import json
+import logging
+import time
+from typing import Mapping, Optional
+from werkzeug import Request, Response
+from endpoints.state import StateBackend
+from middlewares.replay_cache import SharedReplayCache, get_replay_cache
+
+logger = logging.getLogger(__name__)
+
+
+class SignatureMiddleware:
+    """
+    Base class for middlewares that verify the signature of third-party webhook requests.
+
+    The signature is checked before the request body is parsed, so forged requests are
+    rejected with a 401 without any further work. Subclasses implement `verify_request`
+    and can override `handle` to answer provider specific requests like pings.
+    """
+
+    # Maximum accepted age of a signed timestamp in seconds
+    DEFAULT_TOLERANCE = 300
+
+    # Backend of the replay records shared by the worker processes, None keeps them in memory
+    state: Optional[StateBackend] = None
+
+    @classmethod
+    def from_settings(cls, settings: Mapping) -> "SignatureMiddleware":
+        """
+        Create the middleware from the endpoint settings.
+        """
+        return cls(settings.get("signature_verification_key"), cls.tolerance_from_settings(settings))
+
+    @classmethod
+    def tolerance_from_settings(cls, settings: Mapping) -> float:
+        """
+        Read the signature timestamp tolerance from the endpoint settings.
+
+        Raises:
+            ValueError: If the setting is not a number.
+        """
+        tolerance = settings.get("signature_tolerance")
+        return float(tolerance) if tolerance not in (None, "") else cls.DEFAULT_TOLERANCE
+
+    def invoke(self, r: Request) -> Optional[Response]:
+        """
+        Verify the request signature and let the middleware handle the request.
+
+        Args:
+            r (Request): The incoming request to process.
+
+        Returns:
+            Response: A 401 response if the signature is invalid, the response of
+                      `handle`, or None if the request should be processed further.
+        """
+        if not self.verify_request(r):
+            logger.warning("Invalid request signature")
+            return Response(json.dumps({"error": "invalid request signature"}), status=401, content_type="application/json")
+
+        logger.info("Request signature verified")
+        return self.handle(r)
+
+    def verify_request(self, request: Request) -> bool:
+        """
+        Verify the authenticity of a request.
+
+        Args:
+            request (Request): The request to verify.
+
+        Returns:
+            bool: True if the request signature is valid, False otherwise.
+        """
+        raise NotImplementedError
+
+    def handle(self, request: Request) -> Optional[Response]:
+        """
+        Handle a request with a verified signature.
+
+        Args:
+            request (Request): The verified request.
+
+        Returns:
+            Response: A response to send back, or None to continue processing.
+        """
+        return None
+
+    @staticmethod
+    def is_fresh(timestamp: Optional[str], tolerance: float, now: Optional[float] = None) -> bool:
+        """
+        Check that a signed unix timestamp is within the tolerance of the current time.
+
+        Args:
+            timestamp (str): The timestamp sent with the request.
+            tolerance (float): The maximum accepted age in seconds, 0 disables the check.
+            now (float): The current time, defaults to time.time().
+
+        Returns:
+            bool: True if the timestamp is fresh, False if it is stale or malformed.
+        """
+        if not tolerance:
+            return True
+        try:
+            age = (time.time() if now is None else now) - float(timestamp)
+        except (TypeError, ValueError):
+            logger.error("Invalid signature timestamp: %s", timestamp)
+            return False
+        if abs(age) > tolerance:
+            logger.error("Stale signature timestamp: %s", timestamp)
+            return False
+        return True
+
+    def is_replay(self, signature: str, timestamp: str, tolerance: float) -> bool:
+        """
+        Check whether a request with a verified signature has been accepted before.
+
+        The signature is remembered for the tolerance window, in the state backend if one is
+        configured, so only call this after the signature and the freshness of the timestamp
+        have been verified.
+
+        Args:
+            signature (str): The verified signature of the request.
+            timestamp (str): The signed timestamp of the request.
+            tolerance (float): The freshness window in seconds, 0 disables the check.
+
+        Returns:
+            bool: True if the request is a replay, False otherwise.
+        """
+        if not tolerance:
+            return False
+        cache = get_replay_cache(tolerance) if self.state is None else SharedReplayCache(self.state, tolerance)
+        if not cache.check_and_add(signature, float(timestamp)):
+            logger.error("Replayed request signature rejected")
+            return True
+        return False
@@ -6,6 +6,25 @@ from werkzeug import Request, Response
 logger = logging.getLogger(__name__)
 
 
+def _discard_object(pairs):
+    return None
+
+
+# Validates JSON with the C scanner while discarding every object as soon as it is parsed,
+# so memory stays bounded by the nesting depth instead of the size of the document.
+_VALIDATING_DECODER = json.JSONDecoder(object_pairs_hook=_discard_object)
+
+
+def validate_json(text: str) -> None:
+    """
+    Validate a JSON document without building the parsed object tree.
+
+    Raises:
+        json.JSONDecodeError: If the text is not valid JSON
+    """
+    _VALIDATING_DECODER.decode(text)
+
+
 class DefaultMiddleware:
     """
     A default middleware class that provides core functionality for request handling,
@@ -17,22 +36,37 @@ class DefaultMiddleware:
         """
         Handle the incoming request with optional transformations based on settings.
         """
-        logger.debug("Request received with body: %s", r.data)
+        if logger.isEnabledFor(logging.DEBUG):
+            # r.data would parse form bodies and exhaust the stream, get_data keeps a copy to parse
+            logger.debug("Request received with body: %s", r.get_data())
 
         if settings.get("json_string_input", False):
-            self.transform_request_body(r)
+            self.transform_request_body(
+                r, settings.get("json_string_format") or "normalized")
 
         return None
 
-    def transform_request_body(self, request: Request) -> bool:
+    def transform_request_body(self, request: Request, json_string_format: str = "normalized") -> bool:
         """
         Transform the request body into a JSON string and attach it to the request
         object for subsequent processing.
+
+        The format controls how the string is produced:
+        - `normalized`: the body is parsed and re-serialized with json.dumps
+        - `raw`: the body is validated and forwarded as sent, without parsing it into objects
+        - `minified`: the body is parsed and re-serialized without insignificant whitespace
         """
         try:
-            logger.debug("Transform request body to json string")
-            request_json = request.get_json()
-            json_string = json.dumps(request_json)
+            logger.debug("Transform request body to %s json string", json_string_format)
+            if json_string_format == "raw":
+                json_string = request.get_data(as_text=True)
+                validate_json(json_string)
+            elif json_string_format == "minified":
+                json_string = json.dumps(json.loads(request.get_data(as_text=True)),
+                                         separators=(",", ":"), ensure_ascii=False)
+            else:
+                request_json = request.get_json()
+                json_string = json.dumps(request_json)
             request.default_middleware_json = {'json_string': json_string}
         except (TypeError, ValueError) as e:
             logger.error(
@@ -1,12 +1,14 @@
 import json
 import logging
+from typing import Optional
 from werkzeug import Request, Response
 from nacl.signing import VerifyKey
 from nacl.exceptions import BadSignatureError
+from middlewares.base_middleware import SignatureMiddleware
 
 logger = logging.getLogger(__name__)
 
-class DiscordMiddleware:
+class DiscordMiddleware(SignatureMiddleware):
     """
     Middleware for handling Discord interaction webhooks.
     
@@ -14,13 +16,15 @@ class DiscordMiddleware:
     and provides appropriate responses for different Discord interaction types.
     """
     
-    def __init__(self, signature_verification_key=None):
+    def __init__(self, signature_verification_key=None, tolerance=SignatureMiddleware.DEFAULT_TOLERANCE):
         """
         Initialize the Discord middleware with a signature verification key.
         
         Args:
             signature_verification_key (str): The hexadecimal public key for verifying
                                               Discord's request signatures.
+            tolerance (float): The maximum accepted age of X-Signature-Timestamp in seconds,
+                               0 disables the freshness and replay checks.
                                               
         Raises:
             ValueError: If signature_verification_key is None.
@@ -30,34 +34,24 @@ class DiscordMiddleware:
             raise ValueError("signature_verification_key is required")
 
         self.verify_key = VerifyKey(bytes.fromhex(signature_verification_key))
+        self.tolerance = tolerance
         logger.info("DiscordMiddleware initialized with verification key")
 
-    def invoke(self, r: Request) -> Response:
+    def handle(self, request: Request) -> Optional[Response]:
         """
-        Process an incoming request from Discord.
-        
-        This method verifies the request signature, then determines the type of
-        Discord interaction and returns the appropriate response.
-        
+        Determine the type of a verified Discord interaction and return the appropriate response.
+
         Args:
-            r (Request): The incoming request to process.
-            
+            request (Request): The verified request to process.
+
         Returns:
             Response: A response to send back to Discord, or None if the request
                      doesn't match any expected interaction type.
         """
-        logger.debug("Request received with body: %s", r.data)
-
-        if not self.verify_request(r):
-            logger.warning("Invalid request signature")
-            return Response(json.dumps({"error": "invalid request signature"}), status=401, content_type="application/json")
-
-        logger.info("Request signature verified")
-
-        if r.method == 'POST' and self.is_ping(r):
+        if request.method == 'POST' and self.is_ping(request):
             logger.info("Ping received, sending ping response")
             return Response(status=204)
-        elif r.method == 'POST' and self.is_webhook_event(r):
+        elif request.method == 'POST' and self.is_webhook_event(request):
             logger.info("Webhook event received, sending acknowledgment")
             return Response(json.dumps({"type": 1}), content_type="application/json")
 
@@ -103,6 +97,9 @@ class DiscordMiddleware:
     def verify_request(self, request: Request) -> bool:
         """
         Verify the authenticity of a Discord request using Ed25519 signatures.
+
+        Requests with a stale X-Signature-Timestamp are rejected before the signature is
+        checked, and verified signatures that were already accepted are rejected as replays.
         
         Args:
             request (Request): The request to verify.
@@ -114,13 +111,19 @@ class DiscordMiddleware:
             logger.debug("Verifying request with headers: %s", request.headers)
             signature = request.headers['X-Signature-Ed25519']
             timestamp = request.headers['X-Signature-Timestamp']
-            body = request.data.decode('utf-8')
+            if not self.is_fresh(timestamp, self.tolerance):
+                return False
+
+            body = request.data
 
             logger.debug("Signature: %s, Timestamp: %s, Body: %s", signature, timestamp, body)
-            self.verify_key.verify(
-                f'{timestamp}{body}'.encode(), bytes.fromhex(signature))
+            signature_bytes = bytes.fromhex(signature)
+            self.verify_key.verify(timestamp.encode() + body, signature_bytes)
+            # fromhex accepts uppercase and spaced hex, so replays are keyed by the decoded signature
+            if self.is_replay(signature_bytes.hex(), timestamp, self.tolerance):
+                return False
             logger.info("Request signature successfully verified")
             return True
-        except (BadSignatureError, KeyError) as e:
+        except (BadSignatureError, KeyError, ValueError) as e:
             logger.error("Signature verification failed: %s", e)
-            return False
\ No newline at end of file
+            return False
@@ -0,0 +1,185 @@
+import base64
+import hashlib
+import hmac
+import json
+import logging
+from typing import List, Mapping, Optional
+from werkzeug import Request
+from middlewares.base_middleware import SignatureMiddleware
+
+logger = logging.getLogger(__name__)
+
+
+class HmacMiddleware(SignatureMiddleware):
+    """
+    Middleware for webhooks signed with HMAC-SHA256 over the raw request body.
+
+    The signed message is described by a template like "{timestamp}.{body}". The parts
+    around the body are fed to the HMAC separately, so the body bytes are hashed in
+    place without being decoded or copied. When the template contains a timestamp,
+    requests with a timestamp outside the tolerance are rejected, and signatures that
+    were already accepted within the tolerance are rejected as replays.
+
+    This class implements the configurable generic scheme, provider specific schemes
+    only override the class attributes and, if needed, how the header is parsed.
+    """
+
+    signature_header = "X-Signature"
+    signature_prefix = ""
+    timestamp_header: Optional[str] = None
+    encoding = "hex"
+    message_template = "{body}"
+
+    OPTIONS = ("signature_header", "signature_prefix", "timestamp_header", "encoding", "message_template")
+
+    def __init__(self, secret: Optional[str] = None, tolerance: float = SignatureMiddleware.DEFAULT_TOLERANCE,
+                 **options):
+        """
+        Initialize the middleware with the shared signing secret.
+
+        Args:
+            secret (str): The secret shared with the webhook provider.
+            tolerance (float): The maximum accepted age of the signed timestamp in seconds.
+            **options: Overrides for the scheme attributes listed in OPTIONS.
+
+        Raises:
+            ValueError: If the secret is missing or an option is unknown.
+        """
+        if not secret:
+            logger.error("Signature verification key is required")
+            raise ValueError("signature_verification_key is required")
+
+        unknown = set(options) - set(self.OPTIONS)
+        if unknown:
+            raise ValueError(f"Unknown HMAC options: {', '.join(sorted(unknown))}")
+        for name, value in options.items():
+            setattr(self, name, value)
+        if self.encoding not in ("hex", "base64"):
+            raise ValueError("HMAC encoding must be hex or base64")
+        if "{body}" not in self.message_template:
+            raise ValueError("HMAC message template must contain {body}")
+
+        self.secret = secret.encode("utf-8")
+        self.tolerance = tolerance
+        self._message_prefix, self._message_suffix = self.message_template.split("{body}", 1)
+        self._signs_timestamp = "{timestamp}" in self.message_template
+        logger.info("%s initialized", type(self).__name__)
+
+    @classmethod
+    def from_settings(cls, settings: Mapping) -> "HmacMiddleware":
+        """
+        Create the middleware from the endpoint settings.
+        """
+        tolerance = cls.tolerance_from_settings(settings)
+        options = {}
+        if cls is HmacMiddleware and settings.get("hmac_options"):
+            options = json.loads(settings["hmac_options"])
+            if not isinstance(options, dict):
+                raise ValueError("hmac_options must be an object")
+        return cls(settings.get("signature_verification_key"), tolerance, **options)
+
+    def get_timestamp(self, request: Request) -> Optional[str]:
+        """
+        Read the signed timestamp from the request.
+        """
+        return request.headers.get(self.timestamp_header) if self.timestamp_header else None
+
+    def get_signatures(self, request: Request) -> List[str]:
+        """
+        Read the candidate signatures from the request, without their prefix.
+        """
+        signature = request.headers.get(self.signature_header)
+        if not signature or not signature.startswith(self.signature_prefix):
+            return []
+        return [signature[len(self.signature_prefix):]]
+
+    def compute_signature(self, timestamp: Optional[str], body: bytes) -> str:
+        """
+        Compute the expected signature for a timestamp and a raw body.
+        """
+        mac = hmac.new(self.secret, digestmod=hashlib.sha256)
+        if self._message_prefix:
+            mac.update(self._message_prefix.replace("{timestamp}", timestamp or "").encode("utf-8"))
+        mac.update(body)
+        if self._message_suffix:
+            mac.update(self._message_suffix.replace("{timestamp}", timestamp or "").encode("utf-8"))
+        if self.encoding == "base64":
+            return base64.b64encode(mac.digest()).decode("ascii")
+        return mac.hexdigest()
+
+    def verify_request(self, request: Request) -> bool:
+        """
+        Verify the HMAC signature and the freshness of the signed timestamp.
+
+        Args:
+            request (Request): The request to verify.
+
+        Returns:
+            bool: True if the request signature is valid, False otherwise.
+        """
+        signatures = self.get_signatures(request)
+        if not signatures:
+            logger.error("Signature header %s is missing or malformed", self.signature_header)
+            return False
+
+        timestamp = self.get_timestamp(request)
+        if self._signs_timestamp and (timestamp is None or not self.is_fresh(timestamp, self.tolerance)):
+            return False
+
+        # request.data is empty for form bodies, get_data returns the raw body for every content type
+        expected = self.compute_signature(timestamp, request.get_data())
+        if self.encoding == "hex":
+            signatures = [signature.lower() for signature in signatures]
+        # compare_digest only accepts ASCII strings, header values may contain any character
+        if not any(hmac.compare_digest(expected.encode("utf-8"), signature.encode("utf-8"))
+                   for signature in signatures):
+            return False
+
+        return not (self._signs_timestamp and self.is_replay(expected, timestamp, self.tolerance))
+
+
+class GitHubMiddleware(HmacMiddleware):
+    """
+    Middleware for GitHub webhooks signed with the X-Hub-Signature-256 header.
+
+    GitHub does not sign a timestamp, so the replay window does not apply.
+    """
+
+    signature_header = "X-Hub-Signature-256"
+    signature_prefix = "sha256="
+
+
+class StripeMiddleware(HmacMiddleware):
+    """
+    Middleware for Stripe webhooks signed with the Stripe-Signature header.
+
+    The header has the form "t=<timestamp>,v1=<signature>[,v1=<signature>]", where
+    several v1 signatures are present while a signing secret is rolled.
+    """
+
+    signature_header = "Stripe-Signature"
+    message_template = "{timestamp}.{body}"
+
+    def _parse_header(self, request: Request) -> List[tuple]:
+        header = request.headers.get(self.signature_header) or ""
+        return [part.strip().split("=", 1) for part in header.split(",") if "=" in part]
+
+    def get_timestamp(self, request: Request) -> Optional[str]:
+        for key, value in self._parse_header(request):
+            if key == "t":
+                return value
+        return None
+
+    def get_signatures(self, request: Request) -> List[str]:
+        return [value for key, value in self._parse_header(request) if key == "v1"]
+
+
+class SlackSignatureMiddleware(HmacMiddleware):
+    """
+    Middleware for Slack requests signed with the X-Slack-Signature header.
+    """
+
+    signature_header = "X-Slack-Signature"
+    signature_prefix = "v0="
+    timestamp_header = "X-Slack-Request-Timestamp"
+    message_template = "v0:{timestamp}:{body}"
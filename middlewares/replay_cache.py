@@ -0,0 +1,136 @@
+import math
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Optional, Set
+from endpoints.state import StateBackend
+
+
+class ReplayCache:
+    """
+    Remembers the signatures of recently accepted requests to reject replays.
+
+    Signatures are stored in buckets keyed by their signed timestamp. A replayed request
+    carries the same signed timestamp as the original, so a lookup only has to check a
+    single bucket. Buckets are dropped as soon as their timestamps leave the freshness
+    window, which costs O(1) per bucket, and requests older than the window are already
+    rejected by the freshness check.
+
+    Memory is bounded by `max_entries`: when it is exceeded, the oldest bucket is evicted
+    early and requests signed within that bucket are rejected from then on, because the
+    cache can no longer prove that they are not replays.
+    """
+
+    def __init__(self, window: float = 300, bucket_seconds: float = 10, max_entries: int = 100_000):
+        """
+        Args:
+            window (float): The freshness window in seconds.
+            bucket_seconds (float): The time span covered by a single bucket.
+            max_entries (int): The maximum number of signatures kept in memory.
+        """
+        self.window = window
+        self.bucket_seconds = bucket_seconds
+        self.max_entries = max_entries
+        self._buckets: Dict[int, Set[str]] = {}
+        # Signatures in buckets below this index have expired or were evicted
+        self._oldest_index: Optional[int] = None
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def check_and_add(self, signature: str, timestamp: float, now: Optional[float] = None) -> bool:
+        """
+        Record a signature unless it has been seen before.
+
+        Args:
+            signature (str): The signature of the request.
+            timestamp (float): The signed timestamp of the request.
+            now (float): The current time, defaults to time.time().
+
+        Returns:
+            bool: True if the signature is new, False if it is a replay or falls into an
+                  evicted bucket.
+        """
+        now = time.time() if now is None else now
+        index = math.floor(timestamp / self.bucket_seconds)
+
+        with self._lock:
+            self._expire(math.floor((now - self.window) / self.bucket_seconds))
+
+            if index < self._oldest_index:
+                return False
+
+            bucket = self._buckets.get(index)
+            if bucket is None:
+                bucket = self._buckets[index] = set()
+            elif signature in bucket:
+                return False
+
+            bucket.add(signature)
+            self._size += 1
+            while self._size > self.max_entries:
+                self._evict_oldest()
+            return True
+
+    def _expire(self, floor_index: int) -> None:
+        if self._oldest_index is None:
+            self._oldest_index = floor_index
+            return
+        if self._oldest_index >= floor_index:
+            return
+
+        if floor_index - self._oldest_index > len(self._buckets):
+            # After a long idle period it is cheaper to scan the remaining buckets
+            for index in [index for index in self._buckets if index < floor_index]:
+                self._drop(index)
+        else:
+            for index in range(self._oldest_index, floor_index):
+                self._drop(index)
+        self._oldest_index = floor_index
+
+    def _evict_oldest(self) -> None:
+        while self._oldest_index not in self._buckets:
+            self._oldest_index += 1
+        self._drop(self._oldest_index)
+        self._oldest_index += 1
+
+    def _drop(self, index: int) -> None:
+        bucket = self._buckets.pop(index, None)
+        if bucket:
+            self._size -= len(bucket)
+
+
+class SharedReplayCache:
+    """
+    Replay cache kept in a state backend, so a request accepted by one worker process is
+    rejected as a replay by all others.
+
+    Each signature is added atomically with a TTL that ends when its signed timestamp
+    leaves the freshness window.
+    """
+
+    def __init__(self, backend: StateBackend, window: float = 300):
+        self.backend = backend
+        self.window = window
+
+    def check_and_add(self, signature: str, timestamp: float, now: Optional[float] = None) -> bool:
+        """
+        Record a signature unless it has been seen before, see ReplayCache.check_and_add.
+        """
+        now = time.time() if now is None else now
+        ttl = timestamp + self.window - now
+        if ttl <= 0:
+            return False
+        return self.backend.add(f"replay:{signature}", "1", ttl)
+
+
+@lru_cache(maxsize=None)
+def get_replay_cache(window: float) -> ReplayCache:
+    """
+    Return the process wide replay cache for a freshness window.
+
+    Middlewares are created per request, so the cache has to outlive them.
+    """
+    return ReplayCache(window=window, bucket_seconds=max(window / 30, 1))
@@ -0,0 +1,142 @@
+import json
+import logging
+import time
+from typing import Any, Mapping, Optional
+from werkzeug import Request, Response
+from endpoints.background import AsyncReply
+from middlewares.base_middleware import SignatureMiddleware
+from middlewares.hmac_middleware import SlackSignatureMiddleware
+from middlewares.replay_cache import SharedReplayCache, get_replay_cache
+
+logger = logging.getLogger(__name__)
+
+SLACK_POST_MESSAGE_URL = "https://slack.com/api/chat.postMessage"
+
+# Time the IDs of accepted events are remembered in seconds, Slack retries an event for up to 5 minutes
+EVENT_ID_WINDOW = 3600
+
+
+class SlackMiddleware(SlackSignatureMiddleware):
+    """
+    Middleware for the Slack Events API.
+
+    Slack expects an answer within 3 seconds and retries every event that takes longer,
+    which is shorter than most chatflow runs. This middleware therefore acknowledges
+    events right away and lets the endpoint run the chatflow in the background. The
+    answer is posted to the configured response URL, which is either an incoming
+    webhook URL or chat.postMessage when a bot token is configured.
+
+    Slack retries events whose acknowledgment it didn't receive in time. The IDs of accepted
+    events are remembered, so a retry is only processed if the original event never arrived.
+    """
+
+    def __init__(self, secret: Optional[str] = None, tolerance: float = SignatureMiddleware.DEFAULT_TOLERANCE,
+                 response_url: Optional[str] = None, bot_token: Optional[str] = None):
+        """
+        Initialize the Slack middleware.
+
+        Args:
+            secret (str): The Slack signing secret.
+            tolerance (float): The maximum accepted age of the request timestamp in seconds.
+            response_url (str): The URL answers are posted to.
+            bot_token (str): The bot token used to authenticate against the Slack API.
+        """
+        super().__init__(secret, tolerance)
+        self.bot_token = bot_token
+        self.response_url = response_url or (SLACK_POST_MESSAGE_URL if bot_token else None)
+
+    @classmethod
+    def from_settings(cls, settings: Mapping) -> "SlackMiddleware":
+        """
+        Create the middleware from the endpoint settings.
+        """
+        return cls(settings.get("signature_verification_key"), cls.tolerance_from_settings(settings),
+                   settings.get("slack_response_url"), settings.get("slack_bot_token"))
+
+    def handle(self, request: Request) -> Optional[Response]:
+        """
+        Answer URL verification challenges and acknowledge events.
+
+        Args:
+            request (Request): The verified request to process.
+
+        Returns:
+            Response: The challenge or acknowledgment, or None when the event should be
+                      processed by the endpoint in the background.
+        """
+        try:
+            payload = request.get_json(silent=True) or {}
+        except (TypeError, ValueError) as e:
+            logger.error("Failed to parse Slack payload: %s", e)
+            return None
+
+        if payload.get("type") == "url_verification":
+            logger.info("URL verification received, sending challenge")
+            return Response(json.dumps({"challenge": payload.get("challenge")}), content_type="application/json")
+
+        if payload.get("type") != "event_callback":
+            logger.info("No specific handler for this request")
+            return None
+
+        event = payload.get("event") or {}
+        if event.get("bot_id") or event.get("subtype") or not event.get("text"):
+            # Ignore messages of bots, including our own replies, and message edits
+            logger.info("Ignoring Slack event of type %s", event.get("type"))
+            return Response(status=200)
+
+        if not self.response_url:
+            logger.error("Slack response URL or bot token is required to answer events")
+            return Response(json.dumps({"error": "Slack response URL is not configured"}),
+                            status=500, content_type="application/json")
+
+        event_id = payload.get("event_id")
+        if event_id and self.is_duplicate_event(event_id):
+            logger.info("Dropping Slack event %s, it was already accepted (retry %s)", event_id,
+                        request.headers.get("X-Slack-Retry-Num"))
+            return Response(status=200, headers={"X-Slack-No-Retry": "1"})
+
+        # The Slack fields allow conversation affinity per channel, thread or user
+        request.default_middleware_json = {
+            "query": event["text"],
+            "inputs": {},
+            "slack": {
+                "channel": event.get("channel"),
+                "thread_ts": event.get("thread_ts") or event.get("ts"),
+                "user": event.get("user"),
+            },
+        }
+        request.async_reply = AsyncReply(
+            self.response_url,
+            lambda result: self.build_reply(event, result),
+            {"Authorization": f"Bearer {self.bot_token}"} if self.bot_token else None,
+        )
+        logger.info("Slack event %s accepted for background processing", payload.get("event_id"))
+        return None
+
+    def is_duplicate_event(self, event_id: str) -> bool:
+        """
+        Check whether an event was accepted before and remember it otherwise.
+
+        Event IDs are remembered for EVENT_ID_WINDOW seconds, in the state backend if one is
+        configured, so a retry is recognized by every worker process.
+
+        Args:
+            event_id (str): The event_id of the event callback.
+
+        Returns:
+            bool: True if the event was already accepted, False otherwise.
+        """
+        cache = get_replay_cache(EVENT_ID_WINDOW) if self.state is None \
+            else SharedReplayCache(self.state, EVENT_ID_WINDOW)
+        return not cache.check_and_add(f"slack-event:{event_id}", time.time())
+
+    @staticmethod
+    def build_reply(event: Mapping[str, Any], result: Mapping[str, Any]) -> dict:
+        """
+        Build the Slack message for a chatflow result, answering in the thread of the event.
+        """
+        reply = {"text": result.get("answer") or json.dumps(result), "channel": event.get("channel")}
+        thread_ts = event.get("thread_ts") or event.get("ts")
+        if thread_ts:
+            reply["thread_ts"] = thread_ts
+        return reply
@@ -0,0 +1,50 @@
+import os
+import tempfile
+import unittest
+from endpoints.affinity import ConversationCache, SqliteConversationStore
+
+
+class TestConversationCache(unittest.TestCase):
+    def test_get_and_set(self):
+        """
+        Tests that the conversation of a key is returned until it expires.
+        """
+        cache = ConversationCache(ttl=60)
+        cache.set("app:C1", "conv-1", now=1000)
+
+        self.assertEqual(cache.get("app:C1", now=1030), "conv-1")
+        self.assertIsNone(cache.get("app:C2", now=1030))
+        self.assertIsNone(cache.get("app:C1", now=1061))
+        self.assertEqual(len(cache), 0)
+
+    def test_lru_eviction(self):
+        """
+        Tests that the least recently used key is evicted when the cache is full.
+        """
+        cache = ConversationCache(max_entries=2)
+        cache.set("a", "conv-a", now=1000)
+        cache.set("b", "conv-b", now=1000)
+        cache.get("a", now=1000)
+
+        cache.set("c", "conv-c", now=1000)
+
+        self.assertEqual(cache.get("a", now=1000), "conv-a")
+        self.assertIsNone(cache.get("b", now=1000))
+
+    def test_backing_store(self):
+        """
+        Tests that conversations are read back from the backing store after a restart.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "conversations.db")
+            ConversationCache(store=SqliteConversationStore(path)).set("a", "conv-a", now=1000)
+
+            cache = ConversationCache(store=SqliteConversationStore(path))
+
+            self.assertEqual(cache.get("a", now=1001), "conv-a")
+            cache.delete("a")
+            self.assertIsNone(ConversationCache(store=SqliteConversationStore(path)).get("a", now=1001))
+
+
+if __name__ == '__main__':
+    unittest.main()
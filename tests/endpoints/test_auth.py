@@ -0,0 +1,79 @@
+import json
+import unittest
+from endpoints.auth import ApiKey, KeyIndex, load_key_index
+
+
+class TestKeyIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = KeyIndex("pepper")
+        self.config = json.dumps({
+            "salt": "pepper",
+            "keys": [
+                {"id": "github", "digest": self.index.hash_key("github-key"), "app_ids": ["app-1"], "tier": "bulk"},
+                {"id": "old", "digest": self.index.hash_key("old-key"), "expires_at": "2000-01-01T00:00:00+00:00"},
+                {"id": "new", "digest": self.index.hash_key("new-key"), "expires_at": 4102444800},
+            ]
+        })
+
+    def test_lookup_returns_metadata(self):
+        """
+        Tests that a known key resolves to its metadata.
+        """
+        index = load_key_index(self.config)
+
+        key = index.lookup("github-key")
+
+        self.assertEqual(key.key_id, "github")
+        self.assertEqual(key.tier, "bulk")
+        self.assertTrue(key.allows_app("app-1"))
+        self.assertFalse(key.allows_app("app-2"))
+
+    def test_lookup_unknown_key(self):
+        """
+        Tests that unknown and empty keys are rejected.
+        """
+        index = load_key_index(self.config)
+
+        self.assertIsNone(index.lookup("unknown"))
+        self.assertIsNone(index.lookup(None))
+        self.assertIsNone(index.lookup(""))
+
+    def test_rotation_overlap(self):
+        """
+        Tests that an expired key and its replacement can coexist in the index.
+        """
+        index = load_key_index(self.config)
+
+        self.assertTrue(index.lookup("old-key").is_expired())
+        self.assertFalse(index.lookup("new-key").is_expired())
+
+    def test_digest_depends_on_salt(self):
+        """
+        Tests that the same key produces different digests for different salts.
+        """
+        self.assertNotEqual(KeyIndex("a").hash_key("key"), KeyIndex("b").hash_key("key"))
+
+    def test_key_without_app_ids_allows_all_apps(self):
+        """
+        Tests that a key without app restrictions may invoke any app.
+        """
+        self.assertTrue(ApiKey("any", "digest").allows_app("app-1"))
+
+    def test_load_key_index_empty(self):
+        """
+        Tests that an empty setting results in no index.
+        """
+        self.assertIsNone(load_key_index(""))
+
+    def test_load_key_index_invalid(self):
+        """
+        Tests that malformed settings are rejected.
+        """
+        with self.assertRaises(ValueError):
+            load_key_index(json.dumps({"keys": []}))
+        with self.assertRaises(ValueError):
+            load_key_index(json.dumps({"salt": "x", "keys": [{"id": "no-digest"}]}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+import hashlib
+import hmac
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest.mock import patch
+import httpx
+from endpoints.background import CallbackDelivery, CallbackDispatcher, CallbackReply, get_callback_client
+
+
+def run_now(fn, *args, **kwargs):
+    fn(*args, **kwargs)
+
+
+class TestCallbackDelivery(unittest.TestCase):
+    def test_signed_headers(self):
+        """
+        Tests that the callback body is signed together with the timestamp.
+        """
+        delivery = CallbackDelivery("https://example.com/cb", b'{"answer": "hi"}', "secret")
+
+        headers = delivery.signed_headers(timestamp=1000)
+
+        expected = hmac.new(b"secret", b'1000.{"answer": "hi"}', hashlib.sha256).hexdigest()
+        self.assertEqual(headers["X-Webhook-Timestamp"], "1000")
+        self.assertEqual(headers["X-Webhook-Signature"], f"sha256={expected}")
+
+    def test_unsigned_headers(self):
+        """
+        Tests that callbacks are sent unsigned without a secret.
+        """
+        headers = CallbackDelivery("https://example.com/cb", b"{}").signed_headers()
+
+        self.assertNotIn("X-Webhook-Signature", headers)
+
+
+class TestCallbackClient(unittest.TestCase):
+    def test_rejects_non_public_address(self):
+        """
+        Tests that the host is resolved and checked again when the callback connects.
+        """
+        with self.assertRaises(ValueError):
+            get_callback_client().post("http://localhost:9/cb", content=b"{}")
+
+    def test_connects_to_checked_address(self):
+        """
+        Tests that the callback connects to the checked address and keeps the host name in the Host header.
+        """
+        hosts = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):  # pylint: disable=invalid-name
+                hosts.append(self.headers["Host"])
+                self.rfile.read(int(self.headers["Content-Length"]))
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.handle_request, daemon=True).start()
+        port = server.server_address[1]
+        try:
+            with patch('endpoints.public_network.check_public_host', return_value=["127.0.0.1"]) as mock_check:
+                response = get_callback_client().post(f"http://callback.example.com:{port}/cb", content=b"{}")
+        finally:
+            server.server_close()
+
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(hosts, [f"callback.example.com:{port}"])
+        mock_check.assert_called_once_with("callback.example.com", port)
+
+
+class TestCallbackDispatcher(unittest.TestCase):
+    def setUp(self):
+        self.dispatcher = CallbackDispatcher(max_per_host=1, max_attempts=2)
+
+    @patch('endpoints.background.submit_background')
+    def test_limits_concurrency_per_host(self, mock_submit_background):
+        """
+        Tests that deliveries above the limit of a host wait until a delivery to that host completed,
+        while other hosts are not delayed.
+        """
+        first = CallbackDelivery("https://slow.example.com/cb", b"{}")
+        second = CallbackDelivery("https://slow.example.com/cb", b"{}")
+        other = CallbackDelivery("https://fast.example.com/cb", b"{}")
+
+        self.dispatcher.submit(first)
+        self.dispatcher.submit(second)
+        self.dispatcher.submit(other)
+
+        self.assertEqual([call[0][1] for call in mock_submit_background.call_args_list], [first, other])
+
+        self.dispatcher._release(first.host)  # pylint: disable=protected-access
+
+        self.assertEqual(mock_submit_background.call_args_list[-1][0][1], second)
+
+    @patch('endpoints.background.threading.Timer')
+    @patch('endpoints.background.submit_background', side_effect=run_now)
+    @patch('endpoints.background.get_callback_client')
+    def test_retries_server_errors(self, mock_get_callback_client, _mock_submit_background, mock_timer):
+        """
+        Tests that server errors are retried with backoff, and client errors are not.
+        """
+        request = httpx.Request("POST", "https://example.com/cb")
+        mock_get_callback_client.return_value.post.return_value = httpx.Response(503, request=request)
+
+        self.dispatcher.submit(CallbackDelivery("https://example.com/cb", b"{}"))
+
+        self.assertEqual(mock_timer.call_args[0][0], 1.0)
+
+        mock_timer.reset_mock()
+        mock_get_callback_client.return_value.post.return_value = httpx.Response(400, request=request)
+        self.dispatcher.submit(CallbackDelivery("https://example.com/cb", b"{}"))
+
+        mock_timer.assert_not_called()
+
+
+class TestCallbackReply(unittest.TestCase):
+    @patch('endpoints.background.get_callback_dispatcher')
+    def test_deliver_and_fail(self, mock_get_callback_dispatcher):
+        """
+        Tests that results and errors are delivered with the request ID.
+        """
+        reply = CallbackReply("https://example.com/cb", "req-1", "secret")
+
+        reply.deliver({"answer": "hi"})
+        reply.fail("boom")
+
+        deliveries = [call[0][0] for call in mock_get_callback_dispatcher.return_value.submit.call_args_list]
+        self.assertEqual(json.loads(deliveries[0].body), {"answer": "hi"})
+        self.assertEqual(json.loads(deliveries[1].body), {"error": "boom"})
+        self.assertEqual(deliveries[0].headers, {"X-Webhook-Request-Id": "req-1"})
+        self.assertEqual(deliveries[0].secret, "secret")
+
+
+if __name__ == '__main__':
+    unittest.main()
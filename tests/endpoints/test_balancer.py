@@ -0,0 +1,130 @@
+import random
+import unittest
+from collections import Counter
+from endpoints.balancer import EJECTION_TIME, FAILURE_THRESHOLD, ReplicaBalancer, load_replica_groups
+from endpoints.state import MemoryStateBackend
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestReplicaBalancer(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.balancer = ReplicaBalancer(("a", "b", "c"), rng=random.Random(1), clock=self.clock)
+
+    def complete(self, replica: str, latency: float) -> None:
+        with self.balancer.track(replica):
+            self.clock.now += latency
+
+    def test_prefers_fast_replicas(self):
+        """
+        Tests that replicas with a lower latency are chosen more often.
+        """
+        self.complete("a", 0.1)
+        self.complete("b", 1.0)
+        self.complete("c", 1.0)
+
+        chosen = Counter(self.balancer.choose() for _ in range(300))
+
+        self.assertGreater(chosen["a"], chosen["b"] + chosen["c"])
+        self.assertGreater(chosen["b"], 0)
+
+    def test_prefers_idle_replicas(self):
+        """
+        Tests that replicas with fewer running invocations are chosen when latencies are equal.
+        """
+        for replica in ("a", "b", "c"):
+            self.complete(replica, 1.0)
+
+        with self.balancer.track("a"), self.balancer.track("a"), self.balancer.track("b"):
+            chosen = Counter(self.balancer.choose() for _ in range(300))
+
+        self.assertEqual(chosen["a"], 0)
+        self.assertGreater(chosen["c"], chosen["b"])
+
+    def test_ejects_failing_replicas(self):
+        """
+        Tests that replicas are out of rotation after consecutive failures until the ejection time passed.
+        """
+        for _ in range(FAILURE_THRESHOLD):
+            with self.assertRaises(RuntimeError):
+                with self.balancer.track("a"):
+                    raise RuntimeError("boom")
+
+        self.assertNotIn("a", {self.balancer.choose() for _ in range(100)})
+        self.clock.now += EJECTION_TIME
+        self.assertIn("a", {self.balancer.choose() for _ in range(100)})
+
+    def test_all_ejected(self):
+        """
+        Tests that all replicas are used when every replica is ejected.
+        """
+        for replica in ("a", "b", "c"):
+            for _ in range(FAILURE_THRESHOLD):
+                with self.assertRaises(RuntimeError):
+                    with self.balancer.track(replica):
+                        raise RuntimeError("boom")
+
+        self.assertEqual({self.balancer.choose() for _ in range(100)}, {"a", "b", "c"})
+
+
+class TestSharedReplicaBalancer(unittest.TestCase):
+    def setUp(self):
+        self.state = MemoryStateBackend()
+        # Two worker processes balancing the same group
+        self.workers = [ReplicaBalancer(("a", "b"), rng=random.Random(seed), state=self.state) for seed in (1, 2)]
+
+    def fail(self, worker: ReplicaBalancer, replica: str) -> None:
+        with self.assertRaises(RuntimeError):
+            with worker.track(replica):
+                raise RuntimeError("boom")
+
+    def test_failures_of_all_workers_eject_replicas(self):
+        """
+        Tests that failures on different workers add up and the ejection applies to every worker.
+        """
+        for i in range(FAILURE_THRESHOLD):
+            self.fail(self.workers[i % 2], "a")
+
+        for worker in self.workers:
+            self.assertEqual({worker.choose() for _ in range(100)}, {"b"})
+
+    def test_success_resets_shared_failures(self):
+        """
+        Tests that a successful invocation on any worker resets the consecutive failures.
+        """
+        for _ in range(FAILURE_THRESHOLD - 1):
+            self.fail(self.workers[0], "a")
+        with self.workers[1].track("a"):
+            pass
+        self.fail(self.workers[0], "a")
+
+        self.assertIn("a", {self.workers[1].choose() for _ in range(100)})
+
+
+class TestReplicaGroups(unittest.TestCase):
+    def test_load(self):
+        """
+        Tests that each group starts with the app itself, without duplicates.
+        """
+        self.assertEqual(load_replica_groups('{"app": ["r1", "app", "r2", "r1"]}'), {"app": ("app", "r1", "r2")})
+        self.assertEqual(load_replica_groups(""), {})
+
+    def test_invalid(self):
+        """
+        Tests that invalid settings raise a ValueError.
+        """
+        for config in ('[]', '{"app": "r1"}', '{"app": [1]}'):
+            with self.subTest(config=config):
+                with self.assertRaises(ValueError):
+                    load_replica_groups(config)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from endpoints.batching import MicroBatcher, split_batch_result
+
+
+class TestMicroBatcher(unittest.TestCase):
+    def test_flush_when_full(self):
+        """
+        Tests that a full batch is invoked once and every item gets its own result.
+        """
+        batcher = MicroBatcher(window=10, max_items=3)
+        calls = []
+
+        def invoke(items):
+            calls.append(list(items))
+            return [item * 2 for item in items]
+
+        with ThreadPoolExecutor(3) as executor:
+            results = list(executor.map(lambda i: batcher.submit("key", i, invoke, timeout=5), [1, 2, 3]))
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(calls[0]), [1, 2, 3])
+        self.assertEqual(results, [2, 4, 6])
+
+    def test_flush_after_window(self):
+        """
+        Tests that a batch that is not full is invoked after the window.
+        """
+        batcher = MicroBatcher(window=0.01, max_items=100)
+
+        self.assertEqual(batcher.submit("key", 1, lambda items: ["done"], timeout=5), "done")
+
+    def test_keys_are_batched_separately(self):
+        """
+        Tests that items with different keys are invoked in different batches.
+        """
+        batcher = MicroBatcher(window=0.05, max_items=100)
+        calls = []
+        lock = threading.Lock()
+
+        def invoke(items):
+            with lock:
+                calls.append(list(items))
+            return items
+
+        with ThreadPoolExecutor(2) as executor:
+            list(executor.map(lambda key: batcher.submit(key, key, invoke, timeout=5), ["a", "b"]))
+
+        self.assertEqual(sorted(calls), [["a"], ["b"]])
+
+    def test_errors_are_raised_for_every_item(self):
+        """
+        Tests that a failed batch invocation fails every item of the batch.
+        """
+        batcher = MicroBatcher(window=0.01, max_items=1)
+
+        def invoke(items):
+            raise RuntimeError("down")
+
+        with self.assertRaises(RuntimeError):
+            batcher.submit("key", 1, invoke, timeout=5)
+
+
+class TestSplitBatchResult(unittest.TestCase):
+    def test_split(self):
+        """
+        Tests that the list at the result path is split into one element per item,
+        and that the whole response is returned if the list doesn't match the batch.
+        """
+        response = {"data": {"outputs": {"results": ["a", "b"]}}}
+
+        self.assertEqual(split_batch_result(response, 2, "$.data.outputs.results"), ["a", "b"])
+        self.assertEqual(split_batch_result(response, 3, "$.data.outputs.results"), [response] * 3)
+        self.assertEqual(split_batch_result(response, 2), [response] * 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
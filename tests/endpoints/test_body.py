@@ -0,0 +1,68 @@
+import io
+import unittest
+from werkzeug import Request
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.test import EnvironBuilder
+from endpoints.body import describe_files, file_parts, is_form_request, nest_inputs, parse_form_body
+
+
+def build_request(**kwargs) -> Request:
+    return Request(EnvironBuilder(method="POST", **kwargs).get_environ())
+
+
+class TestFormBody(unittest.TestCase):
+    def test_urlencoded(self):
+        """
+        Tests that form-urlencoded fields are decoded and repeated fields become lists.
+        """
+        request = build_request(data="From=%2B123&Body=Hello&tag=a&tag=b",
+                                content_type="application/x-www-form-urlencoded")
+
+        form = parse_form_body(request)
+
+        self.assertTrue(is_form_request(request))
+        self.assertEqual(form.fields, {"From": "+123", "Body": "Hello", "tag": ["a", "b"]})
+
+    def test_multipart_files_are_spooled(self):
+        """
+        Tests that file parts are streamed to disk and returned with the form fields.
+        """
+        request = build_request(data={"query": "Summarize", "doc": (io.BytesIO(b"%PDF-1.4"), "doc.pdf",
+                                                                    "application/pdf")})
+
+        form = parse_form_body(request)
+        files = file_parts(form.files)
+
+        self.assertEqual(form.fields, {"query": "Summarize"})
+        self.assertEqual(files["doc"][0].filename, "doc.pdf")
+        self.assertEqual(files["doc"][0].mimetype, "application/pdf")
+        self.assertEqual(files["doc"][0].stream.read(), b"%PDF-1.4")
+        self.assertIsNotNone(files["doc"][0].stream.fileno())
+        self.assertEqual(describe_files(form.files), {"doc": {"filename": "doc.pdf", "mime_type": "application/pdf"}})
+        form.close()
+
+    def test_file_size_limit(self):
+        """
+        Tests that file parts above the size limit are rejected.
+        """
+        request = build_request(data={"doc": (io.BytesIO(b"x" * 2048), "doc.txt")})
+
+        with self.assertRaises(RequestEntityTooLarge):
+            parse_form_body(request, max_file_size=1024)
+
+    def test_nest_inputs(self):
+        """
+        Tests that fields named inputs[name] are moved into the inputs object.
+        """
+        self.assertEqual(nest_inputs({"query": "hi", "inputs[name]": "Ada", "inputs[]": "x"}),
+                         {"query": "hi", "inputs": {"name": "Ada"}, "inputs[]": "x"})
+
+    def test_json_is_not_a_form(self):
+        """
+        Tests that JSON requests are not decoded as forms.
+        """
+        self.assertFalse(is_form_request(build_request(json={"inputs": {}})))
+
+
+if __name__ == '__main__':
+    unittest.main()
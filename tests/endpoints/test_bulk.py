@@ -0,0 +1,80 @@
+import json
+import threading
+import time
+import unittest
+from endpoints.bulk import parse_line, stream_results
+
+
+def decode(results):
+    return [json.loads(line) for line in results]
+
+
+class TestStreamResults(unittest.TestCase):
+    def test_ordered_results(self):
+        """
+        Tests that results are streamed in input order even if later lines finish first.
+        """
+        def process(number, line):
+            time.sleep(0.02 if number == 1 else 0)
+            return {"line": number, "value": parse_line(line)["value"]}
+
+        lines = [b'{"value": "a"}\n', b'\n', b'{"value": "b"}\n', b'{"value": "c"}\n']
+
+        results = decode(stream_results(iter(lines), process, concurrency=3))
+
+        self.assertEqual(results, [{"line": 1, "value": "a"}, {"line": 3, "value": "b"},
+                                   {"line": 4, "value": "c"}])
+
+    def test_unordered_results(self):
+        """
+        Tests that results are streamed in completion order when order is not required.
+        """
+        def process(number, line):
+            time.sleep(0.05 if number == 1 else 0)
+            return {"line": number}
+
+        results = decode(stream_results(iter([b"{}\n", b"{}\n"]), process, concurrency=2, ordered=False))
+
+        self.assertEqual(results, [{"line": 2}, {"line": 1}])
+
+    def test_concurrency_is_bounded(self):
+        """
+        Tests that no more lines than the concurrency are processed at the same time,
+        and that lines are read lazily.
+        """
+        active = []
+        peak = []
+        lock = threading.Lock()
+        read = []
+
+        def lines():
+            for number in range(20):
+                read.append(number)
+                yield b"{}\n"
+
+        def process(number, line):
+            with lock:
+                active.append(number)
+                peak.append(len(active))
+            time.sleep(0.005)
+            with lock:
+                active.remove(number)
+            return {"line": number}
+
+        results = stream_results(lines(), process, concurrency=3)
+        next(results)
+        self.assertLess(len(read), 20)
+
+        self.assertEqual(len(list(results)), 19)
+        self.assertLessEqual(max(peak), 3)
+
+    def test_parse_line_requires_object(self):
+        """
+        Tests that lines other than JSON objects are rejected.
+        """
+        with self.assertRaises(ValueError):
+            parse_line(b"[1, 2]")
+
+
+if __name__ == '__main__':
+    unittest.main()
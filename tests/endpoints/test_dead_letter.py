@@ -0,0 +1,137 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from endpoints.dead_letter import _SCHEMA, DeadLetterStore, get_dead_letter_store, replay
+
+
+class TestDeadLetterStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "dead_letters.db")
+        self.store = DeadLetterStore(self.path)
+
+    def tearDown(self):
+        get_dead_letter_store.cache_clear()
+        self.directory.cleanup()
+
+    def test_add_and_list(self):
+        """
+        Tests that failed invocations are stored with their request and error.
+        """
+        dead_letter_id = self.store.add("workflow", "app-1", {"inputs": {"a": 1}}, {"a": 1}, "boom", now=1000)
+
+        dead_letters = self.store.list()
+
+        self.assertEqual(len(dead_letters), 1)
+        self.assertEqual(dead_letters[0].id, dead_letter_id)
+        self.assertEqual(dead_letters[0].request_body, {"inputs": {"a": 1}})
+        self.assertEqual(dead_letters[0].inputs, {"a": 1})
+        self.assertEqual(dead_letters[0].error, "boom")
+        self.assertEqual(dead_letters[0].attempts, 1)
+
+    def test_fan_out_apps(self):
+        """
+        Tests that the apps of a fan-out are stored with the dead letter.
+        """
+        self.store.add("workflow", "app-1", {}, {}, "boom", app_ids=["triage", "notify"])
+        self.store.add("workflow", "app-1", {}, {}, "boom")
+
+        self.assertEqual([d.app_ids for d in self.store.list()], [["triage", "notify"], None])
+
+    def test_adds_app_ids_column(self):
+        """
+        Tests that stores created without the app_ids column are migrated.
+        """
+        path = os.path.join(self.directory.name, "old.db")
+        connection = sqlite3.connect(path)
+        connection.execute(_SCHEMA.replace(",\n    app_ids TEXT", ""))
+        connection.execute("INSERT INTO dead_letters (handler, app_id, request_body, inputs, error, created_at,"
+                           " last_attempt_at) VALUES ('workflow', 'app-1', '{}', '{}', 'boom', 1, 1)")
+        connection.commit()
+        connection.close()
+
+        store = DeadLetterStore(path)
+        store.add("workflow", "app-1", {}, {}, "boom", app_ids=["triage"])
+
+        self.assertEqual([d.app_ids for d in store.list()], [None, ["triage"]])
+
+    def test_store_is_durable(self):
+        """
+        Tests that dead letters are visible to a new connection to the same file.
+        """
+        self.store.add("chatflow", "app-1", {"query": "hi"}, {}, "boom")
+
+        self.assertEqual(len(DeadLetterStore(self.path)), 1)
+
+    def test_list_pagination_and_ids(self):
+        """
+        Tests listing after an ID and listing specific IDs.
+        """
+        ids = [self.store.add("workflow", f"app-{i}", {}, {}, "boom") for i in range(5)]
+
+        self.assertEqual([d.id for d in self.store.list(limit=2, after_id=ids[1])], ids[2:4])
+        self.assertEqual([d.id for d in self.store.list(ids=[ids[0], ids[4]])], [ids[0], ids[4]])
+
+    def test_replay(self):
+        """
+        Tests that replayed dead letters are removed and failed ones record the attempt.
+        """
+        ok_id = self.store.add("workflow", "ok", {}, {}, "boom")
+        failing_id = self.store.add("workflow", "failing", {}, {}, "boom")
+
+        def invoke(dead_letter):
+            if dead_letter.app_id == "failing":
+                raise RuntimeError("still down")
+            return None
+
+        result = replay(self.store, invoke, self.store.list(), concurrency=2)
+
+        self.assertEqual(result, {"replayed": [ok_id], "failed": [failing_id], "pending": []})
+        remaining = self.store.list()
+        self.assertEqual([d.id for d in remaining], [failing_id])
+        self.assertEqual(remaining[0].attempts, 2)
+        self.assertEqual(remaining[0].error, "still down")
+
+    def test_replay_deadline(self):
+        """
+        Tests that dead letters are kept unchanged as pending once the deadline has passed.
+        """
+        dead_letter_id = self.store.add("workflow", "app-1", {}, {}, "boom")
+
+        result = replay(self.store, lambda dead_letter: None, self.store.list(), deadline=0)
+
+        self.assertEqual(result, {"replayed": [], "failed": [], "pending": [dead_letter_id]})
+        self.assertEqual(self.store.list()[0].attempts, 1)
+
+    def test_endpoints(self):
+        """
+        Tests that dead letters are listed by the endpoint that stored them, and that stores
+        created without the endpoint column are migrated.
+        """
+        path = os.path.join(self.directory.name, "old.db")
+        connection = sqlite3.connect(path)
+        connection.execute(_SCHEMA.replace(",\n    endpoint TEXT NOT NULL DEFAULT ''", ""))
+        connection.execute("INSERT INTO dead_letters (handler, app_id, request_body, inputs, error, created_at,"
+                           " last_attempt_at) VALUES ('workflow', 'app-1', '{}', '{}', 'boom', 1, 1)")
+        connection.commit()
+        connection.close()
+
+        store = DeadLetterStore(path)
+        store.add("workflow", "app-2", {}, {}, "boom", endpoint="endpoint-a")
+        store.add("workflow", "app-3", {}, {}, "boom", endpoint="endpoint-b")
+
+        self.assertEqual([d.app_id for d in store.list(endpoint="endpoint-a")], ["app-2"])
+        self.assertEqual([d.app_id for d in store.list(endpoint="")], ["app-1"])
+        self.assertEqual(len(store.list()), 3)
+
+    def test_get_dead_letter_store(self):
+        """
+        Tests that no store is created when the setting is empty.
+        """
+        self.assertIsNone(get_dead_letter_store(""))
+        self.assertIs(get_dead_letter_store(self.path), get_dead_letter_store(self.path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+from werkzeug.datastructures import Headers
+from endpoints.event_filter import EventFilter, load_event_filter
+
+
+class TestEventFilter(unittest.TestCase):
+    def setUp(self):
+        self.headers = Headers({"X-GitHub-Event": "issues"})
+        self.body = {"action": "opened", "issue": {"title": "bug: crash", "comments": 3,
+                                                   "labels": [{"name": "bug"}, {"name": "ui"}]}}
+
+    def matches(self, rules) -> bool:
+        return EventFilter(rules).matches(self.headers, self.body)
+
+    def test_header_conditions(self):
+        """
+        Tests conditions on headers, whose names are case-insensitive.
+        """
+        self.assertTrue(self.matches({"header": "x-github-event", "equals": "issues"}))
+        self.assertFalse(self.matches({"header": "X-GitHub-Event", "equals": "push"}))
+        self.assertFalse(self.matches({"header": "X-Hub-Signature", "exists": True}))
+
+    def test_field_conditions(self):
+        """
+        Tests the operators on body fields.
+        """
+        self.assertTrue(self.matches({"field": "$.action", "in": ["opened", "reopened"]}))
+        self.assertTrue(self.matches({"field": "$.issue.title", "matches": "^bug"}))
+        self.assertTrue(self.matches({"field": "$.issue.labels[*].name", "contains": "bug"}))
+        self.assertTrue(self.matches({"field": "$.issue.comments", "gte": 3, "lt": 10}))
+        self.assertFalse(self.matches({"field": "$.issue.comments", "gt": 3}))
+        self.assertFalse(self.matches({"field": "$.issue.title", "gt": 3}))
+        self.assertTrue(self.matches({"field": "$.issue.assignee", "exists": False}))
+        self.assertFalse(self.matches({"field": "$.issue.assignee", "equals": None}))
+
+    def test_combinations(self):
+        """
+        Tests all, any, not and lists of rules.
+        """
+        self.assertTrue(self.matches({"all": [
+            {"header": "X-GitHub-Event", "equals": "issues"},
+            {"any": [{"field": "$.action", "equals": "closed"}, {"field": "$.issue.comments", "lt": 5}]},
+            {"not": {"field": "$.issue.labels[*].name", "contains": "wontfix"}},
+        ]}))
+        self.assertFalse(self.matches([{"field": "$.action", "equals": "opened"},
+                                       {"not": {"header": "X-GitHub-Event", "exists": True}}]))
+
+    def test_invalid_rules(self):
+        """
+        Tests that invalid rules are rejected when the filter is compiled.
+        """
+        for config in ('[1]', '{"field": "$.a"}', '{"field": "$.a", "header": "b", "exists": true}',
+                       '{"field": "$.a", "like": "b"}', '{"field": "$.a", "matches": "("}',
+                       '{"field": "$.a", "gt": "1"}', '{"all": {"field": "$.a", "exists": true}}',
+                       '{"not": {"field": "$.a", "exists": true}, "any": []}', '{"field": "$.a", "in": "b"}'):
+            with self.subTest(config=config):
+                with self.assertRaises(ValueError):
+                    load_event_filter(config)
+
+    def test_empty_config(self):
+        """
+        Tests that no filter is configured for an empty setting.
+        """
+        self.assertIsNone(load_event_filter(""))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,7 +2,8 @@ import json
 import unittest
 from unittest.mock import Mock, patch
 from werkzeug import Request, Response
-from endpoints.helpers import apply_middleware, validate_api_key
+from endpoints.helpers import apply_middleware, get_callback_url, validate_api_key
+from endpoints.auth import KeyIndex
 
 class TestHelpers(unittest.TestCase):
     def setUp(self):
@@ -14,7 +15,7 @@ class TestHelpers(unittest.TestCase):
             "api_key_location": "api_key_header"
         }
 
-    @patch('endpoints.helpers.DiscordMiddleware.invoke')
+    @patch('middlewares.discord_middleware.DiscordMiddleware.invoke')
     def test_apply_middleware_success(self, mock_invoke):
         """
         Tests apply_middleware function when middleware successfully returns a response.
@@ -29,7 +30,7 @@ class TestHelpers(unittest.TestCase):
         self.assertEqual(response, mock_response)
         mock_invoke.assert_called_once_with(self.request)
 
-    @patch('endpoints.helpers.DiscordMiddleware.invoke')
+    @patch('middlewares.discord_middleware.DiscordMiddleware.invoke')
     def test_apply_middleware_error(self, mock_invoke):
         """
         Tests apply_middleware function when an exception occurs within the middleware.
@@ -42,7 +43,7 @@ class TestHelpers(unittest.TestCase):
         self.assertEqual(response.status_code, 500)
         self.assertIn("Middleware error", response.data.decode())
 
-    @patch('endpoints.helpers.DiscordMiddleware.invoke')
+    @patch('middlewares.discord_middleware.DiscordMiddleware.invoke')
     @patch('endpoints.helpers.DefaultMiddleware.invoke')
     def test_apply_middleware_with_default_middleware(self, mock_default_invoke, mock_discord_invoke):
         """
@@ -61,7 +62,7 @@ class TestHelpers(unittest.TestCase):
         mock_discord_invoke.assert_called_once_with(self.request)
         mock_default_invoke.assert_called_once_with(self.request, self.settings)
 
-    @patch('endpoints.helpers.DiscordMiddleware.invoke')
+    @patch('middlewares.discord_middleware.DiscordMiddleware.invoke')
     @patch('endpoints.helpers.DefaultMiddleware.invoke')
     def test_apply_middleware_default_middleware_error(self, mock_default_invoke, mock_discord_invoke):
         """
@@ -81,7 +82,7 @@ class TestHelpers(unittest.TestCase):
         mock_discord_invoke.assert_called_once_with(self.request)
         mock_default_invoke.assert_called_once_with(self.request, self.settings)
 
-    @patch('endpoints.helpers.DiscordMiddleware.invoke')
+    @patch('middlewares.discord_middleware.DiscordMiddleware.invoke')
     @patch('endpoints.helpers.DefaultMiddleware')
     def test_apply_middleware_with_different_middleware_type(self, mock_default_middleware_class, mock_discord_invoke):
         """
@@ -103,6 +104,33 @@ class TestHelpers(unittest.TestCase):
         mock_discord_invoke.assert_not_called()
         mock_default_middleware.invoke.assert_called_once_with(self.request, settings)
 
+    @patch('middlewares.hmac_middleware.GitHubMiddleware.invoke')
+    def test_apply_middleware_github(self, mock_invoke):
+        """
+        Tests apply_middleware function with the github middleware type.
+        Ensures the middleware is looked up in the registry and its response is returned.
+        """
+        settings = dict(self.settings, middleware="github", signature_verification_key="secret")
+        mock_response = Mock(spec=Response)
+        mock_invoke.return_value = mock_response
+
+        response = apply_middleware(self.request, settings)
+
+        self.assertEqual(response, mock_response)
+        mock_invoke.assert_called_once_with(self.request)
+
+    def test_apply_middleware_missing_key(self):
+        """
+        Tests apply_middleware function when the signature verification key is missing.
+        Ensures the function returns a 500 response instead of raising.
+        """
+        settings = dict(self.settings, middleware="stripe", signature_verification_key=None)
+
+        response = apply_middleware(self.request, settings)
+
+        self.assertEqual(response.status_code, 500)
+        self.assertIn("Middleware error", response.data.decode())
+
     def test_validate_api_key_success(self):
         """
         Tests validate_api_key function when the API key is valid.
@@ -153,5 +181,96 @@ class TestHelpers(unittest.TestCase):
         self.assertEqual(response.status_code, 403)
         self.assertEqual(json.loads(response.data), {"error": "Invalid API key"})
 
+    def test_validate_api_key_from_key_index(self):
+        """
+        Tests validate_api_key function with a key from the api_keys index.
+        Ensures the key metadata is attached to the request.
+        """
+        settings = self.settings.copy()
+        settings["api_key"] = None
+        settings["api_keys"] = json.dumps({
+            "salt": "pepper",
+            "keys": [{"id": "github", "digest": KeyIndex("pepper").hash_key("github-key"), "app_ids": ["app-1"]}]
+        })
+        self.request.headers = {"x-api-key": "github-key"}
+
+        response = validate_api_key(self.request, settings)
+
+        self.assertIsNone(response)
+        self.assertEqual(self.request.api_key_info.key_id, "github")
+
+    def test_validate_api_key_expired_key(self):
+        """
+        Tests validate_api_key function with an expired key from the api_keys index.
+        Ensures it returns a 403 response.
+        """
+        settings = self.settings.copy()
+        settings["api_keys"] = json.dumps({
+            "salt": "pepper",
+            "keys": [{"id": "old", "digest": KeyIndex("pepper").hash_key("old-key"), "expires_at": 0}]
+        })
+        self.request.headers = {"x-api-key": "old-key"}
+
+        response = validate_api_key(self.request, settings)
+
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(json.loads(response.data), {"error": "API key expired"})
+
+    def test_validate_api_key_invalid_key_index(self):
+        """
+        Tests validate_api_key function with a malformed api_keys setting.
+        Ensures it returns a 500 response.
+        """
+        settings = self.settings.copy()
+        settings["api_keys"] = "not json"
+        self.request.headers = {"x-api-key": "test_api_key"}
+
+        response = validate_api_key(self.request, settings)
+
+        self.assertEqual(response.status_code, 500)
+        self.assertIn("Invalid api_keys setting", response.data.decode())
+
+    def test_get_callback_url_allowed_hosts(self):
+        """
+        Tests get_callback_url function with the callback_allowed_hosts setting.
+        Ensures only the listed hosts and subdomains of wildcard entries are accepted.
+        """
+        settings = {"callback_allowed_hosts": "hooks.example.com, *.example.org"}
+        public = [(2, 1, 6, "", ("93.184.215.14", 443))]
+
+        with patch('endpoints.helpers.socket.getaddrinfo', return_value=public):
+            for url in ["https://hooks.example.com/cb", "https://HOOKS.example.com./cb", "https://a.b.example.org/cb"]:
+                self.request.headers = {"x-callback-url": url}
+                self.assertEqual(get_callback_url(self.request, {}, settings), url)
+
+            for url in ["https://example.com/cb", "https://example.org/cb", "https://evilexample.org/cb",
+                        "https://hooks.example.com.evil.net/cb"]:
+                self.request.headers = {"x-callback-url": url}
+                with self.assertRaisesRegex(ValueError, "not allowed"):
+                    get_callback_url(self.request, {}, settings)
+
+    def test_get_callback_url_non_public_address(self):
+        """
+        Tests get_callback_url function with hosts that resolve to non-public addresses.
+        Ensures private, loopback, link-local and IPv4-mapped addresses are rejected.
+        """
+        for address in ["10.1.2.3", "192.168.0.1", "127.0.0.1", "169.254.169.254", "::1", "fe80::1%eth0",
+                        "fd00::1", "::ffff:127.0.0.1", "0.0.0.0"]:
+            with self.subTest(address=address), \
+                    patch('endpoints.helpers.socket.getaddrinfo', return_value=[(2, 1, 6, "", (address, 80))]):
+                self.request.headers = {"x-callback-url": "http://hooks.example.com/cb"}
+                with self.assertRaisesRegex(ValueError, "non-public address"):
+                    get_callback_url(self.request, {}, {})
+
+    def test_get_callback_url_unresolvable_host(self):
+        """
+        Tests get_callback_url function with a host that cannot be resolved.
+        Ensures the callback URL is rejected.
+        """
+        self.request.headers = {"x-callback-url": "http://missing.invalid/cb"}
+
+        with self.assertRaisesRegex(ValueError, "cannot be resolved"):
+            get_callback_url(self.request, {}, {})
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,22 @@
+import unittest
+from benchmarks.bench_import_time import MODULE, measure
+
+
+class TestImportTime(unittest.TestCase):
+    def test_middleware_libraries_are_lazy(self):
+        """
+        Tests that the endpoint imports no middleware and its libraries until one is configured.
+
+        The import time budget depends on the machine, so it is checked by
+        `python -m benchmarks.bench_import_time` in its own CI step instead.
+        """
+        modules = {entry.module for entry in measure(write_bytecode=False).imports}
+
+        self.assertIn(MODULE, modules)
+        self.assertFalse({module for module in modules if module.split(".")[0] == "nacl"})
+        self.assertNotIn("middlewares.discord_middleware", modules)
+        self.assertNotIn("middlewares.hmac_middleware", modules)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import unittest
+from endpoints.input_schema import FAILED_FETCH_TTL, SchemaCache, parse_app_info
+
+APP_INFO = {"data": {"user_input_form": [
+    {"text-input": {"variable": "title", "label": "Title", "required": True, "max_length": 10}},
+    {"paragraph": {"variable": "body", "label": "Body", "required": False}},
+    {"select": {"variable": "priority", "label": "Priority", "required": False, "options": ["low", "high"]}},
+    {"number": {"variable": "count", "label": "Count", "required": False}},
+    {"file": {"variable": "attachment", "label": "Attachment", "required": False}},
+]}}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestInputSchema(unittest.TestCase):
+    def setUp(self):
+        self.schema = parse_app_info(APP_INFO)
+
+    def test_valid_inputs_are_coerced(self):
+        """
+        Tests that valid inputs are coerced to the declared types and unknown inputs are kept.
+        """
+        self.assertEqual(self.schema.validate({"title": 42, "count": "2.5", "priority": "low", "extra": [1]}),
+                         {"title": "42", "count": 2.5, "priority": "low", "extra": [1]})
+
+    def test_invalid_inputs(self):
+        """
+        Tests that all violations are reported.
+        """
+        with self.assertRaises(ValueError) as context:
+            self.schema.validate({"title": "x" * 11, "priority": "urgent", "count": "many", "body": {"a": 1}})
+
+        message = str(context.exception)
+        for expected in ("title must be at most 10 characters", "priority must be one of low, high",
+                         "count must be a number", "body must be a string"):
+            self.assertIn(expected, message)
+
+    def test_select_rejects_lists_and_objects(self):
+        """
+        Tests that select inputs that are not strings are reported as invalid.
+        """
+        for value in (["low"], {"low": 1}, 1):
+            with self.subTest(value=value):
+                with self.assertRaisesRegex(ValueError, "priority must be one of low, high"):
+                    self.schema.validate({"title": "T", "priority": value})
+
+    def test_required(self):
+        """
+        Tests that required inputs must not be missing or empty.
+        """
+        for inputs in ({}, {"title": ""}, {"title": None}):
+            with self.subTest(inputs=inputs):
+                with self.assertRaisesRegex(ValueError, "title is required"):
+                    self.schema.validate(inputs)
+
+    def test_unwrapped_parameters(self):
+        """
+        Tests that parameters without the data wrapper are accepted.
+        """
+        schema = parse_app_info(APP_INFO["data"])
+
+        self.assertEqual([field.variable for field in schema.fields],
+                         ["title", "body", "priority", "count", "attachment"])
+
+
+class TestSchemaCache(unittest.TestCase):
+    def test_ttl(self):
+        """
+        Tests that the schema is fetched once per TTL.
+        """
+        clock = FakeClock()
+        cache = SchemaCache(ttl=60, clock=clock)
+        fetched = []
+
+        def source(app_id):
+            fetched.append(app_id)
+            return APP_INFO
+
+        cache.get("app-1", source)
+        clock.now += 59
+        cache.get("app-1", source)
+        self.assertEqual(fetched, ["app-1"])
+
+        clock.now += 1
+        cache.get("app-1", source)
+        self.assertEqual(fetched, ["app-1", "app-1"])
+
+    def test_failed_fetch(self):
+        """
+        Tests that no schema is returned when the source fails, and that the failure is remembered.
+        """
+        clock = FakeClock()
+        cache = SchemaCache(clock=clock)
+        calls = []
+
+        def source(app_id):
+            calls.append(app_id)
+            raise RuntimeError("unavailable")
+
+        self.assertIsNone(cache.get("app-1", source))
+        self.assertIsNone(cache.get("app-1", source))
+        self.assertEqual(len(calls), 1)
+
+        clock.now += FAILED_FETCH_TTL
+        self.assertIsNotNone(cache.get("app-1", lambda app_id: APP_INFO))
+
+
+if __name__ == '__main__':
+    unittest.main()
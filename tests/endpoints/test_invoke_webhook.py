@@ -1,11 +1,29 @@
 # pylint: disable=W0212
 
+import io
 import json
+import logging
+import os
+import tempfile
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import Mock, patch
 from werkzeug import Request, Response
+from werkzeug.test import EnvironBuilder
 from dify_plugin.core.runtime import Session
 from endpoints.invoke_endpoint import WebhookEndpoint
+from endpoints.affinity import get_conversation_cache
+from endpoints.auth import ApiKey
+from endpoints.batching import get_micro_batcher
+from endpoints.dead_letter import get_dead_letter_store
+from endpoints.job_queue import Job, get_job_queue
+from endpoints.limiter import Overloaded
+from endpoints.result_cache import get_result_cache
+from endpoints.input_schema import get_schema_cache
+from endpoints import warmup
+
+# Resolver answer for callback hosts, the tests don't have DNS
+PUBLIC_ADDRESS = [(2, 1, 6, "", ("93.184.215.14", 443))]
 
 class TestWebhookEndpoint(unittest.TestCase):
     def setUp(self):
@@ -342,6 +360,785 @@ class TestWebhookEndpoint(unittest.TestCase):
         # Assert the exception message
         self.assertEqual(str(context.exception), "Workflow error")
 
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    def test_api_key_not_allowed_for_app(self, mock_validate_api_key, mock_apply_middleware):
+        """Tests that an API key restricted to other apps is rejected.
+        Ensures the app_ids metadata of the key is enforced after routing."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+
+        self.mock_request.api_key_info = ApiKey("github", "digest", frozenset({"other-app"}))
+        self.mock_request.get_json.return_value = {"inputs": {}}
+        self.mock_request.path = "/single-workflow"
+
+        response = self.endpoint._invoke(
+            self.mock_request, {}, self.default_settings)
+
+        self.assertEqual(response.status_code, 403)
+        self.mock_session.app.workflow.invoke.assert_not_called()
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    def test_input_mapping_single_workflow(self, mock_validate_api_key, mock_apply_middleware):
+        """Tests /single-workflow with an input_mapping setting.
+        Ensures only the mapped fields of the body are sent as inputs."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+
+        self.mock_request.get_json.return_value = {
+            "action": "opened", "issue": {"title": "Bug", "body": "Large body"}}
+        self.mock_request.path = "/single-workflow"
+        settings = dict(self.default_settings, input_mapping=json.dumps(
+            {"title": "$.issue.title", "action": "$.action"}))
+
+        response = self.endpoint._invoke(self.mock_request, {}, settings)
+
+        self.assertEqual(response.status_code, 200)
+        self.mock_session.app.workflow.invoke.assert_called_once_with(
+            app_id="static-app-id",
+            inputs={"title": "Bug", "action": "opened"},
+            response_mode="blocking"
+        )
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    def test_input_mapping_single_chatflow(self, mock_validate_api_key, mock_apply_middleware):
+        """Tests /single-chatflow with an input_mapping setting that provides the query.
+        Ensures the mapped query is used and removed from the inputs."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+
+        self.mock_request.get_json.return_value = {
+            "message": {"text": "Hello", "author": "octo"}}
+        self.mock_request.path = "/single-chatflow"
+        settings = dict(self.default_settings, input_mapping=json.dumps(
+            {"query": "$.message.text", "author": "$.message.author"}))
+
+        response = self.endpoint._invoke(self.mock_request, {}, settings)
+
+        self.assertEqual(response.status_code, 200)
+        self.mock_session.app.chat.invoke.assert_called_once_with(
+            app_id="static-app-id",
+            query="Hello",
+            conversation_id=None,
+            inputs={"author": "octo"},
+            response_mode="blocking"
+        )
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    def test_raw_data_output_missing_data(self, mock_validate_api_key, mock_apply_middleware):
+        """Tests raw_data_output when the workflow response has no data field.
+        Ensures the full response is returned instead of failing with a KeyError."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+
+        self.mock_request.get_json.return_value = {"inputs": {}}
+        self.mock_request.path = "/single-workflow"
+        self.mock_session.app.workflow.invoke.return_value = {"status": "failed"}
+        settings = dict(self.default_settings, raw_data_output=True)
+
+        response = self.endpoint._invoke(self.mock_request, {}, settings)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data), {"status": "failed"})
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    def test_output_projection_single_workflow(self, mock_validate_api_key, mock_apply_middleware):
+        """Tests /single-workflow with an output_projection setting.
+        Ensures only the projected fields are returned."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+
+        self.mock_request.get_json.return_value = {"inputs": {}}
+        self.mock_request.path = "/single-workflow"
+        settings = dict(self.default_settings, output_projection=json.dumps(
+            {"fields": {"result": "$.data.outputs.result"}}))
+
+        response = self.endpoint._invoke(self.mock_request, {}, settings)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data), {"result": "Test workflow output"})
+
+    @patch('endpoints.invoke_endpoint.submit_background')
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    def test_async_reply_acknowledges_immediately(self, mock_validate_api_key, mock_apply_middleware,
+                                                  mock_submit_background):
+        """Tests that requests with an async reply are acknowledged before the app runs,
+        and that the result is delivered once the background invocation completes."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+        self.mock_request.path = "/single-chatflow"
+        self.mock_request.default_middleware_json = {"query": "Hello", "inputs": {}}
+        self.mock_request.async_reply = Mock()
+
+        response = self.endpoint._invoke(self.mock_request, {}, self.default_settings)
+
+        self.assertEqual(response.status_code, 200)
+        self.mock_session.app.chat.invoke.assert_not_called()
+
+        fn, *args = mock_submit_background.call_args[0]
+        fn(*args)
+
+        self.mock_session.app.chat.invoke.assert_called_once()
+        self.mock_request.async_reply.deliver.assert_called_once_with(self.chatflow_response)
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    def test_failed_invocation_is_dead_lettered_and_replayed(self, mock_validate_api_key, mock_apply_middleware):
+        """Tests that failed invocations are stored in the dead letter store,
+        listed through the admin route and removed after a successful replay."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+        with tempfile.TemporaryDirectory() as directory:
+            settings = dict(self.default_settings, admin_api_key="admin-key",
+                            dead_letter_store=os.path.join(directory, "dead_letters.db"))
+            self.mock_session.endpoint_id = "endpoint-1"
+            self.mock_request.path = "/single-workflow"
+            self.mock_request.get_json.return_value = {"inputs": {"key": "value"}}
+            self.mock_session.app.workflow.invoke.return_value = None
+
+            response = self.endpoint._invoke(self.mock_request, {}, settings)
+            self.assertEqual(response.status_code, 500)
+            # Another endpoint that shares the store file
+            store = get_dead_letter_store(settings["dead_letter_store"])
+            other_id = store.add("workflow", "other-app", {}, {}, "boom", endpoint="endpoint-2")
+
+            admin_request = Mock(spec=Request)
+            admin_request.path = "/dead-letters"
+            admin_request.headers = {"x-api-key": "admin-key"}
+            admin_request.args = {}
+            response = self.endpoint._invoke(admin_request, {}, settings)
+            dead_letters = json.loads(response.data)["dead_letters"]
+            self.assertEqual(len(dead_letters), 1)
+            self.assertEqual(dead_letters[0]["app_id"], "static-app-id")
+            self.assertEqual(dead_letters[0]["inputs"], {"key": "value"})
+
+            self.mock_session.app.workflow.invoke.return_value = self.workflow_response
+            admin_request.path = "/dead-letters/replay"
+            admin_request.get_json = Mock(return_value={})
+            response = self.endpoint._invoke(admin_request, {}, settings)
+
+            self.assertEqual(json.loads(response.data),
+                             {"replayed": [dead_letters[0]["id"]], "failed": [], "pending": []})
+            self.mock_session.app.workflow.invoke.assert_called_with(
+                app_id="static-app-id", inputs={"key": "value"}, response_mode="blocking")
+            self.assertEqual([d.id for d in store.list()], [other_id])
+            get_dead_letter_store.cache_clear()
+
+    def test_failed_fan_out_is_replayed_to_all_apps(self):
+        """Tests that a failed fan-out is dead lettered with all routed apps and replayed to each of them."""
+        with tempfile.TemporaryDirectory() as directory:
+            settings = dict(self.default_settings,
+                            dead_letter_store=os.path.join(directory, "dead_letters.db"),
+                            routing_table='{"index": {"field": "$.type"}, "routes": '
+                                          '[{"key": "issue", "apps": ["triage", "notify"]}]}')
+            self.mock_session.app.workflow.invoke.side_effect = RuntimeError("down")
+
+            with self.assertRaises(RuntimeError):
+                self.endpoint._invoke_handler("workflow", "static-app-id", {"type": "issue", "inputs": {}}, {},
+                                              settings, app_ids=["triage", "notify"])
+
+            dead_letter = get_dead_letter_store(settings["dead_letter_store"]).list()[0]
+            self.assertEqual(dead_letter.app_ids, ["triage", "notify"])
+
+            self.mock_session.app.workflow.invoke.side_effect = lambda app_id, **kwargs: {"data": {"app": app_id}}
+            self.mock_session.app.workflow.invoke.reset_mock()
+            # Replayed outside of the replay pool, gevent can't nest thread pools under pytest
+            self.assertIsNone(self.endpoint._replay_dead_letter(dead_letter, settings))
+
+            invoked = {call.kwargs["app_id"] for call in self.mock_session.app.workflow.invoke.call_args_list}
+            self.assertEqual(invoked, {"triage", "notify"})
+            get_dead_letter_store.cache_clear()
+
+    def test_partially_failed_fan_out_is_dead_lettered_per_app(self):
+        """Tests that each app that failed while another routed app succeeded is stored as its own dead letter."""
+        with tempfile.TemporaryDirectory() as directory:
+            settings = dict(self.default_settings,
+                            dead_letter_store=os.path.join(directory, "dead_letters.db"),
+                            routing_table='{"index": {"field": "$.type"}, "routes": '
+                                          '[{"key": "issue", "apps": ["triage", "notify"]}]}')
+
+            def invoke(app_id, **kwargs):
+                if app_id == "notify":
+                    raise RuntimeError("down")
+                return {"data": {"app": app_id}}
+            self.mock_session.app.workflow.invoke.side_effect = invoke
+
+            response = self.endpoint._invoke_handler("workflow", "static-app-id", {"type": "issue", "inputs": {}},
+                                                     {"key": "value"}, settings, app_ids=["triage", "notify"])
+
+            self.assertEqual(response["errors"], {"notify": "down"})
+            dead_letters = get_dead_letter_store(settings["dead_letter_store"]).list()
+            self.assertEqual([(d.app_id, d.app_ids, d.inputs, d.error) for d in dead_letters],
+                             [("notify", None, {"key": "value"}, "down")])
+            get_dead_letter_store.cache_clear()
+
+    def test_admin_routes_require_admin_key(self):
+        """Tests that admin routes are disabled without the admin key setting
+        and reject requests with a wrong key."""
+        self.mock_request.path = "/dead-letters"
+        self.mock_request.headers = {"x-api-key": "wrong"}
+
+        response = self.endpoint._invoke(self.mock_request, {}, self.default_settings)
+        self.assertEqual(response.status_code, 404)
+
+        settings = dict(self.default_settings, admin_api_key="admin-key")
+        response = self.endpoint._invoke(self.mock_request, {}, settings)
+        self.assertEqual(response.status_code, 403)
+
+    @patch('endpoints.invoke_endpoint.get_job_queue')
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    def test_job_queue_acknowledges_with_job_id(self, mock_validate_api_key, mock_apply_middleware,
+                                                mock_get_job_queue):
+        """Tests that requests are enqueued and acknowledged with 202 when a job queue is configured,
+        and that the queued job invokes the app."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+        mock_get_job_queue.return_value.enqueue.return_value = 7
+        self.mock_session.endpoint_id = "endpoint-1"
+        self.mock_request.path = "/single-workflow"
+        self.mock_request.get_json.return_value = {"inputs": {"key": "value"}}
+        settings = dict(self.default_settings, job_queue="jobs.db")
+
+        response = self.endpoint._invoke(self.mock_request, {}, settings)
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(json.loads(response.data), {"job_id": 7})
+        self.mock_session.app.workflow.invoke.assert_not_called()
+        self.assertEqual(mock_get_job_queue.return_value.enqueue.call_args[1]["endpoint"], "endpoint-1")
+        self.assertEqual(mock_get_job_queue.return_value.bind.call_args[0][2], "endpoint-1")
+
+        payload = mock_get_job_queue.return_value.enqueue.call_args[0][0]
+        process = mock_get_job_queue.return_value.bind.call_args[0][0]
+        process(Job(id=7, payload=payload, created_at=0, attempts=1))
+        self.mock_session.app.workflow.invoke.assert_called_once_with(
+            app_id="static-app-id", inputs={"key": "value"}, response_mode="blocking")
+
+    @patch('endpoints.invoke_endpoint.get_job_queue')
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    def test_job_queue_priority_class(self, mock_validate_api_key, mock_apply_middleware, mock_get_job_queue):
+        """Tests that jobs are enqueued with the priority class of their handler, that the X-Priority-Class
+        header can lower but not raise it, and that invalid priority_classes settings are rejected."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+        job_queue = mock_get_job_queue.return_value
+        job_queue.enqueue.return_value = 7
+        self.mock_request.path = "/single-workflow"
+        self.mock_request.get_json.return_value = {"inputs": {}}
+        settings = dict(self.default_settings, job_queue="jobs.db",
+                        priority_classes='{"weights": {"interactive": 8, "bulk": 1}, '
+                                         '"handlers": {"workflow": "bulk"}}')
+
+        self.endpoint._invoke(self.mock_request, {}, settings)
+        self.assertEqual(job_queue.enqueue.call_args[0][1], "bulk")
+        job_queue.set_weights.assert_called_with({"interactive": 8.0, "bulk": 1.0})
+
+        self.mock_request.headers = {"x-priority-class": "interactive"}
+        self.endpoint._invoke(self.mock_request, {}, settings)
+        self.assertEqual(job_queue.enqueue.call_args[0][1], "bulk")
+
+        self.mock_request.headers = {"x-priority-class": "bulk"}
+        self.endpoint._invoke(self.mock_request, {}, dict(settings, priority_classes=settings["priority_classes"]
+                                                          .replace('"workflow": "bulk"', '"workflow": "interactive"')))
+        self.assertEqual(job_queue.enqueue.call_args[0][1], "bulk")
+
+        response = self.endpoint._invoke(self.mock_request, {}, dict(settings, priority_classes='{"weights": []}'))
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(job_queue.enqueue.call_count, 3)
+
+    def test_job_stats_route(self):
+        """Tests that the job stats admin route returns the stats of each priority class."""
+        with tempfile.TemporaryDirectory() as directory:
+            settings = dict(self.default_settings, admin_api_key="admin-key",
+                            job_queue=os.path.join(directory, "jobs.db"),
+                            priority_classes='{"weights": {"interactive": 8}}')
+            self.mock_request.path = "/jobs/stats"
+            self.mock_request.method = "GET"
+            self.mock_request.headers = {"x-api-key": "admin-key"}
+
+            response = self.endpoint._invoke(self.mock_request, {}, dict(settings, job_queue=""))
+            self.assertEqual(response.status_code, 404)
+
+            get_job_queue(settings["job_queue"]).enqueue({"app_id": "app-1"}, "interactive")
+            response = self.endpoint._invoke(self.mock_request, {}, settings)
+
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(json.loads(response.data), {"priority_classes": {
+                "interactive": {"depth": 1, "weight": 8.0}}})
+
+    def test_run_jobs_route(self):
+        """Tests that the run jobs admin route processes the waiting jobs of its own endpoint only."""
+        with tempfile.TemporaryDirectory() as directory:
+            settings = dict(self.default_settings, admin_api_key="admin-key",
+                            job_queue=os.path.join(directory, "jobs.db"))
+            job_queue = get_job_queue(settings["job_queue"])
+            payload = {"handler": "workflow", "app_id": "app-1", "request_body": {}, "inputs": {"key": "value"}}
+            job_queue.enqueue(payload, endpoint="endpoint-1")
+            job_queue.enqueue(payload, endpoint="endpoint-2")
+            self.mock_session.endpoint_id = "endpoint-1"
+            self.mock_request.path = "/jobs/run"
+            self.mock_request.method = "POST"
+            self.mock_request.headers = {"x-api-key": "admin-key"}
+
+            response = self.endpoint._invoke(self.mock_request, {}, settings)
+
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(json.loads(response.data), {"processed": 1, "remaining": 0})
+            self.mock_session.app.workflow.invoke.assert_called_once_with(
+                app_id="app-1", inputs={"key": "value"}, response_mode="blocking")
+            self.assertEqual(job_queue.count("endpoint-2"), 1)
+
+    @patch('endpoints.helpers.socket.getaddrinfo', return_value=PUBLIC_ADDRESS)
+    @patch('endpoints.invoke_endpoint.submit_background')
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    def test_callback_url_from_body_field(self, mock_validate_api_key, mock_apply_middleware,
+                                          mock_submit_background, mock_getaddrinfo):
+        """Tests that requests with a callback URL are acknowledged with 202
+        and that the result is posted to the callback URL."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+        self.mock_request.path = "/single-workflow"
+        self.mock_request.get_json.return_value = {"inputs": {"key": "value"},
+                                                   "callback_url": "https://example.com/cb"}
+        settings = dict(self.default_settings, callback_url_field="$.callback_url", callback_secret="secret")
+
+        response = self.endpoint._invoke(self.mock_request, {}, settings)
+
+        self.assertEqual(response.status_code, 202)
+        fn, handler_name, callback, *args = mock_submit_background.call_args[0]
+        self.assertEqual(callback.url, "https://example.com/cb")
+        self.assertEqual(callback.request_id, json.loads(response.data)["request_id"])
+
+        callback.deliver = Mock()
+        fn(handler_name, callback, *args)
+        callback.deliver.assert_called_once_with(self.workflow_response)
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    def test_invalid_callback_url(self, mock_validate_api_key, mock_apply_middleware):
+        """Tests that callback URLs other than absolute http(s) URLs are rejected."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+        self.mock_request.path = "/single-workflow"
+        self.mock_request.headers = {"x-callback-url": "file:///etc/passwd"}
+
+        response = self.endpoint._invoke(self.mock_request, {}, self.default_settings)
+
+        self.assertEqual(response.status_code, 400)
+        self.mock_session.app.workflow.invoke.assert_not_called()
+
+    @patch('endpoints.invoke_endpoint.submit_background')
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    def test_private_callback_url(self, mock_validate_api_key, mock_apply_middleware, mock_submit_background):
+        """Tests that callbacks to private, loopback and link-local hosts are rejected before anything is invoked."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+        self.mock_request.path = "/single-workflow"
+
+        for url in ["http://127.0.0.1:5001/console/api", "http://169.254.169.254/latest/meta-data",
+                    "http://10.0.0.5/hook", "http://[::1]/hook", "http://localhost/hook"]:
+            with self.subTest(url=url):
+                self.mock_request.headers = {"x-callback-url": url}
+
+                response = self.endpoint._invoke(self.mock_request, {}, self.default_settings)
+
+                self.assertEqual(response.status_code, 400)
+        mock_submit_background.assert_not_called()
+        self.mock_session.app.workflow.invoke.assert_not_called()
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    def test_multipart_files_become_file_inputs(self, mock_validate_api_key, mock_apply_middleware):
+        """Tests that multipart file parts are uploaded to Dify and passed as file inputs,
+        and that form fields follow the explicit_inputs handling."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+        self.mock_session.file = Mock()
+        upload = self.mock_session.file.upload.return_value
+        upload.to_app_parameter.return_value = {"upload_file_id": "file-1", "transfer_method": "local_file",
+                                                "type": "document"}
+        request = Request(EnvironBuilder(method="POST", path="/single-workflow", data={
+            "inputs[title]": "Report",
+            "inputs[doc]": (io.BytesIO(b"%PDF-1.4"), "report.pdf", "application/pdf"),
+        }).get_environ())
+
+        response = self.endpoint._invoke(request, {}, self.default_settings)
+
+        self.assertEqual(response.status_code, 200)
+        self.mock_session.file.upload.assert_called_once_with("report.pdf", b"%PDF-1.4", "application/pdf")
+        self.mock_session.app.workflow.invoke.assert_called_once_with(
+            app_id="static-app-id",
+            inputs={"title": "Report", "doc": {"upload_file_id": "file-1", "transfer_method": "local_file",
+                                               "type": "document"}},
+            response_mode="blocking")
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    def test_multipart_files_are_uploaded_after_checks(self, mock_validate_api_key, mock_apply_middleware):
+        """Tests that the files of forms that are filtered or have invalid inputs are never uploaded,
+        and that the checks see the file fields."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+        self.mock_session.file = Mock()
+        self.mock_session.app.fetch_app.return_value = {"data": {"user_input_form": [
+            {"number": {"variable": "pages", "required": True}},
+            {"file": {"variable": "doc", "required": True}},
+        ]}}
+        get_schema_cache.cache_clear()
+        self.addCleanup(get_schema_cache.cache_clear)
+        settings = dict(self.default_settings, validate_inputs=True,
+                        event_filter='{"all": [{"field": "$.kind", "equals": "report"}]}')
+        cases = {
+            "filtered": ({"kind": "spam", "inputs[pages]": "3"}, 204),
+            "invalid": ({"kind": "report", "inputs[pages]": "many"}, 400),
+        }
+        for name, (fields, status) in cases.items():
+            with self.subTest(case=name):
+                request = Request(EnvironBuilder(method="POST", path="/single-workflow", data={
+                    **fields, "inputs[doc]": (io.BytesIO(b"%PDF-1.4"), "report.pdf", "application/pdf"),
+                }).get_environ())
+
+                response = self.endpoint._invoke(request, {}, settings)
+
+                self.assertEqual(response.status_code, status)
+                self.mock_session.file.upload.assert_not_called()
+                self.mock_session.app.workflow.invoke.assert_not_called()
+
+    def test_form_bodies_through_middlewares(self):
+        """Tests that urlencoded and multipart bodies reach the workflow through the real middleware chain,
+        also when the default middleware logs the body."""
+        self.mock_session.file = Mock()
+        self.mock_session.file.upload.return_value.to_app_parameter.return_value = {"upload_file_id": "file-1"}
+        settings = dict(self.default_settings, middleware="none", api_key_location="none")
+        bodies = {
+            "urlencoded": (lambda: {"inputs[title]": "T"}, {"title": "T"}),
+            "multipart": (lambda: {"inputs[title]": "T", "inputs[doc]": (io.BytesIO(b"%PDF-1.4"), "report.pdf")},
+                          {"title": "T", "doc": {"upload_file_id": "file-1"}}),
+        }
+        middleware_logger = logging.getLogger("middlewares.default_middleware")
+        self.addCleanup(middleware_logger.setLevel, middleware_logger.level)
+        for level in (logging.WARNING, logging.DEBUG):
+            middleware_logger.setLevel(level)
+            for name, (data, inputs) in bodies.items():
+                with self.subTest(body=name, level=level):
+                    self.mock_session.app.workflow.invoke.reset_mock()
+                    request = Request(EnvironBuilder(method="POST", path="/single-workflow", data=data()).get_environ())
+
+                    response = self.endpoint._invoke(request, {}, settings)
+
+                    self.assertEqual(response.status_code, 200, response.get_data(as_text=True))
+                    self.mock_session.app.workflow.invoke.assert_called_once_with(
+                        app_id="static-app-id", inputs=inputs, response_mode="blocking")
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    def test_multipart_file_too_large(self, mock_validate_api_key, mock_apply_middleware):
+        """Tests that file parts above the max_file_size setting are rejected with 413."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+        request = Request(EnvironBuilder(method="POST", path="/single-workflow", data={
+            "doc": (io.BytesIO(b"x" * 2048), "big.bin"),
+        }).get_environ())
+        settings = dict(self.default_settings, max_file_size="0.001")
+
+        response = self.endpoint._invoke(request, {}, settings)
+
+        self.assertEqual(response.status_code, 413)
+        self.mock_session.app.workflow.invoke.assert_not_called()
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    def test_bulk_workflow_streams_ndjson(self, mock_validate_api_key, mock_apply_middleware):
+        """Tests that each NDJSON line invokes the workflow and that the results are streamed as NDJSON,
+        with an error line for invalid lines."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+        body = b'{"inputs": {"n": 1}}\nnot json\n{"inputs": {"n": 2}}\n'
+        request = Request(EnvironBuilder(method="POST", path="/single-workflow/bulk", data=body,
+                                         content_type="application/x-ndjson").get_environ())
+
+        response = self.endpoint._invoke(request, {}, self.default_settings)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual(lines[0], {"line": 1, "result": self.workflow_response})
+        self.assertEqual(lines[1]["line"], 2)
+        self.assertIn("error", lines[1])
+        self.assertEqual(lines[2], {"line": 3, "result": self.workflow_response})
+        self.assertEqual(self.mock_session.app.workflow.invoke.call_count, 2)
+
+    def test_bulk_workflow_through_middlewares(self):
+        """Tests that bulk lines reach the workflow through the real middleware chain, which must
+        leave the streamed body unread."""
+        body = b'{"inputs": {"n": 1}}\n{"inputs": {"n": 2}}\n'
+        request = Request(EnvironBuilder(method="POST", path="/single-workflow/bulk", data=body,
+                                         content_type="application/x-ndjson").get_environ())
+        settings = dict(self.default_settings, middleware="none", api_key_location="none",
+                        json_string_input=True)
+
+        response = self.endpoint._invoke(request, {}, settings)
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(lines, [{"line": 1, "result": self.workflow_response},
+                                 {"line": 2, "result": self.workflow_response}])
+        self.assertEqual(self.mock_session.app.workflow.invoke.call_count, 2)
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    def test_conversation_affinity(self, mock_validate_api_key, mock_apply_middleware):
+        """Tests that chatflow requests with the same affinity key continue the same conversation."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+        get_conversation_cache.cache_clear()
+        self.mock_request.path = "/single-chatflow"
+        self.mock_request.get_json.return_value = {"query": "Hello", "channel": "C1"}
+        self.mock_session.app.chat.invoke.return_value = {"answer": "Hi", "conversation_id": "conv-1"}
+        settings = dict(self.default_settings, conversation_affinity_key="$.channel")
+
+        self.endpoint._invoke(self.mock_request, {}, settings)
+        self.endpoint._invoke(self.mock_request, {}, settings)
+
+        conversation_ids = [call[1]["conversation_id"]
+                            for call in self.mock_session.app.chat.invoke.call_args_list]
+        self.assertEqual(conversation_ids, [None, "conv-1"])
+        get_conversation_cache.cache_clear()
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    def test_replica_groups_keep_conversations(self, mock_validate_api_key, mock_apply_middleware):
+        """Tests that new conversations are spread across replicas and that a conversation
+        continues on the replica that created it."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+        get_conversation_cache.cache_clear()
+        self.mock_request.path = "/single-chatflow"
+        self.mock_session.app.chat.invoke.side_effect = \
+            lambda app_id, conversation_id, **kwargs: {"answer": "Hi", "conversation_id": conversation_id or f"conv-{app_id}"}
+        settings = dict(self.default_settings, replica_groups='{"static-app-id": ["replica-1", "replica-2"]}')
+
+        for _ in range(20):
+            self.mock_request.get_json.return_value = {"query": "Hello"}
+            self.endpoint._invoke(self.mock_request, {}, settings)
+        new_conversations = {call[1]["app_id"] for call in self.mock_session.app.chat.invoke.call_args_list}
+        self.assertGreater(len(new_conversations), 1)
+
+        self.mock_session.app.chat.invoke.reset_mock()
+        replicas = sorted(new_conversations)
+        for replica in replicas + ["unknown"]:
+            self.mock_request.get_json.return_value = {"query": "Hello", "conversation_id": f"conv-{replica}"}
+            self.endpoint._invoke(self.mock_request, {}, settings)
+        app_ids = [call[1]["app_id"] for call in self.mock_session.app.chat.invoke.call_args_list]
+        self.assertEqual(app_ids, replicas + ["static-app-id"])
+        get_conversation_cache.cache_clear()
+
+    def test_micro_batching(self):
+        """Tests that workflow requests within the batch window are invoked once with all inputs,
+        and that each request gets its slice of the result."""
+        self.mock_session.app.workflow.invoke.return_value = {"data": {"outputs": {"results": ["r1", "r2"]}}}
+        settings = dict(self.default_settings, batch_window_ms="10000", batch_max_items="2",
+                        batch_input="events", batch_result_path="$.data.outputs.results")
+
+        with ThreadPoolExecutor(2) as executor:
+            results = list(executor.map(
+                lambda n: self.endpoint._handle_workflow("app-1", {}, {"n": n}, settings), [1, 2]))
+
+        self.mock_session.app.workflow.invoke.assert_called_once()
+        events = json.loads(self.mock_session.app.workflow.invoke.call_args[1]["inputs"]["events"])
+        self.assertEqual(sorted(event["n"] for event in events), [1, 2])
+        self.assertEqual(sorted(results), ["r1", "r2"])
+        get_micro_batcher.cache_clear()
+
+    @patch('endpoints.invoke_endpoint.get_adaptive_limiter')
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    def test_adaptive_concurrency_sheds_with_503(self, mock_validate_api_key, mock_apply_middleware,
+                                                 mock_get_adaptive_limiter):
+        """Tests that invocations run under the limiter of the app and that shed invocations
+        are answered with 503 without being dead lettered."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+        self.mock_request.path = "/single-workflow"
+        self.mock_request.get_json.return_value = {"inputs": {}}
+        settings = dict(self.default_settings, adaptive_concurrency=True, queue_delay_target_ms="200")
+
+        response = self.endpoint._invoke(self.mock_request, {}, settings)
+        self.assertEqual(response.status_code, 200)
+        mock_get_adaptive_limiter.assert_called_once_with("static-app-id", 200.0)
+
+        mock_get_adaptive_limiter.return_value.acquire.return_value.__enter__.side_effect = Overloaded("overloaded")
+        with patch.object(self.endpoint, '_store_dead_letter') as mock_store_dead_letter:
+            response = self.endpoint._invoke(self.mock_request, {}, settings)
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["Retry-After"], "1")
+        self.assertEqual(self.mock_session.app.workflow.invoke.call_count, 1)
+        mock_store_dead_letter.assert_not_called()
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    def test_result_cache(self, mock_validate_api_key, mock_apply_middleware):
+        """Tests that workflow results of cached apps are served from the cache for the same inputs,
+        and that Cache-Control: no-cache runs the workflow again."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+        self.mock_request.path = "/single-workflow"
+        self.mock_request.get_json.return_value = {"inputs": {"text": "cached"}}
+        settings = dict(self.default_settings, result_cache_apps="static-app-id", result_cache_size_mb="0.5")
+        get_result_cache.cache_clear()
+
+        first = self.endpoint._invoke(self.mock_request, {}, settings)
+        second = self.endpoint._invoke(self.mock_request, {}, settings)
+
+        self.assertEqual(json.loads(second.data), json.loads(first.data))
+        self.assertEqual(self.mock_session.app.workflow.invoke.call_count, 1)
+
+        self.mock_request.headers = {"cache-control": "no-cache"}
+        self.endpoint._invoke(self.mock_request, {}, settings)
+        self.assertEqual(self.mock_session.app.workflow.invoke.call_count, 2)
+
+        self.mock_request.path = "/cache/stats"
+        self.mock_request.headers = {"x-api-key": "admin-key"}
+        response = self.endpoint._invoke(self.mock_request, {}, dict(settings, admin_api_key="admin-key"))
+        self.assertEqual(json.loads(response.data)["hits"], 1)
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    def test_failed_run_is_not_cached(self, mock_validate_api_key, mock_apply_middleware):
+        """Tests that workflow runs with a failed status are returned but not cached."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+        self.mock_request.path = "/single-workflow"
+        self.mock_request.get_json.return_value = {"inputs": {"text": "flaky"}}
+        self.mock_session.app.workflow.invoke.return_value = {"data": {"status": "failed", "error": "timeout"}}
+        settings = dict(self.default_settings, result_cache_apps="static-app-id", result_cache_size_mb="0.5")
+        get_result_cache.cache_clear()
+
+        self.endpoint._invoke(self.mock_request, {}, settings)
+        self.mock_session.app.workflow.invoke.return_value = self.workflow_response
+        response = self.endpoint._invoke(self.mock_request, {}, settings)
+
+        self.assertEqual(json.loads(response.data), self.workflow_response)
+        self.assertEqual(self.mock_session.app.workflow.invoke.call_count, 2)
+        get_result_cache.cache_clear()
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    def test_event_filter(self, mock_validate_api_key, mock_apply_middleware):
+        """Tests that events that don't match the event_filter are answered with 204 without invoking the app."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+        self.mock_request.path = "/single-workflow"
+        self.mock_request.headers = {"x-github-event": "issues"}
+        settings = dict(self.default_settings, explicit_inputs=False,
+                        event_filter='{"all": [{"header": "X-GitHub-Event", "equals": "issues"},'
+                                     ' {"field": "$.action", "equals": "opened"}]}')
+
+        self.mock_request.get_json.return_value = {"action": "closed"}
+        response = self.endpoint._invoke(self.mock_request, {}, settings)
+        self.assertEqual(response.status_code, 204)
+        self.mock_session.app.workflow.invoke.assert_not_called()
+
+        self.mock_request.get_json.return_value = {"action": "opened"}
+        response = self.endpoint._invoke(self.mock_request, {}, settings)
+        self.assertEqual(response.status_code, 200)
+        self.mock_session.app.workflow.invoke.assert_called_once()
+
+        response = self.endpoint._invoke(self.mock_request, {}, dict(settings, event_filter='{"field": "$.a"}'))
+        self.assertEqual(response.status_code, 500)
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    def test_routing_table_fans_out(self, mock_validate_api_key, mock_apply_middleware):
+        """Tests that workflow events are routed to the apps of the routing table
+        and that unrouted events invoke the endpoint app."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+        self.mock_session.app.workflow.invoke.side_effect = lambda app_id, **kwargs: {"data": {"app": app_id}}
+        self.mock_request.path = "/single-workflow"
+        self.mock_request.get_json.return_value = {"type": "issue", "inputs": {}}
+        settings = dict(self.default_settings, routing_table='{"index": {"field": "$.type"}, "routes": '
+                                                             '[{"key": "issue", "apps": ["triage", "notify"]}]}')
+
+        response = self.endpoint._invoke(self.mock_request, {}, settings)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data), {"results": {"triage": {"data": {"app": "triage"}},
+                                                                 "notify": {"data": {"app": "notify"}}}})
+
+        self.mock_request.get_json.return_value = {"type": "push", "inputs": {}}
+        response = self.endpoint._invoke(self.mock_request, {}, settings)
+        self.assertEqual(json.loads(response.data), {"data": {"app": "static-app-id"}})
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    def test_validate_inputs(self, mock_validate_api_key, mock_apply_middleware):
+        """Tests that inputs are validated against the input variables of the app before it is invoked."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+        get_schema_cache.cache_clear()
+        self.mock_session.app.fetch_app.return_value = {"data": {"user_input_form": [
+            {"number": {"variable": "count", "required": True}}]}}
+        self.mock_request.path = "/single-workflow"
+        settings = dict(self.default_settings, validate_inputs=True)
+
+        self.mock_request.get_json.return_value = {"inputs": {"count": "many"}}
+        response = self.endpoint._invoke(self.mock_request, {}, settings)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.data), {"error": "Invalid inputs: count must be a number"})
+        self.mock_session.app.workflow.invoke.assert_not_called()
+
+        self.mock_request.get_json.return_value = {"inputs": {"count": "3"}}
+        response = self.endpoint._invoke(self.mock_request, {}, settings)
+        self.assertEqual(response.status_code, 200)
+        self.mock_session.app.workflow.invoke.assert_called_once_with(
+            app_id="static-app-id", inputs={"count": 3}, response_mode="blocking")
+        self.mock_session.app.fetch_app.assert_called_once_with("static-app-id")
+        get_schema_cache.cache_clear()
+
+    @patch('endpoints.invoke_endpoint.get_job_queue')
+    @patch('endpoints.invoke_endpoint.submit_background')
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    def test_validate_inputs_before_acknowledging(self, mock_validate_api_key, mock_apply_middleware,
+                                                  mock_submit_background, mock_get_job_queue):
+        """Tests that invalid inputs are rejected with 400 before requests are queued,
+        acknowledged for a callback or answered asynchronously by the middleware."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+        get_schema_cache.cache_clear()
+        self.mock_session.app.fetch_app.return_value = {"data": {"user_input_form": [
+            {"number": {"variable": "count", "required": True}}]}}
+        self.mock_request.path = "/single-workflow"
+        self.mock_request.get_json.return_value = {"inputs": {"count": "many"}}
+        settings = dict(self.default_settings, validate_inputs=True)
+
+        requests = {
+            "job_queue": (dict(settings, job_queue="jobs.db"), {}),
+            "callback": (settings, {"x-callback-url": "https://example.com/cb"}),
+            "async_reply": (settings, {}),
+        }
+        for name, (request_settings, headers) in requests.items():
+            with self.subTest(name):
+                self.mock_request.headers = headers
+                self.mock_request.async_reply = Mock() if name == "async_reply" else None
+
+                response = self.endpoint._invoke(self.mock_request, {}, request_settings)
+
+                self.assertEqual(response.status_code, 400)
+        mock_get_job_queue.return_value.enqueue.assert_not_called()
+        mock_submit_background.assert_not_called()
+        get_schema_cache.cache_clear()
+
     # SINGLE CHATFLOW TESTS
 
     @patch('endpoints.invoke_endpoint.apply_middleware')
@@ -754,5 +1551,29 @@ class TestWebhookEndpoint(unittest.TestCase):
         )
 
 
+    def test_ready_route(self):
+        """Tests that the ready admin route answers 503 until the warm-up has finished without
+        a failed step, without the admin key."""
+        warmup._ready.clear()
+        self.addCleanup(warmup._ready.clear)
+        self.mock_request.path = "/ready"
+        self.mock_request.headers = {}
+        settings = self.default_settings
+
+        response = self.endpoint._invoke(self.mock_request, {}, settings)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["Retry-After"], "1")
+
+        with patch("endpoints.warmup._import_modules", side_effect=ImportError("no module")):
+            warmup.warm_up([])
+        response = self.endpoint._invoke(self.mock_request, {}, settings)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(json.loads(response.data)["failed_steps"], {"imports": "no module"})
+
+        warmup.warm_up([])
+        response = self.endpoint._invoke(self.mock_request, {}, settings)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(json.loads(response.data)["ready"])
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,181 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from endpoints.job_queue import JobQueue
+
+
+class TestJobQueue(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "jobs.db")
+        self.queue = JobQueue(self.path, visibility_timeout=30, max_attempts=2)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_enqueue_and_ack(self):
+        """
+        Tests that an enqueued job is leased once and removed by the acknowledgment.
+        """
+        job_id = self.queue.enqueue({"app_id": "app-1"})
+
+        job = self.queue.dequeue(now=2e9)
+
+        self.assertEqual(job.id, job_id)
+        self.assertEqual(job.payload, {"app_id": "app-1"})
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNone(self.queue.dequeue(now=2e9))
+
+        self.queue.ack(job.id)
+        self.assertEqual(len(self.queue), 0)
+
+    def test_visibility_timeout(self):
+        """
+        Tests that a job that is not acknowledged is delivered again after the visibility timeout.
+        """
+        self.queue.enqueue({"app_id": "app-1"})
+        first = self.queue.dequeue(now=2e9)
+
+        self.assertIsNone(self.queue.dequeue(now=2e9 + 29))
+        second = self.queue.dequeue(now=2e9 + 31)
+
+        self.assertEqual(second.id, first.id)
+        self.assertEqual(second.attempts, 2)
+
+    def test_survives_restart(self):
+        """
+        Tests that committed jobs are delivered by a new queue on the same file.
+        """
+        job_id = self.queue.enqueue({"app_id": "app-1"})
+
+        job = JobQueue(self.path).dequeue(now=2e9)
+
+        self.assertEqual(job.id, job_id)
+
+    def test_priority_classes(self):
+        """
+        Tests that the classes of waiting jobs are served by their weights, in FIFO order within a class.
+        """
+        self.queue.set_weights({"interactive": 3})
+        for i in range(6):
+            self.queue.enqueue({"n": i}, "bulk")
+        for i in range(6):
+            self.queue.enqueue({"n": i}, "interactive")
+
+        jobs = [self.queue.dequeue(now=2e9) for _ in range(8)]
+
+        self.assertEqual([job.priority_class for job in jobs].count("interactive"), 6)
+        self.assertEqual([job.payload["n"] for job in jobs if job.priority_class == "bulk"], [0, 1])
+        for job in jobs:
+            self.queue.ack(job.id)
+        stats = self.queue.stats()
+        self.assertEqual(stats["interactive"]["depth"], 0)
+        self.assertEqual(stats["interactive"]["weight"], 3)
+        self.assertEqual(stats["bulk"]["depth"], 4)
+        self.assertEqual(stats["bulk"]["dequeued"], 2)
+
+    def test_group_commit(self):
+        """
+        Tests that concurrent enqueues all get distinct committed jobs.
+        """
+        ids = []
+        threads = [threading.Thread(target=lambda i=i: ids.append(self.queue.enqueue({"i": i})))
+                   for i in range(50)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(set(ids)), 50)
+        self.assertEqual(len(self.queue), 50)
+
+    def test_retry_and_dead(self):
+        """
+        Tests that failing jobs are retried and handed to the dead callback after the last attempt.
+        """
+        dead = []
+
+        def process(job):
+            raise RuntimeError("down")
+
+        self.queue.bind(process, lambda job, error: dead.append((job.id, error)))
+        job_id = self.queue.enqueue({"app_id": "app-1"})
+
+        self.queue.run_job(self.queue.dequeue(now=2e9))
+        self.assertEqual(dead, [])
+        self.assertEqual(len(self.queue), 1)
+
+        self.queue.run_job(self.queue.dequeue(now=2e9 + 100))
+        self.assertEqual(dead, [(job_id, "down")])
+        self.assertEqual(len(self.queue), 0)
+
+    def test_workers_process_jobs(self):
+        """
+        Tests that started workers process enqueued jobs.
+        """
+        processed = threading.Event()
+        self.queue.bind(lambda job: processed.set())
+        self.queue.start_workers(workers=1)
+
+        self.queue.enqueue({"app_id": "app-1"})
+
+        self.assertTrue(processed.wait(5))
+
+    def test_workers_wait_for_processor(self):
+        """
+        Tests that workers started before a processor is bound leave jobs queued until it is bound.
+        """
+        self.queue.start_workers(workers=1)
+        self.queue.enqueue({"app_id": "app-1"})
+        time.sleep(0.05)
+        job = self.queue.dequeue()
+        self.assertEqual(job.payload, {"app_id": "app-1"})
+        self.queue.nack(job.id)
+
+        processed = threading.Event()
+        self.queue.bind(lambda job: processed.set())
+        self.queue.start_workers(workers=1)
+
+        self.assertTrue(processed.wait(5))
+
+    def test_endpoints_process_own_jobs(self):
+        """
+        Tests that each job is only leased for and processed by the endpoint that enqueued it.
+        """
+        processed = []
+        self.queue.enqueue({"n": 1}, endpoint="endpoint-a")
+        self.queue.enqueue({"n": 2}, endpoint="endpoint-b")
+        self.queue.bind(lambda job: processed.append(("a", job.payload["n"])), endpoint="endpoint-a")
+
+        self.assertIsNone(self.queue.dequeue(now=2e9, endpoints=["endpoint-c"]))
+        self.assertEqual(self.queue.drain("endpoint-a"), 1)
+        self.assertEqual(processed, [("a", 1)])
+        self.assertEqual(self.queue.count("endpoint-b"), 1)
+
+        job = self.queue.dequeue(now=2e9)
+        self.queue.run_job(job)
+        self.assertEqual(processed, [("a", 1)])
+        self.assertEqual(self.queue.count("endpoint-b"), 1)
+
+    def test_adds_endpoint_column(self):
+        """
+        Tests that a queue file without endpoints gets the column, its jobs belong to the default endpoint.
+        """
+        connection = sqlite3.connect(self.path)
+        connection.execute("DROP TABLE jobs")
+        connection.execute("CREATE TABLE jobs (id INTEGER PRIMARY KEY AUTOINCREMENT, payload TEXT NOT NULL, "
+                           "created_at REAL NOT NULL, visible_at REAL NOT NULL, attempts INTEGER NOT NULL DEFAULT 0)")
+        connection.execute("INSERT INTO jobs (payload, created_at, visible_at) VALUES ('{}', 0, 0)")
+        connection.commit()
+        connection.close()
+
+        job = JobQueue(self.path).dequeue(now=2e9, endpoints=[""])
+
+        self.assertEqual(job.endpoint, "")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+import threading
+import time
+import unittest
+from endpoints.limiter import AdaptiveLimiter, Overloaded
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestAdaptiveLimiter(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def hold(self, limiter: AdaptiveLimiter, release: threading.Event, results: list) -> threading.Thread:
+        def run():
+            try:
+                with limiter.acquire():
+                    results.append("admitted")
+                    release.wait(5)
+            except Overloaded:
+                results.append("shed")
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        return thread
+
+    def wait_for(self, condition) -> None:
+        deadline = time.monotonic() + 5
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.001)
+        self.assertTrue(condition())
+
+    def test_waiters_admitted_in_order(self):
+        """
+        Tests that invocations above the limit wait and are admitted when a slot is released.
+        """
+        limiter = AdaptiveLimiter(target=10, initial_limit=1, clock=self.clock)
+        release = threading.Event()
+        results = []
+        first = self.hold(limiter, release, results)
+        self.wait_for(lambda: limiter.in_flight == 1)
+        second = self.hold(limiter, release, results)
+        self.wait_for(lambda: limiter.waiting == 1)
+
+        self.assertEqual(results, ["admitted"])
+        release.set()
+        first.join()
+        second.join()
+
+        self.assertEqual(results, ["admitted", "admitted"])
+        self.assertEqual(limiter.in_flight, 0)
+
+    def test_limit_grows_while_latency_is_stable(self):
+        """
+        Tests that the limit increases additively while it is used and the latency is stable.
+        """
+        limiter = AdaptiveLimiter(initial_limit=1, clock=self.clock)
+
+        for _ in range(10):
+            with limiter.acquire():
+                self.clock.now += 0.1
+
+        self.assertGreater(limiter.limit, 3)
+
+    def test_limit_shrinks_when_latency_rises(self):
+        """
+        Tests that the limit decreases multiplicatively, once per round trip, when the latency rises.
+        """
+        limiter = AdaptiveLimiter(initial_limit=10, clock=self.clock)
+        with limiter.acquire():
+            self.clock.now += 0.1
+
+        for _ in range(5):
+            with limiter.acquire():
+                self.clock.now += 2
+        self.assertLess(limiter.limit, 10 * 0.9 ** 3)
+
+        limit = limiter.limit
+        for _ in range(3):
+            with limiter.acquire():
+                pass
+        # Completions within one round trip of the last decrease don't decrease it again
+        self.assertEqual(limiter.limit, limit)
+
+    def test_failures_shrink_limit(self):
+        """
+        Tests that failed invocations decrease the limit.
+        """
+        limiter = AdaptiveLimiter(initial_limit=10, clock=self.clock)
+
+        with self.assertRaises(RuntimeError):
+            with limiter.acquire():
+                raise RuntimeError("boom")
+
+        self.assertEqual(limiter.limit, 9)
+        self.assertEqual(limiter.in_flight, 0)
+
+    def test_sheds_oldest_waiters(self):
+        """
+        Tests that the oldest waiters are shed once the queueing delay stayed above the target
+        for a whole interval.
+        """
+        limiter = AdaptiveLimiter(target=1, interval=5, initial_limit=1, max_wait=10, clock=self.clock)
+        release = threading.Event()
+        results = []
+        threads = [self.hold(limiter, release, results)]
+        self.wait_for(lambda: limiter.in_flight == 1)
+        threads.append(self.hold(limiter, release, results))
+        self.wait_for(lambda: limiter.waiting == 1)
+
+        self.clock.now += 2
+        threads.append(self.hold(limiter, release, results))
+        self.wait_for(lambda: limiter.waiting == 2)
+        self.assertEqual(results, ["admitted"])
+
+        self.clock.now += 5
+        threads.append(self.hold(limiter, release, results))
+        self.wait_for(lambda: "shed" in results)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(results), ["admitted", "admitted", "shed", "shed"])
+        self.assertEqual(limiter.shed, 2)
+
+    def test_max_wait(self):
+        """
+        Tests that waiters are shed when no slot becomes free within the maximum wait.
+        """
+        limiter = AdaptiveLimiter(initial_limit=1, max_wait=0.01)
+        with limiter.acquire():
+            with self.assertRaises(Overloaded):
+                with limiter.acquire():
+                    pass
+
+        self.assertEqual(limiter.waiting, 0)
+        self.assertEqual(limiter.in_flight, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,162 @@
+import json
+import unittest
+from endpoints.mapping import (InputMapping, OutputProjection, compile_path, load_input_mapping,
+                               load_output_projection)
+
+
+class TestPathExpression(unittest.TestCase):
+    def setUp(self):
+        self.payload = {
+            "action": "opened",
+            "issue": {
+                "title": "Bug",
+                "labels": [{"name": "bug"}, {"name": "urgent"}, {"color": "red"}],
+            },
+            "repository": {"full.name": "octo/repo"},
+        }
+
+    def test_field_access(self):
+        """
+        Tests selecting nested object fields with and without the root marker.
+        """
+        self.assertEqual(compile_path("$.issue.title").get(self.payload), "Bug")
+        self.assertEqual(compile_path("issue.title").get(self.payload), "Bug")
+        self.assertEqual(compile_path("$").get(self.payload), self.payload)
+
+    def test_index_access(self):
+        """
+        Tests selecting list items by positive and negative index.
+        """
+        self.assertEqual(compile_path("$.issue.labels[0].name").get(self.payload), "bug")
+        self.assertEqual(compile_path("$.issue.labels[-1].color").get(self.payload), "red")
+        self.assertIsNone(compile_path("$.issue.labels[5]").get(self.payload))
+
+    def test_quoted_key(self):
+        """
+        Tests selecting fields whose names contain dots.
+        """
+        self.assertEqual(compile_path("$.repository['full.name']").get(self.payload), "octo/repo")
+
+    def test_wildcard(self):
+        """
+        Tests that wildcards project the remaining path over every item and skip missing values.
+        """
+        self.assertEqual(compile_path("$.issue.labels[*].name").get(self.payload), ["bug", "urgent"])
+        self.assertEqual(compile_path("$.issue.*").get(self.payload)[0], "Bug")
+
+    def test_missing_path(self):
+        """
+        Tests default values and exists for missing paths.
+        """
+        path = compile_path("$.pull_request.title")
+
+        self.assertEqual(path.get(self.payload, "none"), "none")
+        self.assertFalse(path.exists(self.payload))
+        self.assertTrue(compile_path("$.action").exists(self.payload))
+
+    def test_invalid_expression(self):
+        """
+        Tests that malformed expressions are rejected at compile time.
+        """
+        with self.assertRaises(ValueError):
+            compile_path("$.issue[")
+
+    def test_compile_is_cached(self):
+        """
+        Tests that compiling the same expression twice returns the same object.
+        """
+        self.assertIs(compile_path("$.issue.title"), compile_path("$.issue.title"))
+
+
+class TestInputMapping(unittest.TestCase):
+    def test_apply(self):
+        """
+        Tests that only mapped fields are sent, using defaults for missing paths.
+        """
+        mapping = InputMapping({
+            "title": "$.issue.title",
+            "author": {"path": "$.issue.user.login", "default": "unknown"},
+            "body": "$.issue.body",
+        })
+
+        inputs = mapping.apply({"issue": {"title": "Bug", "comments": [1, 2, 3]}})
+
+        self.assertEqual(inputs, {"title": "Bug", "author": "unknown"})
+
+    def test_load_input_mapping(self):
+        """
+        Tests parsing and caching the input_mapping setting.
+        """
+        config = json.dumps({"title": "$.issue.title"})
+
+        self.assertIsNone(load_input_mapping(""))
+        self.assertIs(load_input_mapping(config), load_input_mapping(config))
+        with self.assertRaises(ValueError):
+            load_input_mapping("[]")
+        with self.assertRaises(ValueError):
+            load_input_mapping(json.dumps({"title": {"default": 1}}))
+        for rule in (["$.issue.title"], {"path": {"x": 1}}, 1, None):
+            with self.subTest(rule=rule), self.assertRaises(ValueError):
+                load_input_mapping(json.dumps({"title": rule}))
+
+
+class TestOutputProjection(unittest.TestCase):
+    def setUp(self):
+        self.response = {
+            "answer": "Hi",
+            "metadata": {"usage": {"total_tokens": 42}, "retriever_resources": [{"content": "x" * 100}]},
+            "data": {"outputs": [{"text": "a", "debug": 1}, {"text": "b", "debug": 2}]},
+        }
+
+    def test_fields(self):
+        """
+        Tests selecting and renaming fields of the response.
+        """
+        projection = OutputProjection(fields={"reply": "$.answer", "tokens": "$.metadata.usage.total_tokens",
+                                              "missing": "$.data.nothing"})
+
+        self.assertEqual(projection.apply(self.response), {"reply": "Hi", "tokens": 42})
+
+    def test_exclude(self):
+        """
+        Tests removing paths without modifying the original response.
+        """
+        projection = OutputProjection(exclude=["$.metadata.retriever_resources", "$.data.outputs[*].debug",
+                                               "$.not.there"])
+
+        result = projection.apply(self.response)
+
+        self.assertEqual(result["metadata"], {"usage": {"total_tokens": 42}})
+        self.assertEqual(result["data"]["outputs"], [{"text": "a"}, {"text": "b"}])
+        self.assertIn("retriever_resources", self.response["metadata"])
+        self.assertIn("debug", self.response["data"]["outputs"][0])
+
+    def test_fields_and_exclude(self):
+        """
+        Tests that exclude paths are removed from the projected object when fields are selected.
+        """
+        projection = OutputProjection(fields={"reply": "$.answer", "outputs": "$.data.outputs"},
+                                      exclude=["$.outputs[*].debug", "$.metadata"])
+
+        self.assertEqual(projection.apply(self.response),
+                         {"reply": "Hi", "outputs": [{"text": "a"}, {"text": "b"}]})
+        self.assertIn("debug", self.response["data"]["outputs"][0])
+
+    def test_load_output_projection(self):
+        """
+        Tests parsing and validating the output_projection setting.
+        """
+        self.assertIsNone(load_output_projection(""))
+        self.assertIsNotNone(load_output_projection(json.dumps({"exclude": ["$.metadata"]})))
+        with self.assertRaises(ValueError):
+            load_output_projection(json.dumps({"select": {}}))
+        with self.assertRaises(ValueError):
+            load_output_projection(json.dumps({"exclude": "$.metadata"}))
+        with self.assertRaises(ValueError):
+            load_output_projection(json.dumps({"exclude": [["$.metadata"]]}))
+        with self.assertRaises(ValueError):
+            load_output_projection(json.dumps({"fields": {"x": ["a"]}}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+from endpoints.registry import LazyRegistry
+
+
+class TestLazyRegistry(unittest.TestCase):
+    def test_imports_on_first_use(self):
+        """
+        Tests that entries are only imported when they are looked up.
+        """
+        registry = LazyRegistry({"decoder": "json:JSONDecoder", "encoder": "json:JSONEncoder"})
+
+        self.assertEqual(list(registry), ["decoder", "encoder"])
+        self.assertIn("decoder", registry)
+        self.assertFalse(registry.is_loaded("decoder"))
+
+        import json  # pylint: disable=import-outside-toplevel
+        self.assertIs(registry["decoder"], json.JSONDecoder)
+        self.assertTrue(registry.is_loaded("decoder"))
+        self.assertFalse(registry.is_loaded("encoder"))
+
+    def test_unknown_names(self):
+        """
+        Tests that unknown names behave like missing keys of a mapping.
+        """
+        registry = LazyRegistry({"decoder": "json:JSONDecoder"})
+
+        self.assertIsNone(registry.get("none"))
+        self.assertIsNone(registry.get(None))
+        with self.assertRaises(KeyError):
+            registry["none"]  # pylint: disable=pointless-statement
+
+    def test_invalid_entry(self):
+        """
+        Tests that entries must name a module and an attribute.
+        """
+        with self.assertRaises(ValueError):
+            LazyRegistry({"decoder": "json.JSONDecoder"})
+
+
+if __name__ == '__main__':
+    unittest.main()
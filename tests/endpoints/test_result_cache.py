@@ -0,0 +1,79 @@
+import unittest
+from endpoints.result_cache import ResultCache, cache_key, is_cached_app, is_succeeded_run
+
+
+class TestResultCache(unittest.TestCase):
+    def test_hit_and_miss(self):
+        """
+        Tests that cached results are returned as copies and that lookups are counted.
+        """
+        cache = ResultCache(1024)
+        self.assertIsNone(cache.get("key", now=0))
+
+        cache.set("key", {"label": "spam"}, ttl=10, now=0)
+        result = cache.get("key", now=5)
+        result["label"] = "changed"
+
+        self.assertEqual(cache.get("key", now=5), {"label": "spam"})
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (2, 1, 1))
+
+    def test_ttl(self):
+        """
+        Tests that results expire after their TTL and release their budget.
+        """
+        cache = ResultCache(1024)
+        cache.set("key", {"label": "spam"}, ttl=10, now=0)
+
+        self.assertIsNone(cache.get("key", now=10))
+        self.assertEqual(cache.size, 0)
+
+    def test_byte_budget_evicts_least_recently_used(self):
+        """
+        Tests that the least recently used results are evicted when the byte budget is exceeded.
+        """
+        cache = ResultCache(100)
+        cache.set("a", "x" * 40, ttl=10, now=0)
+        cache.set("b", "x" * 40, ttl=10, now=0)
+        cache.get("a", now=0)
+        cache.set("c", "x" * 40, ttl=10, now=0)
+
+        self.assertIsNotNone(cache.get("a", now=0))
+        self.assertIsNone(cache.get("b", now=0))
+        self.assertLessEqual(cache.size, 100)
+        self.assertEqual(cache.evictions, 1)
+
+        cache.set("d", "x" * 200, ttl=10, now=0)
+        self.assertIsNone(cache.get("d", now=0))
+
+    def test_cache_key_is_canonical(self):
+        """
+        Tests that the key does not depend on the order of the inputs, but on the app and the values.
+        """
+        key = cache_key("app-1", {"a": 1, "b": [1, 2]})
+
+        self.assertEqual(key, cache_key("app-1", {"b": [1, 2], "a": 1}))
+        self.assertNotEqual(key, cache_key("app-2", {"a": 1, "b": [1, 2]}))
+        self.assertNotEqual(key, cache_key("app-1", {"a": 1, "b": [2, 1]}))
+        self.assertNotEqual(key, cache_key("app-1", {"a": 1, "b": [1, 2]}, True))
+
+    def test_is_cached_app(self):
+        """
+        Tests the result_cache_apps setting.
+        """
+        self.assertTrue(is_cached_app("app-1", "app-2, app-1"))
+        self.assertTrue(is_cached_app("app-1", "*"))
+        self.assertFalse(is_cached_app("app-1", "app-2"))
+
+    def test_is_succeeded_run(self):
+        """
+        Tests that only succeeded runs and results without a status are cacheable.
+        """
+        self.assertTrue(is_succeeded_run({"data": {"status": "succeeded", "outputs": {}}}))
+        self.assertTrue(is_succeeded_run({"label": "spam"}))
+        self.assertFalse(is_succeeded_run({"data": {"status": "failed", "error": "timeout"}}))
+        self.assertFalse(is_succeeded_run({"data": {"status": "stopped"}}))
+
+
+if __name__ == '__main__':
+    unittest.main()
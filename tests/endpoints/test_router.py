@@ -0,0 +1,90 @@
+import glob
+import os
+import unittest
+import yaml
+from endpoints.helpers import ROUTER, determine_route, match_route
+from endpoints.router import Router
+
+ENDPOINTS_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "endpoints")
+
+
+class TestRouter(unittest.TestCase):
+    def setUp(self):
+        self.router = Router()
+        self.router.add("/workflow/<app_id>", "workflow")
+        self.router.add("/single-workflow", "workflow")
+        self.router.add("/jobs/stats", "job_stats")
+        self.router.add("/jobs/<job_id>", "job")
+
+    def test_match_extracts_params(self):
+        """
+        Tests that path parameters are extracted while matching the route.
+        """
+        match = self.router.match("/workflow/my-app")
+
+        self.assertEqual(match.route, "/workflow/<app_id>")
+        self.assertEqual(match.handler, "workflow")
+        self.assertEqual(match.params, {"app_id": "my-app"})
+
+    def test_prefix_does_not_match(self):
+        """
+        Tests that paths sharing only a prefix with a route are not matched.
+        """
+        self.assertIsNone(self.router.match("/workflowfoo"))
+        self.assertIsNone(self.router.match("/single-workflowfoo"))
+        self.assertIsNone(self.router.match("/workflow/my-app/extra"))
+
+    def test_missing_param_does_not_match(self):
+        """
+        Tests that a route with a parameter does not match when the parameter is empty.
+        """
+        self.assertIsNone(self.router.match("/workflow/"))
+        self.assertIsNone(self.router.match("/workflow"))
+
+    def test_literal_segment_takes_precedence(self):
+        """
+        Tests that literal segments win over parameter segments at the same depth.
+        """
+        self.assertEqual(self.router.match("/jobs/stats").handler, "job_stats")
+        match = self.router.match("/jobs/123")
+        self.assertEqual(match.handler, "job")
+        self.assertEqual(match.params, {"job_id": "123"})
+
+    def test_duplicate_route_raises(self):
+        """
+        Tests that registering the same route twice is rejected.
+        """
+        with self.assertRaises(ValueError):
+            self.router.add("/single-workflow", "other")
+
+    def test_conflicting_param_name_raises(self):
+        """
+        Tests that two parameter names at the same position are rejected.
+        """
+        with self.assertRaises(ValueError):
+            self.router.add("/workflow/<id>/runs", "runs")
+
+
+class TestDeclaredRoutes(unittest.TestCase):
+    def test_every_endpoint_yaml_is_routed(self):
+        """
+        Tests that each endpoint declared in a YAML file resolves to a handler.
+        """
+        for path in glob.glob(os.path.join(ENDPOINTS_DIR, "*.yaml")):
+            with open(path, encoding="utf-8") as f:
+                declared = yaml.safe_load(f)["path"]
+            with self.subTest(path=declared):
+                self.assertIsNotNone(ROUTER.match(declared), f"{declared} is not routed")
+
+    def test_determine_route(self):
+        """
+        Tests determine_route and match_route against the declared routes.
+        """
+        self.assertEqual(determine_route("/chatflow/abc"), "/chatflow/<app_id>")
+        self.assertEqual(determine_route("/single-chatflow"), "/single-chatflow")
+        self.assertIsNone(determine_route("/workflowfoo"))
+        self.assertEqual(match_route("/chatflow/abc").params, {"app_id": "abc"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import threading
+import unittest
+from unittest.mock import patch
+from endpoints.routing import fan_out, load_routing_table
+
+
+class TestRoutingTable(unittest.TestCase):
+    def setUp(self):
+        self.table = load_routing_table(
+            '{"index": {"header": "X-GitHub-Event"}, "routes": ['
+            '{"key": "issues", "apps": ["triage", "notify"]},'
+            '{"key": ["push", "release"], "when": {"field": "$.ref", "equals": "refs/heads/main"}, "apps": ["deploy"]},'
+            '{"when": {"field": "$.sender.type", "equals": "Bot"}, "apps": ["audit", "notify"]}]}')
+
+    def test_indexed_routes(self):
+        """
+        Tests that routes are looked up by the index header and that their conditions apply.
+        """
+        self.assertEqual(self.table.route({"x-github-event": "issues"}, {}), ["triage", "notify"])
+        self.assertEqual(self.table.route({"x-github-event": "push"}, {"ref": "refs/heads/main"}), ["deploy"])
+        self.assertIsNone(self.table.route({"x-github-event": "push"}, {"ref": "refs/heads/dev"}))
+        self.assertIsNone(self.table.route({}, {}))
+
+    def test_apps_of_all_matching_routes_once(self):
+        """
+        Tests that the apps of keyed and scanned routes are combined, each app once.
+        """
+        self.assertEqual(self.table.route({"x-github-event": "issues"}, {"sender": {"type": "Bot"}}),
+                         ["triage", "notify", "audit"])
+
+    def test_other_keys_are_not_evaluated(self):
+        """
+        Tests that the conditions of routes with other keys are not evaluated.
+        """
+        table = load_routing_table(
+            '{"index": {"field": "$.type"}, "routes": ['
+            + ",".join(f'{{"key": "t{i}", "when": {{"field": "$.a", "exists": true}}, "apps": ["app-{i}"]}}'
+                       for i in range(100)) + ']}')
+
+        with patch('endpoints.event_filter.EventFilter.matches', return_value=True) as mock_matches:
+            self.assertEqual(table.route({}, {"type": "t42"}), ["app-42"])
+        self.assertEqual(mock_matches.call_count, 1)
+
+    def test_invalid_config(self):
+        """
+        Tests that invalid settings raise a ValueError.
+        """
+        for config in ('[]', '{"routes": {}}', '{"routes": [], "mode": "any"}',
+                       '{"routes": [{"key": "a", "apps": ["x"]}]}', '{"routes": [{"apps": ["x"]}]}',
+                       '{"index": {"header": "a"}, "routes": [{"key": "a", "apps": []}]}',
+                       '{"index": {"header": "a"}, "routes": [{"key": 1, "apps": ["x"]}]}',
+                       '{"index": {"path": "a"}, "routes": []}'):
+            with self.subTest(config=config):
+                with self.assertRaises(ValueError):
+                    load_routing_table(config)
+
+
+class TestFanOut(unittest.TestCase):
+    def test_all(self):
+        """
+        Tests that the results of all apps are aggregated with the errors of the failed apps.
+        """
+        def invoke(app_id):
+            if app_id == "b":
+                raise ValueError("boom")
+            return {"app": app_id} if app_id != "c" else None
+
+        self.assertEqual(fan_out(["a", "b", "c", "d"], invoke), {
+            "results": {"a": {"app": "a"}, "d": {"app": "d"}},
+            "errors": {"b": "boom", "c": "Failed to get response"}})
+
+    def test_concurrent(self):
+        """
+        Tests that the apps are invoked concurrently.
+        """
+        barrier = threading.Barrier(3, timeout=5)
+
+        def invoke(app_id):
+            barrier.wait()
+            return {"app": app_id}
+
+        self.assertEqual(len(fan_out(["a", "b", "c"], invoke)["results"]), 3)
+
+    def test_first(self):
+        """
+        Tests that the first successful result is returned without waiting for slower apps.
+        """
+        release = threading.Event()
+
+        def invoke(app_id):
+            if app_id == "slow":
+                release.wait(5)
+            if app_id == "broken":
+                raise ValueError("boom")
+            return {"app": app_id}
+
+        try:
+            self.assertEqual(fan_out(["slow", "broken", "fast"], invoke, "first"),
+                             {"app_id": "fast", "result": {"app": "fast"}})
+        finally:
+            release.set()
+
+    def test_all_failed(self):
+        """
+        Tests that an error is raised if every app failed.
+        """
+        with self.assertRaises(RuntimeError):
+            fan_out(["a", "b"], lambda app_id: None)
+
+
+if __name__ == '__main__':
+    unittest.main()
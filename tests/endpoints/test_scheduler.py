@@ -0,0 +1,87 @@
+import unittest
+from collections import Counter
+from endpoints.scheduler import DEFAULT_CLASS, FairScheduler, load_priority_config
+
+
+class TestFairScheduler(unittest.TestCase):
+    def test_weighted_share(self):
+        """
+        Tests that backlogged classes are served in proportion to their weights.
+        """
+        scheduler = FairScheduler({"interactive": 4, "bulk": 1})
+
+        served = Counter(scheduler.choose(["interactive", "bulk"]) for _ in range(100))
+
+        self.assertEqual(served, {"interactive": 80, "bulk": 20})
+
+    def test_idle_class_has_no_credit(self):
+        """
+        Tests that a class that was idle does not monopolize the queue when it becomes active.
+        """
+        scheduler = FairScheduler()
+        for _ in range(50):
+            scheduler.choose(["busy"])
+
+        served = [scheduler.choose(["busy", "idle"]) for _ in range(4)]
+
+        self.assertEqual(Counter(served), {"busy": 2, "idle": 2})
+
+    def test_no_active_class(self):
+        """
+        Tests that nothing is chosen without waiting jobs.
+        """
+        self.assertIsNone(FairScheduler().choose([]))
+
+    def test_record_wait(self):
+        """
+        Tests the wait time statistics of a class.
+        """
+        scheduler = FairScheduler()
+        scheduler.record_wait("bulk", 1.0)
+        scheduler.record_wait("bulk", 3.0)
+
+        self.assertEqual(scheduler.stats(), {"bulk": {"dequeued": 2, "avg_wait": 2.0, "max_wait": 3.0,
+                                                      "last_wait": 3.0}})
+
+
+class TestPriorityConfig(unittest.TestCase):
+    def test_empty_config(self):
+        """
+        Tests that all jobs share the default class without configuration.
+        """
+        config = load_priority_config("")
+
+        self.assertEqual(config.classify("chatflow", "app-1", "gold", "interactive"), DEFAULT_CLASS)
+
+    def test_classify(self):
+        """
+        Tests the precedence of the API key tier, the app ID and the handler, and that the
+        header can only lower the priority.
+        """
+        config = load_priority_config(
+            '{"weights": {"interactive": 8, "bulk": 1, "gold": 4}, "handlers": {"chatflow": "interactive"},'
+            ' "apps": {"app-2": "bulk"}, "default": "bulk"}')
+
+        self.assertEqual(config.classify("chatflow", "app-1", None, "bulk"), "bulk")
+        self.assertEqual(config.classify("chatflow", "app-1", None, "unknown"), "interactive")
+        self.assertEqual(config.classify("workflow", "app-1", "gold"), "gold")
+        self.assertEqual(config.classify("chatflow", "app-2"), "bulk")
+        self.assertEqual(config.classify("workflow", "app-1"), "bulk")
+        self.assertEqual(config.classify("workflow", "app-1", "bulk", "interactive"), "bulk")
+        self.assertEqual(config.classify("chatflow", "app-2", None, "gold"), "bulk")
+        self.assertEqual(config.classify("chatflow", "app-1", "gold", "interactive"), "gold")
+        self.assertEqual(config.classify("chatflow", "app-1", "gold", "bulk"), "bulk")
+
+    def test_invalid_config(self):
+        """
+        Tests that invalid settings raise a ValueError.
+        """
+        for config in ('[]', '{"weights": {"bulk": 0}}', '{"weights": {"bulk": true}}',
+                       '{"handlers": {"chatflow": 1}}', '{"default": 1}', '{"classes": {}}', '{'):
+            with self.subTest(config=config):
+                with self.assertRaises(ValueError):
+                    load_priority_config(config)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,221 @@
+import multiprocessing
+import os
+import tempfile
+import unittest
+from endpoints.affinity import ConversationCache, StateConversationStore
+from endpoints.result_cache import ResultCache
+from endpoints.state import MemoryStateBackend, SqliteStateBackend, StateBackend
+from middlewares.replay_cache import SharedReplayCache
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _add_keys(path: str, keys: int, results) -> None:
+    backend = SqliteStateBackend(path)
+    results.put(sum(backend.add(f"key-{i}", str(os.getpid()), 60) for i in range(keys)))
+
+
+class StateBackendContract:
+    """
+    Behavior shared by all state backends, run against each implementation.
+    """
+
+    def make_backend(self, clock: FakeClock):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.backend = self.make_backend(self.clock)
+
+    def test_get_set_delete(self):
+        """
+        Tests that values are returned until they are deleted.
+        """
+        self.assertIsNone(self.backend.get("a"))
+        self.backend.set("a", "1", ttl=10)
+        self.backend.set("a", "2", ttl=10)
+        self.assertEqual(self.backend.get("a"), "2")
+
+        self.backend.delete("a")
+        self.assertIsNone(self.backend.get("a"))
+
+    def test_ttl(self):
+        """
+        Tests that values expire after their TTL.
+        """
+        self.backend.set("a", "1", ttl=10)
+        self.clock.now += 9
+        self.assertEqual(self.backend.get("a"), "1")
+        self.clock.now += 1
+        self.assertIsNone(self.backend.get("a"))
+
+    def test_add_only_once(self):
+        """
+        Tests that a key is only added while it holds no live value.
+        """
+        self.assertTrue(self.backend.add("a", "first", ttl=10))
+        self.assertFalse(self.backend.add("a", "second", ttl=10))
+        self.assertEqual(self.backend.get("a"), "first")
+
+        self.clock.now += 10
+        self.assertTrue(self.backend.add("a", "third", ttl=10))
+        self.assertEqual(self.backend.get("a"), "third")
+
+    def test_add_sees_buffered_set(self):
+        """
+        Tests that a value that was just set blocks an add of the same key.
+        """
+        self.backend.set("a", "1", ttl=10)
+        self.assertFalse(self.backend.add("a", "2", ttl=10))
+
+    def test_incr_fixed_window(self):
+        """
+        Tests that counters add up within their window and restart after it.
+        """
+        self.assertEqual(self.backend.incr("hits", ttl=60), 1)
+        self.clock.now += 30
+        self.assertEqual(self.backend.incr("hits", 2, ttl=60), 3)
+        self.assertEqual(self.backend.get("hits"), 3)
+
+        self.clock.now += 30
+        self.assertEqual(self.backend.incr("hits", ttl=60), 1)
+
+    def test_consumers(self):
+        """
+        Tests the replay records, cached results and conversations kept in the backend.
+        """
+        replays = SharedReplayCache(self.backend, window=60)
+        self.assertTrue(replays.check_and_add("sig", 1000, now=1000))
+        self.assertFalse(replays.check_and_add("sig", 1000, now=1001))
+        self.assertFalse(replays.check_and_add("old", 900, now=1000))
+
+        ResultCache(1024, self.backend).set("key", {"label": "spam"}, ttl=10)
+        self.assertEqual(ResultCache(1024, self.backend).get("key"), {"label": "spam"})
+
+        ConversationCache(store=StateConversationStore(self.backend)).set("app:C1", "conv-1", now=1000)
+        self.assertEqual(ConversationCache(store=StateConversationStore(self.backend)).get("app:C1", now=1001),
+                         "conv-1")
+
+
+class TestStateBackend(unittest.TestCase):
+    def test_is_abstract(self):
+        """
+        Tests that backends must implement every operation.
+        """
+        class PartialBackend(StateBackend):
+            def get(self, key):
+                return None
+
+        with self.assertRaises(TypeError):
+            StateBackend()
+        with self.assertRaises(TypeError):
+            PartialBackend()
+
+
+class TestMemoryStateBackend(StateBackendContract, unittest.TestCase):
+    def make_backend(self, clock: FakeClock):
+        return MemoryStateBackend(clock)
+
+    def test_purges_expired_entries(self):
+        """
+        Tests that expired entries are swept without being read.
+        """
+        self.backend.set("a", "1", ttl=10)
+        self.clock.now += 120
+        self.backend.set("b", "1", ttl=10)
+        self.assertEqual(len(self.backend), 1)
+
+
+class TestSqliteStateBackend(StateBackendContract, unittest.TestCase):
+    def make_backend(self, clock: FakeClock):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, "state.db")
+        return SqliteStateBackend(self.path, clock, flush_interval=60)
+
+    def test_buffered_writes_are_shared_after_flush(self):
+        """
+        Tests that writes are committed in one batch and then visible to other workers.
+        """
+        other = SqliteStateBackend(self.path, self.clock)
+        self.backend.set("a", "1", ttl=10)
+        self.backend.set("b", "2", ttl=10)
+        self.assertIsNone(other.get("a"))
+
+        self.backend.flush()
+
+        self.assertEqual((other.get("a"), other.get("b")), ("1", "2"))
+
+    def test_full_batch_is_flushed(self):
+        """
+        Tests that a full batch is committed without waiting for the flush interval.
+        """
+        backend = SqliteStateBackend(self.path, self.clock, batch_size=2, flush_interval=60)
+        other = SqliteStateBackend(self.path, self.clock)
+        backend.set("a", "1", ttl=10)
+        backend.set("b", "2", ttl=10)
+
+        self.assertEqual(other.get("b"), "2")
+
+    def test_flush_interval(self):
+        """
+        Tests that buffered writes are committed after the flush interval.
+        """
+        backend = SqliteStateBackend(self.path, batch_size=100, flush_interval=0.01)
+        backend.set("a", "1", ttl=10)
+        backend._timer.join()
+
+        self.assertEqual(SqliteStateBackend(self.path).get("a"), "1")
+
+    def test_delete_during_flush(self):
+        """
+        Tests that a key deleted while its batch is being committed is not read from the batch.
+        """
+        self.backend.set("a", "1", ttl=10)
+        # The state of a flush that moved the batch out of the buffer and hasn't committed it yet
+        with self.backend._lock:
+            self.backend._flushing.update(self.backend._pending)
+            self.backend._pending = {}
+
+        self.backend.delete("a")
+
+        self.assertIsNone(self.backend.get("a"))
+
+    def test_shared_between_workers(self):
+        """
+        Tests that adds, counters and deletes apply immediately across workers.
+        """
+        other = SqliteStateBackend(self.path, self.clock)
+        self.assertTrue(self.backend.add("a", "1", ttl=10))
+        self.assertFalse(other.add("a", "2", ttl=10))
+
+        self.backend.incr("hits", ttl=60)
+        self.assertEqual(other.incr("hits", ttl=60), 2)
+
+        other.delete("a")
+        self.assertIsNone(self.backend.get("a"))
+
+    def test_add_is_atomic_across_processes(self):
+        """
+        Tests that each key is added by exactly one of several processes.
+        """
+        context = multiprocessing.get_context("fork")
+        results = context.Queue()
+        processes = [context.Process(target=_add_keys, args=(self.path, 50, results)) for _ in range(4)]
+        for process in processes:
+            process.start()
+        added = [results.get(timeout=30) for _ in processes]
+        for process in processes:
+            process.join()
+
+        self.assertEqual(sum(added), 50)
+
+
+if __name__ == '__main__':
+    unittest.main()
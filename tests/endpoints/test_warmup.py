@@ -0,0 +1,93 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from endpoints import warmup
+from endpoints.job_queue import JOB_WORKERS, get_job_queue
+
+
+class TestWarmUp(unittest.TestCase):
+    def setUp(self):
+        warmup._ready.clear()
+        self.addCleanup(warmup._ready.clear)
+
+    def test_warm_up_marks_ready(self):
+        """
+        Tests that the plugin is ready after the warm-up, including the probe requests.
+        """
+        self.assertFalse(warmup.is_ready())
+
+        timings = warmup.warm_up(probe=True)
+
+        self.assertTrue(warmup.is_ready())
+        self.assertEqual(set(timings), {"imports", "middlewares", "probe", "total"})
+        self.assertEqual(warmup.readiness()["warm_up_ms"], timings)
+
+    def test_failed_step_is_not_ready(self):
+        """
+        Tests that the other steps run when a step fails, and that the plugin is not ready.
+        """
+        with patch("endpoints.warmup._probe", side_effect=RuntimeError("probe failed")):
+            timings = warmup.warm_up([], probe=True)
+
+        self.assertEqual(set(timings), {"imports", "middlewares", "probe", "total"})
+        self.assertFalse(warmup.is_ready())
+        self.assertEqual(warmup.readiness()["failed_steps"], {"probe": "probe failed"})
+
+        warmup.warm_up([])
+        self.assertTrue(warmup.is_ready())
+        self.assertEqual(warmup.readiness()["failed_steps"], {})
+
+    def test_start_warm_up_from_env(self):
+        """
+        Tests that the warm-up configured by the environment runs in a background thread.
+        """
+        with patch("endpoints.warmup.warm_up_from_env") as warm_up_from_env:
+            thread = warmup.start_warm_up_from_env()
+            thread.join(5)
+
+        self.assertTrue(thread.daemon)
+        warm_up_from_env.assert_called_once_with()
+
+    def test_probe_checks_parsed_inputs(self):
+        """
+        Tests that the probe fails when a body is answered but its inputs are parsed wrong.
+        """
+        warmup._probe()
+
+        with patch("endpoints.invoke_endpoint.nest_inputs", side_effect=lambda fields: fields):
+            with self.assertRaisesRegex(RuntimeError, "multipart/form-data|x-www-form-urlencoded"):
+                warmup._probe()
+
+    def test_warm_up_from_env(self):
+        """
+        Tests the middlewares and probes selected by the environment.
+        """
+        cases = [
+            ({}, [], False, ""),
+            ({"WARMUP_MIDDLEWARES": "*"}, None, False, ""),
+            ({"WARMUP_MIDDLEWARES": "discord, github", "WARMUP_PROBE": "true"}, ["discord", "github"], True, ""),
+            ({"WARMUP_JOB_QUEUE": "/data/jobs.db"}, [], False, "/data/jobs.db"),
+        ]
+        for environ, middlewares, probe, job_queue in cases:
+            with self.subTest(environ=environ), patch.dict(os.environ, environ, clear=True), \
+                    patch("endpoints.warmup.warm_up") as warm_up:
+                warmup.warm_up_from_env()
+                warm_up.assert_called_once_with(middlewares, probe, job_queue)
+
+    def test_starts_job_queue_workers(self):
+        """
+        Tests that the workers of the job queue are started by the warm-up.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "jobs.db")
+            self.addCleanup(get_job_queue.cache_clear)
+
+            timings = warmup.warm_up([], job_queue=path)
+
+            self.assertIn("job_queue", timings)
+            self.assertEqual(len(get_job_queue(path)._workers), JOB_WORKERS)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,7 +4,7 @@ import logging
 import unittest
 from unittest.mock import MagicMock
 from werkzeug import Request
-from middlewares.default_middleware import DefaultMiddleware
+from middlewares.default_middleware import DefaultMiddleware, validate_json
 
 logger = logging.getLogger(__name__)
 
@@ -75,6 +75,64 @@ class TestDefaultMiddleware(unittest.TestCase):
         self.assertIsNone(response)  # Expect no response to be returned
         self.assertFalse(hasattr(request, 'default_middleware_json'))
 
+    def test_transform_request_body_raw(self):
+        """
+        Test forwarding the request body text as-is in raw format.
+        """
+        body = '{"key":  "value", "list": [1, 2]}'
+        request = MagicMock(spec=Request)
+        request.get_data.return_value = body
+
+        self.middleware.transform_request_body(request, "raw")
+
+        self.assertEqual(request.default_middleware_json['json_string'], body)
+        request.get_json.assert_not_called()
+
+    def test_transform_request_body_raw_invalid_json(self):
+        """
+        Test that invalid JSON is rejected in raw format.
+        """
+        request = MagicMock(spec=Request)
+        request.get_data.return_value = '{"key": '
+
+        self.middleware.transform_request_body(request, "raw")
+
+        self.assertFalse(hasattr(request, 'default_middleware_json'))
+
+    def test_transform_request_body_minified(self):
+        """
+        Test removing insignificant whitespace in minified format.
+        """
+        request = MagicMock(spec=Request)
+        request.get_data.return_value = '{\n  "key": "a b",\n  "list": [1, 2]\n}'
+
+        self.middleware.transform_request_body(request, "minified")
+
+        self.assertEqual(
+            request.default_middleware_json['json_string'], '{"key":"a b","list":[1,2]}')
+
+    def test_invoke_with_json_string_format(self):
+        """
+        Test the invoke method passes the json_string_format setting on.
+        """
+        settings = {"json_string_input": True, "json_string_format": "raw"}
+        request = MagicMock(spec=Request)
+        request.data = b'[1, 2]'
+        request.get_data.return_value = '[1, 2]'
+
+        response = self.middleware.invoke(request, settings)
+
+        self.assertIsNone(response)
+        self.assertEqual(request.default_middleware_json['json_string'], '[1, 2]')
+
+    def test_validate_json(self):
+        """
+        Test the validating decoder accepts valid and rejects invalid documents.
+        """
+        validate_json('{"a": [{"b": null}, 1.5, "x"]}')
+        with self.assertRaises(json.JSONDecodeError):
+            validate_json('{"a": [}')
+
 
 if __name__ == '__main__':
     unittest.main()
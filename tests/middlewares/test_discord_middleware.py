@@ -1,15 +1,19 @@
 import json
+import time
 import unittest
 from unittest.mock import Mock, patch, PropertyMock
 from werkzeug import Request
 from nacl.exceptions import BadSignatureError
 from middlewares.discord_middleware import DiscordMiddleware
+from middlewares.replay_cache import get_replay_cache
 
 class TestDiscordMiddleware(unittest.TestCase):
     def setUp(self):
         self.valid_signature_key = '0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef'
         self.middleware = DiscordMiddleware(signature_verification_key=self.valid_signature_key)
         self.valid_request_body = json.dumps({"type": 1}).encode('utf-8')
+        self.timestamp = str(int(time.time()))
+        get_replay_cache.cache_clear()
 
     @patch('nacl.signing.VerifyKey.verify')
     def test_valid_request_signature(self, mock_verify):
@@ -24,7 +28,7 @@ class TestDiscordMiddleware(unittest.TestCase):
         request.method = 'POST'
         request.headers = {
             'X-Signature-Ed25519': '0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef',
-            'X-Signature-Timestamp': 'timestamp'
+            'X-Signature-Timestamp': self.timestamp
         }
         request.data = self.valid_request_body
         # Mock the JSON property
@@ -51,7 +55,7 @@ class TestDiscordMiddleware(unittest.TestCase):
         request.method = 'POST'
         request.headers = {
             'X-Signature-Ed25519': '0123456789abcdef',  # Invalid but hex to pass conversion
-            'X-Signature-Timestamp': 'timestamp'
+            'X-Signature-Timestamp': self.timestamp
         }
         request.data = self.valid_request_body
 
@@ -75,7 +79,7 @@ class TestDiscordMiddleware(unittest.TestCase):
         request.method = 'POST'
         request.headers = {
             'X-Signature-Ed25519': '0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef',
-            'X-Signature-Timestamp': 'timestamp'
+            'X-Signature-Timestamp': self.timestamp
         }
         ping_data = json.dumps({"type": 0}).encode('utf-8')  # Type 0 indicates a ping
         request.data = ping_data
@@ -102,7 +106,7 @@ class TestDiscordMiddleware(unittest.TestCase):
         request.method = 'POST'
         request.headers = {
             'X-Signature-Ed25519': '0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef',
-            'X-Signature-Timestamp': 'timestamp'
+            'X-Signature-Timestamp': self.timestamp
         }
         webhook_data = json.dumps({"type": 1}).encode('utf-8')  # Type 1 indicates a webhook event
         request.data = webhook_data
@@ -130,7 +134,7 @@ class TestDiscordMiddleware(unittest.TestCase):
         request.method = 'POST'
         request.headers = {
             'X-Signature-Ed25519': '0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef',
-            'X-Signature-Timestamp': 'timestamp'
+            'X-Signature-Timestamp': self.timestamp
         }
         request.data = b'invalid_json'  # Malformed JSON
         
@@ -144,5 +148,71 @@ class TestDiscordMiddleware(unittest.TestCase):
         self.assertIsNone(response)
         mock_verify.assert_called_once()
 
+    def build_request(self, signature, timestamp):
+        request = Mock(spec=Request)
+        request.method = 'POST'
+        request.headers = {
+            'X-Signature-Ed25519': signature,
+            'X-Signature-Timestamp': timestamp
+        }
+        request.data = self.valid_request_body
+        request.json = json.loads(self.valid_request_body)
+        return request
+
+    @patch('nacl.signing.VerifyKey.verify')
+    def test_stale_timestamp(self, mock_verify):
+        """
+        Tests that a request with a timestamp outside the tolerance is rejected
+        before the signature is verified.
+        """
+        request = self.build_request('0123456789abcdef' * 8, str(int(time.time()) - 3600))
+
+        response = self.middleware.invoke(request)
+
+        self.assertEqual(response.status_code, 401)
+        mock_verify.assert_not_called()
+
+    @patch('nacl.signing.VerifyKey.verify')
+    def test_replayed_request(self, mock_verify):
+        """
+        Tests that a request with an already accepted signature is rejected as a replay.
+        """
+        mock_verify.return_value = None
+        signature = 'fedcba9876543210' * 8
+
+        first = self.middleware.invoke(self.build_request(signature, self.timestamp))
+        replay = self.middleware.invoke(self.build_request(signature, self.timestamp))
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(replay.status_code, 401)
+
+    @patch('nacl.signing.VerifyKey.verify')
+    def test_replay_with_reformatted_signature(self, mock_verify):
+        """
+        Tests that a replay is rejected when its signature is sent in uppercase or spaced hex.
+        """
+        mock_verify.return_value = None
+        signature = 'fedcba9876543210' * 8
+
+        first = self.middleware.invoke(self.build_request(signature, self.timestamp))
+        self.assertEqual(first.status_code, 200)
+        for replayed in (signature.upper(), " ".join(signature[i:i + 2] for i in range(0, len(signature), 2))):
+            with self.subTest(signature=replayed):
+                response = self.middleware.invoke(self.build_request(replayed, self.timestamp))
+                self.assertEqual(response.status_code, 401)
+
+    @patch('nacl.signing.VerifyKey.verify')
+    def test_replay_check_disabled(self, mock_verify):
+        """
+        Tests that a tolerance of 0 disables the freshness and replay checks.
+        """
+        mock_verify.return_value = None
+        middleware = DiscordMiddleware(self.valid_signature_key, tolerance=0)
+        signature = 'fedcba9876543210' * 8
+
+        for _ in range(2):
+            response = middleware.invoke(self.build_request(signature, 'timestamp'))
+            self.assertEqual(response.status_code, 200)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,194 @@
+import base64
+import hashlib
+import hmac
+import json
+import time
+import unittest
+from unittest.mock import Mock
+from werkzeug import Request
+from endpoints.state import MemoryStateBackend
+from middlewares.replay_cache import get_replay_cache
+from middlewares.hmac_middleware import GitHubMiddleware, HmacMiddleware, SlackSignatureMiddleware, StripeMiddleware
+
+SECRET = "test-secret"
+BODY = json.dumps({"action": "opened"}).encode("utf-8")
+
+
+def sign(message: bytes) -> str:
+    return hmac.new(SECRET.encode(), message, hashlib.sha256).hexdigest()
+
+
+def build_request(headers, body=BODY):
+    request = Mock(spec=Request)
+    request.method = 'POST'
+    request.headers = headers
+    request.data = body
+    request.get_data = Mock(return_value=body)
+    return request
+
+
+class TestHmacMiddleware(unittest.TestCase):
+    def setUp(self):
+        get_replay_cache.cache_clear()
+
+    def test_missing_secret(self):
+        """
+        Tests that the middleware cannot be created without a secret.
+        """
+        with self.assertRaises(ValueError):
+            GitHubMiddleware(None)
+
+    def test_unknown_option(self):
+        """
+        Tests that unknown generic options are rejected.
+        """
+        with self.assertRaises(ValueError):
+            HmacMiddleware(SECRET, signature_heder="X-Sig")
+
+    def test_generic_scheme_from_settings(self):
+        """
+        Tests the generic scheme configured through the hmac_options setting.
+        """
+        middleware = HmacMiddleware.from_settings({
+            "signature_verification_key": SECRET,
+            "hmac_options": json.dumps({"signature_header": "X-Sig", "timestamp_header": "X-Ts",
+                                        "message_template": "{timestamp}.{body}"}),
+        })
+        timestamp = str(int(time.time()))
+        request = build_request({"X-Sig": sign(f"{timestamp}.".encode() + BODY), "X-Ts": timestamp})
+
+        self.assertIsNone(middleware.invoke(request))
+
+    def test_generic_scheme_base64(self):
+        """
+        Tests the generic scheme with base64 encoded signatures.
+        """
+        middleware = HmacMiddleware(SECRET, encoding="base64")
+        signature = base64.b64encode(hmac.new(SECRET.encode(), BODY, hashlib.sha256).digest()).decode()
+
+        self.assertTrue(middleware.verify_request(build_request({"X-Signature": signature})))
+
+    def test_github_valid_signature(self):
+        """
+        Tests that a valid GitHub signature is accepted and the request continues.
+        """
+        middleware = GitHubMiddleware(SECRET)
+        request = build_request({"X-Hub-Signature-256": "sha256=" + sign(BODY)})
+
+        self.assertIsNone(middleware.invoke(request))
+
+    def test_github_invalid_signature(self):
+        """
+        Tests that a forged GitHub signature results in a 401 response.
+        """
+        middleware = GitHubMiddleware(SECRET)
+        request = build_request({"X-Hub-Signature-256": "sha256=" + sign(b"other body")})
+
+        response = middleware.invoke(request)
+
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(json.loads(response.data), {"error": "invalid request signature"})
+
+    def test_non_ascii_signature(self):
+        """
+        Tests that a signature with non-ASCII characters is rejected with 401.
+        """
+        request = build_request({"X-Hub-Signature-256": "sha256=\u00e9" + sign(BODY)[1:]})
+
+        response = GitHubMiddleware(SECRET).invoke(request)
+
+        self.assertEqual(response.status_code, 401)
+
+    def test_github_missing_header(self):
+        """
+        Tests that a request without a signature is rejected.
+        """
+        response = GitHubMiddleware(SECRET).invoke(build_request({}))
+
+        self.assertEqual(response.status_code, 401)
+
+    def test_stripe_signature_with_rolled_secret(self):
+        """
+        Tests that a Stripe header is accepted when any of its v1 signatures is valid.
+        """
+        middleware = StripeMiddleware(SECRET)
+        timestamp = str(int(time.time()))
+        valid = sign(f"{timestamp}.".encode() + BODY)
+        request = build_request({"Stripe-Signature": f"t={timestamp},v1={'0' * 64},v1={valid}"})
+
+        self.assertTrue(middleware.verify_request(request))
+
+    def test_stripe_stale_timestamp(self):
+        """
+        Tests that a correctly signed but stale Stripe request is rejected.
+        """
+        middleware = StripeMiddleware(SECRET, tolerance=300)
+        timestamp = str(int(time.time()) - 600)
+        request = build_request({"Stripe-Signature": f"t={timestamp},v1={sign(f'{timestamp}.'.encode() + BODY)}"})
+
+        self.assertFalse(middleware.verify_request(request))
+
+    def test_slack_signature(self):
+        """
+        Tests Slack signatures, including the freshness of the timestamp.
+        """
+        middleware = SlackSignatureMiddleware(SECRET)
+        timestamp = str(int(time.time()))
+        request = build_request({
+            "X-Slack-Signature": "v0=" + sign(f"v0:{timestamp}:".encode() + BODY),
+            "X-Slack-Request-Timestamp": timestamp,
+        })
+
+        self.assertTrue(middleware.verify_request(request))
+
+        request.headers["X-Slack-Request-Timestamp"] = "not-a-number"
+        self.assertFalse(middleware.verify_request(request))
+
+    def test_slack_replay(self):
+        """
+        Tests that a replayed Slack request with a fresh timestamp is rejected.
+        """
+        middleware = SlackSignatureMiddleware(SECRET)
+        timestamp = str(int(time.time()))
+        headers = {
+            "X-Slack-Signature": "v0=" + sign(f"v0:{timestamp}:".encode() + BODY),
+            "X-Slack-Request-Timestamp": timestamp,
+        }
+
+        self.assertTrue(middleware.verify_request(build_request(headers)))
+        self.assertFalse(middleware.verify_request(build_request(headers)))
+
+    def test_replay_in_shared_state(self):
+        """
+        Tests that a request accepted by one worker is rejected as a replay by another one.
+        """
+        state = MemoryStateBackend()
+        first, second = SlackSignatureMiddleware(SECRET), SlackSignatureMiddleware(SECRET)
+        first.state = second.state = state
+        timestamp = str(int(time.time()))
+        headers = {
+            "X-Slack-Signature": "v0=" + sign(f"v0:{timestamp}:".encode() + BODY),
+            "X-Slack-Request-Timestamp": timestamp,
+        }
+
+        self.assertTrue(first.verify_request(build_request(headers)))
+        get_replay_cache.cache_clear()
+        self.assertFalse(second.verify_request(build_request(headers)))
+
+    def test_tolerance_from_settings(self):
+        """
+        Tests that a tolerance of 0 disables the freshness check.
+        """
+        middleware = SlackSignatureMiddleware.from_settings(
+            {"signature_verification_key": SECRET, "signature_tolerance": "0"})
+        timestamp = "1000"
+        request = build_request({
+            "X-Slack-Signature": "v0=" + sign(f"v0:{timestamp}:".encode() + BODY),
+            "X-Slack-Request-Timestamp": timestamp,
+        })
+
+        self.assertTrue(middleware.verify_request(request))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+from middlewares.replay_cache import ReplayCache
+
+
+class TestReplayCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = ReplayCache(window=60, bucket_seconds=10, max_entries=100)
+
+    def test_detects_replay(self):
+        """
+        Tests that a signature is accepted once and rejected afterwards.
+        """
+        self.assertTrue(self.cache.check_and_add("sig", 1000, now=1000))
+        self.assertFalse(self.cache.check_and_add("sig", 1000, now=1001))
+        self.assertTrue(self.cache.check_and_add("other", 1000, now=1001))
+
+    def test_out_of_order_timestamps(self):
+        """
+        Tests that slightly older timestamps arriving later are still accepted.
+        """
+        self.assertTrue(self.cache.check_and_add("a", 1000, now=1000))
+        self.assertTrue(self.cache.check_and_add("b", 975, now=1000))
+        self.assertFalse(self.cache.check_and_add("b", 975, now=1005))
+
+    def test_buckets_expire(self):
+        """
+        Tests that signatures are dropped once their bucket leaves the window.
+        """
+        self.cache.check_and_add("a", 1000, now=1000)
+        self.cache.check_and_add("b", 1015, now=1015)
+        self.assertEqual(len(self.cache), 2)
+
+        self.cache.check_and_add("c", 1075, now=1075)
+
+        self.assertEqual(len(self.cache), 2)
+
+    def test_expire_after_idle_period(self):
+        """
+        Tests that all buckets are dropped after a long idle period.
+        """
+        self.cache.check_and_add("a", 1000, now=1000)
+
+        self.assertTrue(self.cache.check_and_add("a", 10_000_000, now=10_000_000))
+        self.assertEqual(len(self.cache), 1)
+
+    def test_memory_is_bounded(self):
+        """
+        Tests that the oldest bucket is evicted when the cache is full, and that
+        requests signed within an evicted bucket are rejected afterwards.
+        """
+        cache = ReplayCache(window=60, bucket_seconds=10, max_entries=3)
+        cache.check_and_add("a", 1000, now=1020)
+        cache.check_and_add("b", 1010, now=1020)
+        cache.check_and_add("c", 1020, now=1020)
+
+        self.assertTrue(cache.check_and_add("d", 1020, now=1020))
+
+        self.assertLessEqual(len(cache), 3)
+        self.assertFalse(cache.check_and_add("a", 1000, now=1020))
+        self.assertFalse(cache.check_and_add("e", 1005, now=1020))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import hashlib
+import hmac
+import json
+import time
+import unittest
+from unittest.mock import Mock
+from werkzeug import Request
+from endpoints.state import MemoryStateBackend
+from middlewares.replay_cache import get_replay_cache
+from middlewares.slack_middleware import SLACK_POST_MESSAGE_URL, SlackMiddleware
+
+SECRET = "test-secret"
+
+
+def build_request(payload, headers=None, timestamp=None):
+    body = json.dumps(payload).encode("utf-8")
+    timestamp = str(int(time.time()) if timestamp is None else timestamp)
+    signature = hmac.new(SECRET.encode(), f"v0:{timestamp}:".encode() + body, hashlib.sha256).hexdigest()
+    request = Mock(spec=Request)
+    request.method = 'POST'
+    request.headers = {"X-Slack-Signature": f"v0={signature}", "X-Slack-Request-Timestamp": timestamp,
+                       **(headers or {})}
+    request.data = body
+    request.get_data = Mock(return_value=body)
+    request.get_json = Mock(return_value=payload)
+    return request
+
+
+class TestSlackMiddleware(unittest.TestCase):
+    def setUp(self):
+        get_replay_cache.cache_clear()
+        self.middleware = SlackMiddleware.from_settings({
+            "signature_verification_key": SECRET,
+            "slack_bot_token": "xoxb-token",
+        })
+
+    def test_url_verification(self):
+        """
+        Tests that the URL verification challenge is answered.
+        """
+        response = self.middleware.invoke(build_request({"type": "url_verification", "challenge": "abc"}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.get_data(as_text=True)), {"challenge": "abc"})
+
+    def test_invalid_signature(self):
+        """
+        Tests that unsigned events are rejected.
+        """
+        request = build_request({"type": "url_verification", "challenge": "abc"})
+        request.headers["X-Slack-Signature"] = "v0=invalid"
+
+        self.assertEqual(self.middleware.invoke(request).status_code, 401)
+
+    def test_event_is_processed_in_background(self):
+        """
+        Tests that message events are handed to the endpoint with an async reply.
+        """
+        event = {"type": "message", "text": "Hello", "channel": "C1", "ts": "123.456"}
+        request = build_request({"type": "event_callback", "event_id": "Ev1", "event": event})
+
+        self.assertIsNone(self.middleware.invoke(request))
+        self.assertEqual(request.default_middleware_json, {
+            "query": "Hello", "inputs": {}, "slack": {"channel": "C1", "thread_ts": "123.456", "user": None}})
+        self.assertEqual(request.async_reply.url, SLACK_POST_MESSAGE_URL)
+        self.assertEqual(request.async_reply.headers, {"Authorization": "Bearer xoxb-token"})
+        self.assertEqual(request.async_reply.build_payload({"answer": "Hi"}),
+                         {"text": "Hi", "channel": "C1", "thread_ts": "123.456"})
+
+    def test_retries_of_accepted_events_are_dropped(self):
+        """
+        Tests that retries of events that were already accepted are acknowledged without processing.
+        """
+        event = {"type": "message", "text": "Hello", "channel": "C1"}
+        payload = {"type": "event_callback", "event_id": "Ev1", "event": event}
+        self.assertIsNone(self.middleware.invoke(build_request(payload)))
+
+        # Slack signs every retry with a new timestamp
+        response = self.middleware.invoke(build_request(payload, {"X-Slack-Retry-Num": "1"}, int(time.time()) - 1))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["X-Slack-No-Retry"], "1")
+
+    def test_retries_of_unseen_events_are_processed(self):
+        """
+        Tests that a retry is processed if the original event never arrived.
+        """
+        event = {"type": "message", "text": "Hello", "channel": "C1"}
+        request = build_request({"type": "event_callback", "event_id": "Ev2", "event": event},
+                                {"X-Slack-Retry-Num": "1"})
+
+        self.assertIsNone(self.middleware.invoke(request))
+        self.assertEqual(request.default_middleware_json["query"], "Hello")
+
+    def test_event_ids_in_shared_state(self):
+        """
+        Tests that a retry received by another worker is recognized through the state backend.
+        """
+        first = SlackMiddleware.from_settings({"signature_verification_key": SECRET, "slack_bot_token": "xoxb"})
+        second = SlackMiddleware.from_settings({"signature_verification_key": SECRET, "slack_bot_token": "xoxb"})
+        first.state = second.state = MemoryStateBackend()
+        event = {"type": "message", "text": "Hello", "channel": "C1"}
+        payload = {"type": "event_callback", "event_id": "Ev3", "event": event}
+
+        self.assertIsNone(first.invoke(build_request(payload)))
+        get_replay_cache.cache_clear()
+
+        retry = build_request(payload, {"X-Slack-Retry-Num": "1"}, int(time.time()) - 1)
+        self.assertEqual(second.invoke(retry).status_code, 200)
+
+    def test_bot_messages_are_ignored(self):
+        """
+        Tests that messages of bots are acknowledged without invoking the app.
+        """
+        event = {"type": "message", "text": "Hi", "bot_id": "B1", "channel": "C1"}
+
+        response = self.middleware.invoke(build_request({"type": "event_callback", "event": event}))
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_response_url(self):
+        """
+        Tests that events cannot be answered without a response URL or bot token.
+        """
+        middleware = SlackMiddleware(SECRET)
+        event = {"type": "message", "text": "Hello", "channel": "C1"}
+
+        response = middleware.invoke(build_request({"type": "event_callback", "event": event}))
+
+        self.assertEqual(response.status_code, 500)
+
+
+if __name__ == '__main__':
+    unittest.main()